@@ -1,153 +1,161 @@
+import asyncio
 import os
-import random
+import logging
 import json
-from flask import Flask, render_template, request, redirect, url_for, session
-import google.generativeai as genai
+from flask import Flask, Response, g, render_template, request, redirect, url_for, session, before_render_template, template_rendered
 from dotenv import load_dotenv
-import PyPDF2
-import pdfplumber
 import uuid
-
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from markupsafe import Markup
+from asgiref.wsgi import WsgiToAsgi
+from resolution_engine import executar_em_paralelo_async
+from cache_store import CacheSQLite, gerar_chave
+from session_store import criar_armazenamento_de_sessoes
+from prefetch import PreResolvedor
+from exercise_store import BancoDeExercicios
+from upload_store import ArmazenamentoDeUploads, ArquivoGrandeDemais
+from estuda_ai.configuracao import ler_configuracao
+from estuda_ai.pipeline import MENSAGEM_FALHA_RESOLUCAO, Pipeline
+from markdown_rendering import MOTOR as MOTOR_MARKDOWN, renderizar_markdown
+from jobs import ETAPA_PRONTO, ETAPAS, GerenciadorDeTrabalhos
+from observability import DURACAO_ETAPA, configurar_logging, registro
+
+load_dotenv() # Antes da configuração, para que o .env também possa definir as opções abaixo
+configurar_logging(os.getenv('LOG_LEVEL', 'INFO'), os.getenv('LOG_FORMAT', 'texto'))
+logger = logging.getLogger(__name__)
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'uma_chave_secreta_muito_segura_e_aleatoria_aqui_para_a_sua_aplicacao'
 app.config['UPLOAD_FOLDER'] = 'uploads'
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+# PDFs guardados pelo hash do conteúdo, com limite por arquivo e cota total da pasta
+app.config['UPLOAD_MAX_MB'] = float(os.getenv('UPLOAD_MAX_MB', 50))
+app.config['UPLOAD_COTA_MB'] = float(os.getenv('UPLOAD_COTA_MB', 2048))
+app.config['UPLOAD_IDADE_MAXIMA_DIAS'] = float(os.getenv('UPLOAD_IDADE_MAXIMA_DIAS', 7))
+app.config['MAX_CONTENT_LENGTH'] = int((app.config['UPLOAD_MAX_MB'] + 1) * 1024 * 1024) # Margem para os demais campos do formulário
+# Caches, identificação, normalização, resolução, similares e cliente do Gemini (veja estuda_ai/configuracao.py)
+app.config.update(ler_configuracao())
+app.config['UPLOAD_TRABALHADORES'] = int(os.getenv('UPLOAD_TRABALHADORES', 4)) # Uploads processados ao mesmo tempo em segundo plano
+app.config['RESOLUCAO_STREAMING'] = os.getenv('RESOLUCAO_STREAMING', '1') == '1' # Envia as resoluções ao navegador enquanto são geradas
+app.config['SESSION_STORE'] = os.getenv('SESSION_STORE', 'memory')
+app.config['SESSION_DB'] = os.getenv('SESSION_DB', os.path.join('cache', 'sessoes.db'))
+app.config['SESSION_TTL_MINUTOS'] = float(os.getenv('SESSION_TTL_MINUTOS', 120))
+app.config['SESSION_MAX_SESSOES'] = int(os.getenv('SESSION_MAX_SESSOES', 1000))
+# Resolução de vários exercícios por chamada (só no modo sem streaming)
+app.config['RESOLUCAO_EM_LOTE'] = os.getenv('RESOLUCAO_EM_LOTE', '0') == '1'
+app.config['SIMILARES_QUANTIDADE_PADRAO'] = int(os.getenv('SIMILARES_QUANTIDADE_PADRAO', 2))
+app.config['SIMILARES_MAX_QUANTIDADE'] = int(os.getenv('SIMILARES_MAX_QUANTIDADE', 5))
+# Pré-resolução em segundo plano dos próximos exercícios não respondidos de cada sessão
+app.config['PRE_RESOLUCAO'] = os.getenv('PRE_RESOLUCAO', '0') == '1'
+app.config['PRE_RESOLUCAO_PROXIMAS'] = int(os.getenv('PRE_RESOLUCAO_PROXIMAS', 3))
+app.config['PRE_RESOLUCAO_ORCAMENTO'] = int(os.getenv('PRE_RESOLUCAO_ORCAMENTO', 20)) # Chamadas por sessão
+app.config['PRE_RESOLUCAO_TRABALHADORES'] = int(os.getenv('PRE_RESOLUCAO_TRABALHADORES', 2))
 ALLOWED_EXTENSIONS = {'pdf'}
 
-session_data_store = {} # Dicionário global para armazenar dados da sessão no servidor
+# Dados da sessão guardados no servidor ('memory' por processo ou 'sqlite' compartilhado entre os workers)
+session_data_store = criar_armazenamento_de_sessoes(app.config['SESSION_STORE'],
+                                                    caminho=app.config['SESSION_DB'],
+                                                    ttl_segundos=app.config['SESSION_TTL_MINUTOS'] * 60,
+                                                    max_sessoes=app.config['SESSION_MAX_SESSOES'])
+gerenciador_de_trabalhos = GerenciadorDeTrabalhos(session_data_store, app.config['UPLOAD_TRABALHADORES'])
+armazenamento_de_uploads = ArmazenamentoDeUploads(app.config['UPLOAD_FOLDER'],
+                                                  max_bytes_arquivo=int(app.config['UPLOAD_MAX_MB'] * 1024 * 1024),
+                                                  cota_bytes=int(app.config['UPLOAD_COTA_MB'] * 1024 * 1024),
+                                                  idade_maxima_segundos=app.config['UPLOAD_IDADE_MAXIMA_DIAS'] * 24 * 3600)
+
+# HTML sanitizado do Markdown das respostas, por hash do texto
+cache_html = CacheSQLite(app.config['CACHE_DB'], 'html_renderizado',
+                         max_itens=app.config['CACHE_MAX_ITENS'],
+                         ttl_segundos=app.config['CACHE_TTL_DIAS'] * 24 * 3600)
+VERSAO_RENDERIZACAO = 1 # Incrementar ao mudar o HTML gerado a partir do Markdown
+
+@lru_cache(maxsize=1024)
+def markdown_para_html(texto):
+    """HTML sanitizado do Markdown `texto`, renderizado uma vez e guardado no cache em disco."""
+    chave_cache = gerar_chave('html', VERSAO_RENDERIZACAO, MOTOR_MARKDOWN, texto)
+    html_em_cache = cache_html.obter(chave_cache)
+    if html_em_cache is not None:
+        return html_em_cache
+    with DURACAO_ETAPA.cronometrar(etapa='renderizacao_markdown'):
+        html_renderizado = renderizar_markdown(texto)
+    cache_html.salvar(chave_cache, html_renderizado)
+    return html_renderizado
+
+@app.template_filter('markdown')
+def filtro_markdown(texto):
+    return Markup(markdown_para_html(texto or ""))
+
+def com_html(similar):
+    """Exercício similar com o enunciado e a resolução também em HTML, para o navegador só inserir na página."""
+    return {**similar, 'texto_html': markdown_para_html(similar['texto']),
+            'resolucao_html': markdown_para_html(similar['resolucao'])}
 
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-model = genai.GenerativeModel('models/gemini-2.0-flash')
-
-# --- Funções de extração de texto (mantidas) ---
-def extrair_texto_pypdf2(caminho_pdf):
-    texto_completo = ""
-    try:
-        with open(caminho_pdf, 'rb') as arquivo:
-            leitor_pdf = PyPDF2.PdfReader(arquivo)
-            for pagina in leitor_pdf.pages:
-                texto_completo += pagina.extract_text() + "\n"
-    except Exception as e:
-        print(f"Erro ao extrair texto com PyPDF2: {e}")
-        return None
-    return texto_completo
-
-def extrair_texto_pdfplumber(caminho_pdf):
-    texto_completo = ""
-    try:
-        with pdfplumber.open(caminho_pdf) as pdf:
-            for page in pdf.pages:
-                texto_completo += page.extract_text(x_tolerance=2, y_tolerance=2) + "\n"
-    except Exception as e:
-        print(f"Erro ao extrair texto com pdfplumber: {e}")
-        return None
-    return texto_completo
-
-def extrair_texto_ocr(caminho_pdf):
-    print("Função OCR ainda não implementada. Use um PDF digital para testar.")
-    return "Texto não extraído: OCR não implementado."
-
-# --- Funções de interação com Gemini (mantidas) ---
-def identificar_exercicios_com_gemini(texto_completo_do_pdf, model_gemini):
-    prompt_identificacao = f"""
-    Dado o seguinte texto extraído de um documento, identifique e extraia todas as questões ou exercícios.
-    Para cada questão identificada, forneça apenas o texto da questão, sem as soluções ou explicações.
-    Liste as questões em uma lista numerada.
-
-    Formato de saída desejado:
-    1. [Texto da primeira questão]
-    2. [Texto da segunda questão]
-    ...
-
-    Se não houver questões claras, responda 'Nenhuma questão encontrada.'.
-
-    TEXTO:
-    ---
-    {texto_completo_do_pdf}
-    ---
-    """
-    try:
-        response = model_gemini.generate_content(prompt_identificacao)
-        return response.text
-    except Exception as e:
-        print(f"Erro ao chamar a API do Gemini para identificar exercícios: {e}")
-        return "ERRO_NA_IDENTIFICACAO"
-
-def parsear_exercicios_do_gemini(texto_gemini):
-    exercicios_parseados = []
-    if texto_gemini == "ERRO_NA_IDENTIFICACAO" or "Nenhuma questão encontrada." in texto_gemini:
-        return []
-
-    linhas = texto_gemini.strip().split('\n')
-    for linha in linhas:
-        if linha.strip().startswith(tuple(f"{i}." for i in range(1, 100))):
-            partes = linha.split('.', 1)
-            if len(partes) > 1:
-                exercicios_parseados.append(partes[1].strip())
-            else:
-                exercicios_parseados.append(linha.strip())
-        else:
-            if exercicios_parseados:
-                exercicios_parseados[-1] += "\n" + linha.strip()
-
-    exercicios_parseados = [ex.strip() for ex in exercicios_parseados if ex.strip()]
-    return exercicios_parseados
-
-def resolver_exercicio_com_gemini(exercicio_texto, model_gemini):
-    prompt_resolucao = f"""
-    Resolva o seguinte exercício e explique cada passo detalhadamente, como se estivesse ensinando alguém.
-    Mantenha a resposta clara e focada apenas na resolução e explicação.
-    **Por favor, formate sua resposta usando Markdown**, incluindo cabeçalhos, listas, negrito, itálico e blocos de código para fórmulas ou cálculos, quando apropriado.
-
-    Exercício:
-    ---
-    {exercicio_texto}
-    ---
-
-    Certifique-se de mostrar todos os cálculos e a lógica por trás de cada etapa.
-    """
-    try:
-        response = model_gemini.generate_content(prompt_resolucao)
-        return response.text
-    except Exception as e:
-        print(f"Erro ao chamar a API do Gemini para este exercício: {e}")
-        return "Não foi possível gerar a resolução para este exercício."
-
-def gerar_exercicios_similares_com_gemini(exercicio_original, resolucao_original, model_gemini, quantidade=2):
-    prompt_similares = f"""
-    Com base no seguinte exercício e sua resolução, crie {quantidade} novos exercícios que abordem o mesmo conceito
-    ou tipo de problema, mas com valores, cenários ou dados diferentes.
-    Não inclua as soluções para os novos exercícios.
-    **Por favor, apresente cada novo exercício como uma lista numerada, formatado em Markdown, com negrito ou itálico para destacar termos importantes.**
-
-    Exercício Original:
-    ---
-    {exercicio_original}
-    ---
-
-    Resolução do Exercício Original (para contexto do conceito):
-    ---
-    {resolucao_original}
-    ---
-
-    Por favor, formate os novos exercícios da seguinte forma em Markdown:
-    1. [Texto do Exercício Similar 1, com Markdown]
-    2. [Texto do Exercício Similar 2, com Markdown]
-    ...
-    """
-    try:
-        response = model_gemini.generate_content(prompt_similares)
-        return response.text
-    except Exception as e:
-        print(f"Erro ao chamar a API do Gemini para gerar exercícios similares: {e}")
-        return "Não foi possível gerar exercícios similares."
+# Extração, identificação, resolução e similares (estuda_ai/pipeline.py). O cliente do Gemini e os caches
+# são criados no primeiro uso, e o modelo (e o SDK do Gemini) só na primeira chamada, não no import.
+# O HTML de cada resolução nova fica pronto junto com ela
+pipeline = Pipeline(app.config, ao_salvar_resolucao=markdown_para_html)
+
+def pre_resolver_exercicio(exercicio_texto):
+    # A resolução fica no cache de respostas, onde a próxima seleção do exercício a encontra
+    if pipeline.resolver_exercicio_com_gemini(exercicio_texto) == MENSAGEM_FALHA_RESOLUCAO:
+        raise RuntimeError("o Gemini não gerou a resolução")
+
+# Cede a vez às requisições dos usuários quando metade das chamadas simultâneas permitidas estão em uso
+pre_resolvedor = PreResolvedor(session_data_store, pre_resolver_exercicio,
+                               ocupado=lambda: pipeline.modelo.estatisticas()['em_voo'] >= max(1, app.config['GEMINI_MAX_EM_VOO'] // 2),
+                               proximas=app.config['PRE_RESOLUCAO_PROXIMAS'],
+                               orcamento_por_sessao=app.config['PRE_RESOLUCAO_ORCAMENTO'],
+                               max_trabalhadores=app.config['PRE_RESOLUCAO_TRABALHADORES'])
+
+def agendar_pre_resolucao(session_id, session_data, ignorar_ids=()):
+    if app.config['PRE_RESOLUCAO']:
+        pre_resolvedor.agendar(session_id, session_data, ignorar_ids)
+
+# --- Métricas ---
+@before_render_template.connect_via(app)
+def _iniciar_cronometro_do_template(sender, template, context, **extra):
+    g.inicio_renderizacao = time.perf_counter()
+
+@template_rendered.connect_via(app)
+def _registrar_renderizacao(sender, template, context, **extra):
+    inicio = g.pop('inicio_renderizacao', None)
+    if inicio is not None:
+        DURACAO_ETAPA.observar(time.perf_counter() - inicio, etapa='renderizacao', detalhe=template.name)
+
+registro.medidor('estuda_ai_cache', "Contadores dos caches em disco (acertos, falhas, remoções e itens) deste processo.",
+                 ('cache', 'contador'),
+                 lambda: {(nome, contador): valor
+                          for nome, cache in (('respostas', pipeline.cache_respostas), ('documentos', pipeline.cache_documentos),
+                                              ('html', cache_html))
+                          for contador, valor in cache.estatisticas().items()})
+registro.medidor('estuda_ai_similares', "Consultas, acertos e exercícios no índice de exercícios quase idênticos.",
+                 ('contador',), lambda: ({(contador,): valor for contador, valor in pipeline.indice_de_similares.estatisticas().items()}
+                                         if pipeline.indice_de_similares is not None else {}))
+registro.medidor('estuda_ai_sessoes', "Tamanho e remoções do armazenamento de sessões.", ('contador',),
+                 lambda: {(contador,): valor for contador, valor in session_data_store.estatisticas().items()})
+registro.medidor('estuda_ai_uploads', "Bytes armazenados, uploads deduplicados, arquivos removidos e em uso na pasta de uploads.",
+                 ('contador',), lambda: {(contador,): valor for contador, valor in armazenamento_de_uploads.estatisticas().items()})
+registro.medidor('estuda_ai_pre_resolucao', "Pré-resoluções agendadas, concluídas, canceladas e recusadas por orçamento.",
+                 ('contador',), lambda: {(contador,): valor for contador, valor in pre_resolvedor.estatisticas().items()})
+registro.medidor('estuda_ai_gemini', "Chamadas, novas tentativas, falhas e limitações do cliente do Gemini deste processo.",
+                 ('contador',), lambda: {(contador,): valor for contador, valor in pipeline.modelo.estatisticas().items()})
+
+@app.route('/metrics')
+def metrics():
+    return registro.exportar(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
 
 # --- ROTAS FLASK ---
+@app.errorhandler(413)
+def arquivo_grande_demais(erro):
+    mensagem = f"O arquivo passa do limite de {app.config['UPLOAD_MAX_MB']:g} MB."
+    return render_template('error.html', message=mensagem), 413
+
 
 @app.route('/')
 def index():
@@ -157,230 +165,418 @@ def index():
     return render_template('index.html')
 
 @app.route('/upload', methods=['POST'])
-def upload_file():
+async def upload_file():
     if 'pdf_file' not in request.files:
-        print("DEBUG: 'pdf_file' não encontrado no request.files.")
+        logger.debug("'pdf_file' não encontrado no request.files.")
         return redirect(request.url)
 
     file = request.files['pdf_file']
     file_type = request.form.get('pdf_type')
 
     if file.filename == '':
-        print("DEBUG: Nome do arquivo vazio.")
+        logger.debug("Nome do arquivo vazio.")
         return render_template('error.html', message="Nenhum arquivo PDF selecionado.")
 
     if not file or not allowed_file(file.filename):
-        print(f"DEBUG: Arquivo não permitido ou ausente. Nome: {file.filename}, Permitido: {allowed_file(file.filename)}")
+        logger.debug("Arquivo não permitido ou ausente. Nome: %s, Permitido: %s", file.filename, allowed_file(file.filename))
         return render_template('error.html', message="Tipo de arquivo não permitido (apenas PDFs) ou arquivo ausente.")
 
-    filename = file.filename
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    file.save(filepath)
-    print(f"DEBUG: Arquivo salvo em: {filepath}")
+    try:
+        with DURACAO_ETAPA.cronometrar(etapa='salvar_arquivo'):
+            hash_do_pdf, filepath = await asyncio.to_thread(armazenamento_de_uploads.salvar, file.stream)
+    except ArquivoGrandeDemais as e:
+        logger.debug("Upload de '%s' recusado: %s", file.filename, e)
+        return render_template('error.html', message=str(e)), 413
+    logger.debug("Arquivo '%s' salvo em: %s", file.filename, filepath)
+    logger.debug("Tipo de PDF selecionado: %s", file_type)
+
+    sessao_anterior = session.get('session_id')
+    if sessao_anterior:
+        # Um novo upload substitui a sessão anterior: a pré-resolução dela para e os dados saem do armazenamento
+        pre_resolvedor.cancelar(sessao_anterior)
+        try:
+            del session_data_store[sessao_anterior]
+        except KeyError: # Já expirou
+            pass
+    current_session_id = str(uuid.uuid4())
+    session['session_id'] = current_session_id
+
+    # Mesmo arquivo, mesmo modo de extração, mesmo prompt e modelo: reaproveita as questões já identificadas
+    chave_exercicios = pipeline.chave_cache_exercicios(hash_do_pdf, file_type)
+    exercicios_identificados = await asyncio.to_thread(pipeline.cache_documentos.obter, chave_exercicios)
+    if exercicios_identificados is not None:
+        logger.debug("Questões encontradas no cache de documentos. Pulando extração e identificação.")
+        dados_de_sessao = novos_dados_de_sessao(exercicios_identificados)
+        session_data_store[current_session_id] = dados_de_sessao
+        agendar_pre_resolucao(current_session_id, dados_de_sessao)
+        return redirect(url_for('select_questions'))
+
+    # Extração e identificação rodam em segundo plano; o navegador acompanha pela página de processamento
+    job_id = gerenciador_de_trabalhos.enfileirar(current_session_id, processar_upload,
+                                                 hash_do_pdf, file_type, chave_exercicios)
+    logger.debug("Trabalho %s enfileirado para a sessão %s.", job_id, current_session_id)
+    if request.accept_mimetypes.best == 'application/json':
+        return json.dumps({
+            'job_id': job_id,
+            'status_url': url_for('upload_status', job_id=job_id)
+        }), 202, {'Content-Type': 'application/json'}
+    return redirect(url_for('processing', job_id=job_id))
 
-    texto_do_pdf = ""
-    if file_type == 'text_only':
-        print(f"DEBUG: Tentando extrair com PyPDF2 para '{filepath}'")
-        texto_do_pdf = extrair_texto_pypdf2(filepath)
-    elif file_type == 'mixed_content':
-        print(f"DEBUG: Tentando extrair com pdfplumber para '{filepath}'")
-        texto_do_pdf = extrair_texto_pdfplumber(filepath)
-    elif file_type == 'scanned_book' or file_type == 'scanned_handwritten':
-        print(f"DEBUG: Tentando extrair com OCR (placeholder) para '{filepath}'")
-        texto_do_pdf = extrair_texto_ocr(filepath)
 
-    print(f"DEBUG: Tipo de PDF selecionado: {file_type}")
-    print(f"DEBUG: Texto do PDF (primeiros 200 chars): {texto_do_pdf[:200] if texto_do_pdf else 'Nenhum texto extraído'}")
+def novos_dados_de_sessao(exercicios_identificados):
+    return {'exercicios': BancoDeExercicios(exercicios_identificados)}
 
-    if not texto_do_pdf or texto_do_pdf.strip() == "Texto não extraído: OCR não implementado.":
-        print(f"DEBUG: Condição de erro de extração ativada. Texto extraído: {texto_do_pdf}")
-        return render_template('error.html', message="Erro ao extrair texto do PDF ou tipo de PDF não suportado ainda para OCR.")
 
-    texto_exercicios_do_gemini = identificar_exercicios_com_gemini(texto_do_pdf, model)
-    exercicios_identificados = parsear_exercicios_do_gemini(texto_exercicios_do_gemini)
+def processar_upload(trabalho, hash_do_pdf, file_type, chave_exercicios):
+    """Extrai o texto e identifica as questões do PDF, informando cada etapa ao `trabalho`."""
+    with armazenamento_de_uploads.em_uso(hash_do_pdf) as filepath:
+        exercicios_identificados, erro = pipeline.extrair_e_identificar(filepath, hash_do_pdf, file_type, chave_exercicios,
+                                                                        trabalho.atualizar)
+    if erro:
+        trabalho.falhar(erro)
+        return
 
-    if not exercicios_identificados:
-        print("DEBUG: Gemini não identificou questões.")
-        return render_template('error.html', message="O Gemini não conseguiu identificar nenhuma questão no PDF.")
+    dados_de_sessao = novos_dados_de_sessao(exercicios_identificados)
+    trabalho.atualizar(ETAPA_PRONTO, **dados_de_sessao)
+    agendar_pre_resolucao(trabalho.session_id, dados_de_sessao)
+    logger.debug("Dados da sessão armazenados em session_data_store[%s]", trabalho.session_id)
 
-    current_session_id = str(uuid.uuid4())
-    session['session_id'] = current_session_id
 
-    session_data_store[current_session_id] = {
-        'all_exercicios': [{'id': i, 'texto': ex, 'respondida': False, 'resolucao': None, 'similares': []} for i, ex in enumerate(exercicios_identificados)], # NOVO: Adiciona campos para resolucao e similares aqui
-        'exercicios_respondidos_ids': []
+def redirecionar_para_processamento(session_data):
+    """Leva o usuário à página de acompanhamento enquanto o upload da sessão ainda está sendo processado."""
+    if 'trabalho' in session_data:
+        return redirect(url_for('processing', job_id=session_data['trabalho']['id']))
+    return redirect(url_for('index'))
+
+
+@app.route('/processing/<job_id>')
+def processing(job_id):
+    estado = gerenciador_de_trabalhos.estado(session.get('session_id'))
+    if not estado or estado['id'] != job_id:
+        return redirect(url_for('index'))
+    if estado['etapa'] == ETAPA_PRONTO:
+        return redirect(url_for('select_questions'))
+    return render_template('processing.html', job_id=job_id)
+
+
+@app.route('/upload_status/<job_id>')
+def upload_status(job_id):
+    estado = gerenciador_de_trabalhos.estado(session.get('session_id'))
+    if not estado or estado['id'] != job_id:
+        return json.dumps({
+            'status': 'error',
+            'message': 'Processamento não encontrado para esta sessão.'
+        }), 404, {'Content-Type': 'application/json'}
+
+    resposta = {
+        'status': 'success',
+        'job_id': job_id,
+        'etapa': estado['etapa'],
+        'etapas': ETAPAS,
+        'tempo_decorrido': estado['tempo_decorrido'],
+        'erro': estado['erro'],
     }
-    print(f"DEBUG: Dados da sessão armazenados em session_data_store[{current_session_id}]")
+    if estado['etapa'] == ETAPA_PRONTO:
+        resposta['redirect'] = url_for('select_questions')
+    return json.dumps(resposta), 200, {'Content-Type': 'application/json'}
+
 
-    print("DEBUG: Redirecionando para select_questions.")
-    return redirect(url_for('select_questions'))
+def registrar_resolucoes(resolucoes, ids_pendentes=None):
+    """
+    Alteração para `session_data_store.atualizar`: salva as resoluções ({id: resolucao}) e marca os exercícios
+    como respondidos; com `ids_pendentes`, guarda também os que serão resolvidos por /stream_resolutions.
+    """
+    def alterar(session_data):
+        exercicios = session_data.get('exercicios')
+        if exercicios is None:
+            return
+        for id_exercicio, resolucao in resolucoes.items():
+            exercicio_info = exercicios.get(id_exercicio)
+            if exercicio_info is not None:
+                exercicio_info.resolucao = resolucao
+                exercicios.marcar_respondida(id_exercicio)
+        if ids_pendentes is not None:
+            session_data['resolucoes_pendentes'] = ids_pendentes
+    return alterar
 
 
 @app.route('/select_questions', methods=['GET', 'POST'])
-def select_questions():
+async def select_questions():
     current_session_id = session.get('session_id')
-    if not current_session_id or current_session_id not in session_data_store:
-        print("DEBUG: select_questions - ID de sessão não encontrado ou inválido. Redirecionando para index.")
+    session_data = session_data_store.get(current_session_id) if current_session_id else None
+    if session_data is None:
+        logger.debug("select_questions - ID de sessão não encontrado ou inválido. Redirecionando para index.")
         return redirect(url_for('index'))
 
-    session_data = session_data_store[current_session_id]
-    all_exercicios = session_data['all_exercicios']
-    exercicios_respondidos_ids = session_data['exercicios_respondidos_ids']
-
-    num_total_exercicios = len(all_exercicios)
-    exercicios_disponiveis = [ex for ex in all_exercicios if not ex['respondida']]
-    num_disponiveis = len(exercicios_disponiveis)
+    if 'exercicios' not in session_data:
+        return redirecionar_para_processamento(session_data)
+    exercicios = session_data['exercicios']
+    num_disponiveis = exercicios.num_disponiveis
 
     if request.method == 'POST':
         num_questions_str = request.form.get('num_questions')
         selection_mode = request.form.get('selection_mode')
 
-        print(f"DEBUG: select_questions - POST recebido. Questões a resolver: {num_questions_str}, Modo: {selection_mode}")
+        logger.debug("select_questions - POST recebido. Questões a resolver: %s, Modo: %s", num_questions_str, selection_mode)
 
         try:
             num_questions_to_resolve = int(num_questions_str)
             if not (1 <= num_questions_to_resolve <= num_disponiveis):
                 raise ValueError("Número de questões inválido.")
         except ValueError:
-            print(f"DEBUG: select_questions - Valor de questões inválido: {num_questions_str}")
+            logger.debug("select_questions - Valor de questões inválido: %s", num_questions_str)
             return render_template('select_questions.html',
-                                   all_exercicios=all_exercicios,
+                                   exercicios=exercicios,
                                    num_disponiveis=num_disponiveis,
                                    error="Por favor, insira um número válido de questões (entre 1 e {}).".format(num_disponiveis))
 
         exercicios_para_resolver_agora = []
         if selection_mode == 'sequential':
-            for ex in all_exercicios:
-                if not ex['respondida'] and len(exercicios_para_resolver_agora) < num_questions_to_resolve:
-                    exercicios_para_resolver_agora.append(ex)
+            exercicios_para_resolver_agora = exercicios.proximos(num_questions_to_resolve)
         elif selection_mode == 'random':
-            exercicios_para_resolver_agora = random.sample(exercicios_disponiveis, num_questions_to_resolve)
-
-        print(f"DEBUG: select_questions - {len(exercicios_para_resolver_agora)} exercícios selecionados para resolução.")
+            exercicios_para_resolver_agora = exercicios.sortear(num_questions_to_resolve)
+
+        logger.debug("select_questions - %s exercícios selecionados para resolução.", len(exercicios_para_resolver_agora))
+
+        pendentes = [ex for ex in exercicios_para_resolver_agora if ex.resolucao is None]
+        falhas = {}
+        resolucoes_novas = {}
+        ids_pendentes = None
+        if app.config['RESOLUCAO_STREAMING']:
+            # As resoluções pendentes são enviadas ao navegador por /stream_resolutions à medida que são geradas
+            ids_pendentes = [ex.id for ex in pendentes]
+            logger.debug("select_questions - %s resolução(ões) serão enviadas em streaming.", len(pendentes))
+        else:
+            # Resolve em paralelo apenas os exercícios que ainda não têm resolução salva
+            logger.debug("select_questions - Chamando Gemini para %s exercício(s) (máx. %s simultâneos).", len(pendentes), app.config['MAX_RESOLUCOES_SIMULTANEAS'])
+            if app.config['RESOLUCAO_EM_LOTE']:
+                resolucoes = await asyncio.to_thread(pipeline.resolver_exercicios_em_lote, [ex.texto for ex in pendentes])
+            else:
+                resolucoes = await executar_em_paralelo_async(lambda ex: pipeline.resolver_exercicio_com_gemini_async(ex.texto),
+                                                              pendentes,
+                                                              app.config['MAX_RESOLUCOES_SIMULTANEAS'])
+            for exercicio_info, resolucao in zip(pendentes, resolucoes):
+                if resolucao['erro'] or resolucao['resultado'] == MENSAGEM_FALHA_RESOLUCAO:
+                    # Falhas não são salvas, para que o exercício possa ser resolvido novamente depois
+                    falhas[exercicio_info.id] = resolucao['erro'] or MENSAGEM_FALHA_RESOLUCAO
+                    logger.debug("select_questions - Falha ao resolver o exercício (ID: %s): %s", exercicio_info.id, falhas[exercicio_info.id])
+                else:
+                    resolucoes_novas[exercicio_info.id] = resolucao['resultado']
+                    logger.debug("select_questions - Resolução do exercício (ID: %s) concluída em %.2fs.", exercicio_info.id, resolucao['duracao'])
 
         resultados_atuais = []
-        for i, exercicio_info in enumerate(exercicios_para_resolver_agora):
-            print(f"DEBUG: select_questions - Iniciando processamento do exercício {i+1}/{num_questions_to_resolve} (ID: {exercicio_info['id']}).")
-            exercicio_original = exercicio_info['texto']
-
-            # NOVO: Verifica se a resolução já existe para evitar chamadas duplicadas
-            if exercicio_info['resolucao'] is None:
-                print(f"DEBUG: select_questions - Chamando Gemini para resolver o exercício original (ID: {exercicio_info['id']}).")
-                resolucao_original = resolver_exercicio_com_gemini(exercicio_original, model)
-                exercicio_info['resolucao'] = resolucao_original # Salva a resolução no objeto do exercício
-                print(f"DEBUG: select_questions - Resolução original do exercício (ID: {exercicio_info['id']}) concluída.")
-            else:
-                resolucao_original = exercicio_info['resolucao']
-                print(f"DEBUG: select_questions - Resolução do exercício (ID: {exercicio_info['id']}) já existente.")
-
-
-            # NOVO: Removendo a geração de exercícios similares AUTOMATICAMENTE
-            # exercicios_similares_raw = gerar_exercicios_similares_com_gemini(exercicio_original, resolucao_original, model, quantidade=2)
-            # exercicios_similares_parsed = parsear_exercicios_do_gemini(exercicios_similares_raw)
-            # print(f"DEBUG: select_questions - Geração de similares para o exercício (ID: {exercicio_info['id']}) concluída. Encontrados {len(exercicios_similares_parsed)} similares.")
-
-            # resultados_similares = []
-            # for j, similar_ex in enumerate(exercicios_similares_parsed):
-            #     print(f"DEBUG: select_questions - Chamando Gemini para resolver o exercício similar {j+1} do original (ID: {exercicio_info['id']}).")
-            #     resolucao_similar = resolver_exercicio_com_gemini(similar_ex, model)
-            #     print(f"DEBUG: select_questions - Resolução do similar {j+1} concluída.")
-            #     resultados_similares.append({
-            #         'texto': similar_ex,
-            #         'resolucao': resolucao_similar
-            #     })
-            # exercicio_info['similares'] = resultados_similares # Salva os similares no objeto do exercício
-
-            # Marcar o exercício como respondido e adicionar ao controle de IDs
-            if not exercicio_info['respondida']:
-                exercicio_info['respondida'] = True
-                exercicios_respondidos_ids.append(exercicio_info['id'])
+        respondidas = {} # Os pendentes são marcados quando o streaming da resolução termina
+        for exercicio_info in exercicios_para_resolver_agora:
+            falhou = exercicio_info.id in falhas
+            resolucao = resolucoes_novas.get(exercicio_info.id, exercicio_info.resolucao)
+            pendente = resolucao is None and not falhou
+            if not falhou and not pendente:
+                respondidas[exercicio_info.id] = resolucao
 
             resultados_atuais.append({
-                'id': exercicio_info['id'] + 1,
-                'original': exercicio_original,
-                'resolucao_original': resolucao_original,
-                'similares': exercicio_info['similares'] # Agora virá vazio, ou preenchido sob demanda futura
+                'id': exercicio_info.id + 1,
+                'original': exercicio_info.texto,
+                'resolucao_original': MENSAGEM_FALHA_RESOLUCAO if falhou else resolucao,
+                'erro': falhas.get(exercicio_info.id),
+                'pendente': pendente,
+                'similares': exercicio_info.similares # Vazio até o usuário pedir similares
             })
-        
-        print(f"DEBUG: select_questions - Todas as {len(resultados_atuais)} resoluções concluídas. Renderizando results.html.")
-        
-        # Garante que as atualizações sejam salvas de volta no dicionário global (aponta para o mesmo objeto, mas explicitando)
-        session_data_store[current_session_id]['all_exercicios'] = all_exercicios
-        session_data_store[current_session_id]['exercicios_respondidos_ids'] = list(set(exercicios_respondidos_ids))
 
+        logger.debug("select_questions - Todas as %s resoluções concluídas. Renderizando results.html.", len(resultados_atuais))
+        
+        # Aplica as mudanças à sessão atual, e não à cópia lida no começo: outras requisições (similares,
+        # streaming) podem tê-la alterado enquanto o modelo respondia
+        session_data = session_data_store.atualizar(current_session_id, registrar_resolucoes(respondidas, ids_pendentes)) or session_data
+        exercicios = session_data['exercicios']
 
+        ids_pendentes = set(ids_pendentes or [])
+        agendar_pre_resolucao(current_session_id, session_data, ignorar_ids=ids_pendentes)
         return render_template('results.html',
                                results=resultados_atuais,
-                               num_exercicios_total=num_total_exercicios,
-                               num_exercicios_disponiveis=len([ex for ex in all_exercicios if not ex['respondida']]),
-                               exercicios_respondidos_ids=session_data_store[current_session_id]['exercicios_respondidos_ids'])
-
-    print("DEBUG: select_questions - Método GET. Renderizando select_questions.html.")
+                               num_exercicios_total=len(exercicios),
+                               # Os que estão em streaming ainda não foram marcados, mas já não estão disponíveis
+                               num_exercicios_disponiveis=exercicios.num_disponiveis - len(ids_pendentes),
+                               streaming=bool(ids_pendentes),
+                               quantidade_similares=app.config['SIMILARES_QUANTIDADE_PADRAO'],
+                               max_similares=app.config['SIMILARES_MAX_QUANTIDADE'])
+
+    logger.debug("select_questions - Método GET. Renderizando select_questions.html.")
     return render_template('select_questions.html',
-                           all_exercicios=all_exercicios,
+                           exercicios=exercicios,
                            num_disponiveis=num_disponiveis)
 
 
+# --- Rota que envia as resoluções pendentes em streaming (Server-Sent Events) ---
+def evento_sse(evento, dados):
+    return f"event: {evento}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n"
+
+@app.route('/stream_resolutions')
+def stream_resolutions():
+    current_session_id = session.get('session_id')
+    session_data = session_data_store.get(current_session_id) if current_session_id else None
+    if session_data is None:
+        return redirect(url_for('index'))
+    if 'exercicios' not in session_data:
+        return redirecionar_para_processamento(session_data)
+
+    ids_pendentes = []
+    session_data = session_data_store.atualizar(current_session_id,
+                                                lambda dados: ids_pendentes.extend(dados.pop('resolucoes_pendentes', [])))
+    if session_data is None:
+        return redirect(url_for('index'))
+    exercicios = session_data['exercicios']
+    pendentes = [exercicios.get(i) for i in ids_pendentes if exercicios.get(i) is not None]
+
+    fila = queue.Queue()
+    cancelado = threading.Event()
+
+    def resolver_em_streaming(exercicio_info):
+        partes = []
+        try:
+            for parte in pipeline.resolver_exercicio_com_gemini_em_streaming(exercicio_info.texto):
+                if cancelado.is_set():
+                    return
+                partes.append(parte)
+                fila.put(('delta', exercicio_info, parte))
+            fila.put(('fim', exercicio_info, "".join(partes)))
+        except Exception as e:
+            logger.error("Erro ao chamar a API do Gemini para este exercício: %s", e)
+            fila.put(('erro', exercicio_info, MENSAGEM_FALHA_RESOLUCAO))
+
+    def gerar_eventos():
+        if not pendentes:
+            yield evento_sse('done', {})
+            return
+        executor = ThreadPoolExecutor(max_workers=min(len(pendentes), app.config['MAX_RESOLUCOES_SIMULTANEAS']))
+        for exercicio_info in pendentes:
+            executor.submit(resolver_em_streaming, exercicio_info)
+        try:
+            restantes = len(pendentes)
+            while restantes:
+                tipo, exercicio_info, texto = fila.get()
+                dados = {'id': exercicio_info.id + 1, 'texto': texto}
+                if tipo == 'delta':
+                    yield evento_sse('delta', dados)
+                    continue
+
+                restantes -= 1
+                if tipo == 'fim':
+                    # Salva a resolução completa e marca o exercício como respondido
+                    session_data_store.atualizar(current_session_id, registrar_resolucoes({exercicio_info.id: texto}))
+                    logger.debug("stream_resolutions - Resolução do exercício (ID: %s) concluída.", exercicio_info.id)
+                    dados['html'] = markdown_para_html(texto)
+                yield evento_sse('fim' if tipo == 'fim' else 'erro', dados)
+            yield evento_sse('done', {})
+        finally:
+            cancelado.set()
+            executor.shutdown(wait=False)
+
+    return Response(gerar_eventos(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
 # --- Rota para gerar exercícios similares sob demanda ---
+def ler_quantidade_de_similares():
+    """Quantidade pedida no formulário, na query string ou no corpo JSON, limitada a SIMILARES_MAX_QUANTIDADE; None se inválida."""
+    dados = request.get_json(silent=True)
+    dados = dados if isinstance(dados, dict) else {}
+    valor = request.values.get('quantidade', dados.get('quantidade', app.config['SIMILARES_QUANTIDADE_PADRAO']))
+    try:
+        quantidade = int(valor)
+    except (TypeError, ValueError):
+        return None
+    return min(max(quantidade, 1), app.config['SIMILARES_MAX_QUANTIDADE'])
+
+def salvar_similares(session_id, exercise_id, similares):
+    # Sobre a sessão atual: a geração pode levar um tempo, e outras requisições podem tê-la alterado
+    def alterar(session_data):
+        exercicio_info = session_data['exercicios'].get(exercise_id - 1) if 'exercicios' in session_data else None
+        if exercicio_info is not None:
+            exercicio_info.similares = similares # Armazena os similares no objeto do exercício
+    session_data_store.atualizar(session_id, alterar)
+
 @app.route('/generate_similar/<int:exercise_id>', methods=['POST'])
-def generate_similar(exercise_id):
+async def generate_similar(exercise_id):
     current_session_id = session.get('session_id')
-    if not current_session_id or current_session_id not in session_data_store:
+    session_data = session_data_store.get(current_session_id) if current_session_id else None
+    if session_data is None:
         return redirect(url_for('index'))
 
-    session_data = session_data_store[current_session_id]
-    all_exercicios = session_data['all_exercicios']
-
+    if 'exercicios' not in session_data:
+        return redirecionar_para_processamento(session_data)
     # Encontra o exercício pelo ID (lembre-se que o ID no session_data_store começa do 0)
-    exercicio_info = next((ex for ex in all_exercicios if ex['id'] == exercise_id - 1), None)
-
-    if exercicio_info and exercicio_info['resolucao']:
-        print(f"DEBUG: Gerando similares para o exercício ID {exercise_id}")
-        exercicios_similares_raw = gerar_exercicios_similares_com_gemini(exercicio_info['texto'], exercicio_info['resolucao'], model, quantidade=2)
-        exercicios_similares_parsed = parsear_exercicios_do_gemini(exercicios_similares_raw)
-
-        resultados_similares = []
-        for j, similar_ex in enumerate(exercicios_similares_parsed):
-            print(f"DEBUG: Chamando Gemini para resolver o exercício similar {j+1} do original (ID: {exercise_id}).")
-            resolucao_similar = resolver_exercicio_com_gemini(similar_ex, model)
-            resultados_similares.append({
-                'texto': similar_ex,
-                'resolucao': resolucao_similar
-            })
-        
-        exercicio_info['similares'] = resultados_similares # Armazena os similares no objeto do exercício
+    exercicio_info = session_data['exercicios'].get(exercise_id - 1)
 
-        # Como os dados do exercício_info estão sendo atualizados, o session_data_store
-        # já refletirá as mudanças (pois é um dicionário e objetos são passados por referência)
-        # return redirect(url_for('results')) # Talvez redirecionar para a página de resultados ou uma visualização específica
-        # Por enquanto, vamos retornar um JSON simples, mas a UX aqui precisará de mais atenção no front-end.
+    quantidade = ler_quantidade_de_similares()
+    if quantidade is None:
         return json.dumps({
-            'status': 'success',
-            'exercise_id': exercise_id,
-            'similares': resultados_similares
-        }), 200, {'Content-Type': 'application/json'}
-    else:
-        print(f"DEBUG: Falha ao gerar similares para o exercício ID {exercise_id}. Resolução não encontrada.")
+            'status': 'error',
+            'message': 'Quantidade de exercícios similares inválida.'
+        }), 400, {'Content-Type': 'application/json'}
+
+    if not (exercicio_info and exercicio_info.resolucao):
+        logger.debug("Falha ao gerar similares para o exercício ID %s. Resolução não encontrada.", exercise_id)
         return json.dumps({
             'status': 'error',
             'message': 'Exercício ou resolução não encontrada para gerar similares.'
         }), 400, {'Content-Type': 'application/json'}
 
+    logger.debug("Gerando %s similar(es) para o exercício ID %s", quantidade, exercise_id)
+
+    # Quem aceita NDJSON recebe uma linha por similar assim que ele fica pronto (o servidor itera o gerador)
+    if request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson']) == 'application/x-ndjson':
+        similares_resolvidos = pipeline.gerar_similares_resolvidos(exercicio_info.texto, exercicio_info.resolucao, quantidade)
+
+        def gerar_linhas():
+            similares = []
+            try:
+                for similar in similares_resolvidos:
+                    similares.append(similar)
+                    yield json.dumps({'tipo': 'similar', 'exercise_id': exercise_id, **com_html(similar)}, ensure_ascii=False) + "\n"
+            except Exception as e:
+                logger.error("Erro ao gerar exercícios similares: %s", e)
+            finally:
+                if similares:
+                    salvar_similares(current_session_id, exercise_id, similares)
+            if similares:
+                yield json.dumps({'tipo': 'fim', 'exercise_id': exercise_id, 'total': len(similares)}) + "\n"
+            else:
+                yield json.dumps({'tipo': 'erro', 'exercise_id': exercise_id,
+                                  'message': 'Não foi possível gerar exercícios similares.'}, ensure_ascii=False) + "\n"
+
+        return Response(gerar_linhas(), mimetype='application/x-ndjson',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+    resultados_similares = await pipeline.gerar_similares_resolvidos_async(exercicio_info.texto, exercicio_info.resolucao, quantidade)
+    if not resultados_similares:
+        return json.dumps({
+            'status': 'error',
+            'message': 'Não foi possível gerar exercícios similares.'
+        }), 502, {'Content-Type': 'application/json'}
+    salvar_similares(current_session_id, exercise_id, resultados_similares)
+    return json.dumps({
+        'status': 'success',
+        'exercise_id': exercise_id,
+        'similares': [com_html(similar) for similar in resultados_similares]
+    }), 200, {'Content-Type': 'application/json'}
+
 
 @app.route('/answered_questions')
 def answered_questions():
     current_session_id = session.get('session_id')
-    if not current_session_id or current_session_id not in session_data_store:
+    session_data = session_data_store.get(current_session_id) if current_session_id else None
+    if session_data is None:
         return redirect(url_for('index'))
 
-    session_data = session_data_store[current_session_id]
-    all_exercicios = session_data['all_exercicios']
-    exercicios_respondidos_ids = session_data['exercicios_respondidos_ids']
-
-    answered_list = [ex for ex in all_exercicios if ex['id'] in exercicios_respondidos_ids]
+    if 'exercicios' not in session_data:
+        return redirecionar_para_processamento(session_data)
+    answered_list = session_data['exercicios'].respondidos()
 
     return render_template('answered_questions.html', answered_list=answered_list)
 
+# Para servidores ASGI (uvicorn app:asgi_app): as views async esperam o modelo sem ocupar uma thread cada
+asgi_app = WsgiToAsgi(app)
+
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
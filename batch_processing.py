@@ -0,0 +1,314 @@
+"""
+Processamento em lote de PDFs, sem o servidor web, para montar bancos de questões.
+
+Cada PDF passa por extração, identificação, resolução e, opcionalmente, geração de exercícios similares
+(já resolvidos), com os arquivos distribuídos entre processos. O progresso fica em um checkpoint SQLite,
+por arquivo e por exercício: uma execução interrompida, rodada de novo com os mesmos argumentos, continua
+de onde parou sem repetir as chamadas ao modelo já concluídas. Arquivos são identificados pelo hash do
+conteúdo, então renomear ou mover um PDF não faz com que ele seja processado de novo.
+
+A saída é um arquivo JSONL (uma linha por exercício, gravada quando o arquivo termina) ou um banco SQLite
+(.db/.sqlite), que é o próprio checkpoint. As opções da aplicação (GEMINI_BACKEND, CACHE_DB,
+NORMALIZACAO_TEXTO...) valem aqui também, e o cache de respostas é compartilhado com ela.
+
+Uso:
+    python batch_processing.py listas/ --saida banco.jsonl --similares 2 --processos 4
+    python batch_processing.py "listas/**/*.pdf" --saida banco.db
+"""
+import argparse
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+import estuda_ai # Submódulos carregados no primeiro uso, depois que os processos ajustam o ambiente
+
+logger = logging.getLogger(__name__)
+
+FORMATO_DO_LOG = "%(asctime)s %(levelname)s [%(name)s] %(message)s"
+
+ESTADO_IDENTIFICADO = 'identificado' # Questões salvas; resoluções em andamento
+ESTADO_CONCLUIDO = 'concluido' # Todas as questões resolvidas
+ESTADO_EXPORTADO = 'exportado' # Linhas já gravadas no JSONL
+ESTADO_FALHOU = 'falhou' # Extração ou identificação falhou; tentado de novo na próxima execução
+
+
+class CheckpointDoLote:
+    """
+    Progresso do lote em SQLite: o estado de cada arquivo (pelo hash) e cada exercício com a sua resolução
+    e os seus similares. Vários processos gravam ao mesmo tempo (WAL), cada exercício em uma transação.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        self.conexao = sqlite3.connect(caminho, timeout=60)
+        self.conexao.execute("PRAGMA journal_mode=WAL")
+        self.conexao.execute("PRAGMA synchronous=NORMAL")
+        with self.conexao:
+            self.conexao.execute("""
+                CREATE TABLE IF NOT EXISTS arquivos (
+                    hash TEXT PRIMARY KEY,
+                    caminho TEXT NOT NULL,
+                    estado TEXT NOT NULL,
+                    erro TEXT,
+                    atualizado_em REAL NOT NULL
+                )""")
+            self.conexao.execute("""
+                CREATE TABLE IF NOT EXISTS exercicios (
+                    hash TEXT NOT NULL,
+                    indice INTEGER NOT NULL,
+                    numero TEXT,
+                    pagina INTEGER,
+                    texto TEXT NOT NULL,
+                    resolucao TEXT,
+                    similares TEXT,
+                    PRIMARY KEY (hash, indice)
+                )""")
+
+    def estado(self, hash_do_pdf):
+        linha = self.conexao.execute("SELECT estado FROM arquivos WHERE hash = ?", (hash_do_pdf,)).fetchone()
+        return linha[0] if linha else None
+
+    def marcar(self, hash_do_pdf, caminho, estado, erro=None):
+        with self.conexao:
+            self.conexao.execute("""
+                INSERT INTO arquivos (hash, caminho, estado, erro, atualizado_em) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (hash) DO UPDATE SET caminho = excluded.caminho, estado = excluded.estado,
+                                                 erro = excluded.erro, atualizado_em = excluded.atualizado_em""",
+                                 (hash_do_pdf, caminho, estado, erro, time.time()))
+
+    def salvar_exercicios(self, hash_do_pdf, caminho, exercicios):
+        with self.conexao:
+            self.conexao.executemany("""
+                INSERT OR IGNORE INTO exercicios (hash, indice, numero, pagina, texto) VALUES (?, ?, ?, ?, ?)""",
+                                     [(hash_do_pdf, indice, exercicio.get('numero'), exercicio.get('pagina'), exercicio['texto'])
+                                      for indice, exercicio in enumerate(exercicios)])
+        self.marcar(hash_do_pdf, caminho, ESTADO_IDENTIFICADO)
+
+    def salvar_resultado(self, hash_do_pdf, indice, resolucao, similares):
+        with self.conexao:
+            self.conexao.execute("UPDATE exercicios SET resolucao = ?, similares = ? WHERE hash = ? AND indice = ?",
+                                 (resolucao, json.dumps(similares, ensure_ascii=False) if similares is not None else None,
+                                  hash_do_pdf, indice))
+
+    def exercicios(self, hash_do_pdf):
+        linhas = self.conexao.execute("""
+            SELECT indice, numero, pagina, texto, resolucao, similares FROM exercicios WHERE hash = ? ORDER BY indice""",
+                                      (hash_do_pdf,)).fetchall()
+        return [{'indice': indice, 'numero': numero, 'pagina': pagina, 'texto': texto, 'resolucao': resolucao,
+                 'similares': json.loads(similares) if similares is not None else None}
+                for indice, numero, pagina, texto, resolucao, similares in linhas]
+
+
+def listar_pdfs(entradas):
+    """PDFs das pastas (recursivamente), dos padrões glob e dos arquivos informados, sem repetições e em ordem."""
+    caminhos = set()
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            caminhos.update(glob.glob(os.path.join(entrada, '**', '*.pdf'), recursive=True))
+            caminhos.update(glob.glob(os.path.join(entrada, '**', '*.PDF'), recursive=True))
+        elif os.path.isfile(entrada):
+            caminhos.add(entrada)
+        else:
+            caminhos.update(caminho for caminho in glob.glob(entrada, recursive=True) if os.path.isfile(caminho))
+    return sorted(os.path.abspath(caminho) for caminho in caminhos)
+
+
+# --- Processos de trabalho ---
+_pipeline = None
+
+
+def _iniciar_processo(ambiente):
+    # Só o núcleo (estuda_ai): a aplicação web, com as sessões, os uploads e os seus threads, não é carregada.
+    # O ambiente é ajustado antes do primeiro uso do núcleo, que lê a configuração dele
+    global _pipeline
+    os.environ.update(ambiente)
+    logging.basicConfig(level=os.getenv('LOG_LEVEL', 'WARNING'), format=FORMATO_DO_LOG)
+    _pipeline = estuda_ai.Pipeline()
+
+
+def _resolver_exercicio(pipeline, exercicio, quantidade_similares):
+    resolucao = pipeline.resolver_exercicio_com_gemini(exercicio['texto'])
+    if resolucao == estuda_ai.MENSAGEM_FALHA_RESOLUCAO:
+        raise RuntimeError(resolucao)
+    similares = None
+    if quantidade_similares:
+        similares = list(pipeline.gerar_similares_resolvidos(exercicio['texto'], resolucao, quantidade_similares))
+        if len(similares) < quantidade_similares:
+            # Sem todos os similares pedidos: None no checkpoint, para que a próxima execução os gere de novo
+            similares = None
+    return resolucao, similares
+
+
+def processar_arquivo(caminho, caminho_checkpoint, tipo, quantidade_similares):
+    """
+    Processa um PDF em um processo de trabalho, gravando no checkpoint as questões identificadas e cada
+    exercício assim que ele termina. Retorna um resumo para as estatísticas.
+    """
+    pipeline = _pipeline
+    inicio = time.perf_counter()
+    chamadas_antes = pipeline.modelo.estatisticas()['chamadas']
+    checkpoint = CheckpointDoLote(caminho_checkpoint)
+    resumo = {'caminho': caminho, 'hash': None, 'pulado': False, 'erro': None, 'exercicios': 0,
+              'resolvidos': 0, 'similares': 0, 'falhas': 0}
+    try:
+        resumo['hash'] = hash_do_pdf = estuda_ai.hash_do_arquivo(caminho)
+        if checkpoint.estado(hash_do_pdf) in (ESTADO_CONCLUIDO, ESTADO_EXPORTADO):
+            resumo['pulado'] = True
+            return resumo
+
+        exercicios = checkpoint.exercicios(hash_do_pdf)
+        if not exercicios:
+            identificados, erro = pipeline.extrair_e_identificar(caminho, hash_do_pdf, tipo)
+            if erro:
+                checkpoint.marcar(hash_do_pdf, caminho, ESTADO_FALHOU, erro)
+                resumo['erro'] = erro
+                return resumo
+            checkpoint.salvar_exercicios(hash_do_pdf, caminho, identificados)
+            exercicios = checkpoint.exercicios(hash_do_pdf)
+        resumo['exercicios'] = len(exercicios)
+
+        # Sem resolução, ou sem os similares pedidos: o que faltou na execução anterior
+        pendentes = [exercicio for exercicio in exercicios
+                     if exercicio['resolucao'] is None or (quantidade_similares and exercicio['similares'] is None)]
+        if pendentes:
+            with ThreadPoolExecutor(max_workers=min(len(pendentes), pipeline.config['MAX_RESOLUCOES_SIMULTANEAS'])) as executor:
+                futuros = {executor.submit(_resolver_exercicio, pipeline, exercicio, quantidade_similares): exercicio
+                           for exercicio in pendentes}
+                for futuro in as_completed(futuros):
+                    exercicio = futuros[futuro]
+                    try:
+                        resolucao, similares = futuro.result()
+                    except Exception as e:
+                        logger.warning("Falha ao resolver o exercício %s de '%s': %s", exercicio['indice'] + 1, caminho, e)
+                        resumo['falhas'] += 1
+                        continue
+                    checkpoint.salvar_resultado(hash_do_pdf, exercicio['indice'], resolucao, similares)
+                    resumo['resolvidos'] += 1
+                    if quantidade_similares and similares is None:
+                        # A resolução fica salva; o arquivo só é concluído quando os similares vierem
+                        logger.warning("Similares incompletos para o exercício %s de '%s'.", exercicio['indice'] + 1, caminho)
+                        resumo['falhas'] += 1
+                        continue
+                    resumo['similares'] += len(similares or [])
+
+        # Uma cópia do mesmo PDF pode ter terminado (e sido exportada) enquanto este rodava
+        if not resumo['falhas'] and checkpoint.estado(hash_do_pdf) not in (ESTADO_CONCLUIDO, ESTADO_EXPORTADO):
+            checkpoint.marcar(hash_do_pdf, caminho, ESTADO_CONCLUIDO)
+        return resumo
+    except Exception as e:
+        logger.error("Erro ao processar '%s': %s", caminho, e)
+        resumo['erro'] = str(e)
+        return resumo
+    finally:
+        resumo['duracao'] = time.perf_counter() - inicio
+        resumo['chamadas'] = pipeline.modelo.estatisticas()['chamadas'] - chamadas_antes
+        checkpoint.conexao.close()
+
+
+# --- Processo principal ---
+def exportar_jsonl(checkpoint, hash_do_pdf, caminho, arquivo_saida):
+    """Grava as linhas do arquivo concluído no JSONL e só então o marca como exportado."""
+    for exercicio in checkpoint.exercicios(hash_do_pdf):
+        linha = {'arquivo': caminho, 'hash': hash_do_pdf, **exercicio}
+        arquivo_saida.write(json.dumps(linha, ensure_ascii=False) + "\n")
+    arquivo_saida.flush()
+    os.fsync(arquivo_saida.fileno())
+    checkpoint.marcar(hash_do_pdf, caminho, ESTADO_EXPORTADO)
+
+
+def ambiente_dos_processos(processos):
+    # Cada processo tem o seu cliente do Gemini: as cotas por minuto são divididas entre eles. A extração
+    # não abre outro pool de processos dentro de cada um, e nada roda em segundo plano além do lote
+    ambiente = {'EXTRACAO_PROCESSOS': '1', 'PRE_RESOLUCAO': '0', 'RESOLUCAO_EM_LOTE': '0'}
+    for variavel, padrao in (('GEMINI_REQUISICOES_POR_MINUTO', 1000), ('GEMINI_TOKENS_POR_MINUTO', 1000000),
+                             ('GEMINI_MAX_EM_VOO', 16)):
+        ambiente[variavel] = str(max(1, int(os.getenv(variavel, padrao)) // processos))
+    return ambiente
+
+
+def imprimir_estatisticas(resumos, duracao_total):
+    processados = [resumo for resumo in resumos if not resumo['pulado']]
+    exercicios = sum(resumo['resolvidos'] for resumo in processados)
+    duracoes = [resumo['duracao'] for resumo in processados if not resumo['erro']]
+    minutos = max(duracao_total, 1e-9) / 60
+    print(f"\n{len(resumos)} arquivo(s) em {duracao_total:.1f}s: {len(processados)} processado(s), "
+          f"{len(resumos) - len(processados)} já concluído(s) antes, "
+          f"{sum(1 for resumo in processados if resumo['erro'])} com erro, "
+          f"{sum(1 for resumo in processados if resumo['falhas'] and not resumo['erro'])} incompleto(s)")
+    print(f"{exercicios} exercício(s) resolvido(s), {sum(resumo['similares'] for resumo in processados)} similar(es), "
+          f"{sum(resumo['falhas'] for resumo in processados)} falha(s), "
+          f"{sum(resumo.get('chamadas', 0) for resumo in processados)} chamada(s) ao modelo")
+    print(f"{len(processados) / minutos:.2f} arquivos/min, {exercicios / minutos:.1f} exercícios/min"
+          + (f", {statistics.median(duracoes):.1f}s por arquivo (mediana)" if duracoes else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('entradas', nargs='+', help="pastas, arquivos PDF ou padrões glob")
+    parser.add_argument('--saida', required=True, help="arquivo .jsonl ou banco .db/.sqlite")
+    parser.add_argument('--checkpoint', help="banco do checkpoint (padrão: <saida>.checkpoint.db; para SQLite, a própria saída)")
+    parser.add_argument('--tipo', default='auto', choices=['auto', 'text_only', 'mixed_content', 'scanned_book', 'scanned_handwritten'],
+                        help="modo de extração, como no formulário de upload")
+    parser.add_argument('--similares', type=int, default=0, help="exercícios similares resolvidos por exercício")
+    parser.add_argument('--processos', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    load_dotenv() # Os processos de trabalho herdam o ambiente, com o .env já carregado
+    logging.basicConfig(level=os.getenv('LOG_LEVEL', 'WARNING'), format=FORMATO_DO_LOG)
+    em_sqlite = args.saida.lower().endswith(('.db', '.sqlite', '.sqlite3'))
+    caminho_checkpoint = args.saida if em_sqlite else (args.checkpoint or args.saida + '.checkpoint.db')
+    caminhos = listar_pdfs(args.entradas)
+    if not caminhos:
+        print("Nenhum PDF encontrado.")
+        return 1
+
+    checkpoint = CheckpointDoLote(caminho_checkpoint)
+    arquivo_saida = None if em_sqlite else open(args.saida, 'a', encoding='utf-8')
+    processos = max(1, min(args.processos, len(caminhos)))
+    metodos = multiprocessing.get_all_start_methods()
+    contexto = multiprocessing.get_context('forkserver' if 'forkserver' in metodos else 'spawn')
+    print(f"{len(caminhos)} PDF(s), {processos} processo(s), checkpoint em {caminho_checkpoint}")
+
+    resumos = []
+    inicio = time.perf_counter()
+    executor = ProcessPoolExecutor(max_workers=processos, mp_context=contexto, initializer=_iniciar_processo,
+                                   initargs=(ambiente_dos_processos(processos),))
+    try:
+        futuros = [executor.submit(processar_arquivo, caminho, caminho_checkpoint, args.tipo, args.similares)
+                   for caminho in caminhos]
+        for futuro in as_completed(futuros):
+            resumo = futuro.result()
+            resumos.append(resumo)
+            situacao = ('já concluído' if resumo['pulado'] else f"erro: {resumo['erro']}" if resumo['erro']
+                        else f"{resumo['resolvidos']}/{resumo['exercicios']} resolvido(s) em {resumo['duracao']:.1f}s")
+            print(f"[{len(resumos)}/{len(caminhos)}] {os.path.relpath(resumo['caminho'])}: {situacao}")
+            # Concluídos agora ou em uma execução anterior que parou antes de exportar
+            if arquivo_saida and resumo['hash'] and checkpoint.estado(resumo['hash']) == ESTADO_CONCLUIDO:
+                exportar_jsonl(checkpoint, resumo['hash'], resumo['caminho'], arquivo_saida)
+    except KeyboardInterrupt:
+        print("\nInterrompido: o progresso está no checkpoint; rode o mesmo comando para continuar.")
+        executor.shutdown(wait=False, cancel_futures=True)
+        imprimir_estatisticas(resumos, time.perf_counter() - inicio)
+        return 130
+    finally:
+        if arquivo_saida:
+            arquivo_saida.close()
+    executor.shutdown()
+    imprimir_estatisticas(resumos, time.perf_counter() - inicio)
+    return 0 if all(not resumo['erro'] and not resumo['falhas'] for resumo in resumos) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
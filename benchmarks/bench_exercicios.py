@@ -0,0 +1,102 @@
+"""
+Benchmark dos exercícios da sessão: o formato antigo (lista de dicionários mais a lista de ids respondidos)
+contra o BancoDeExercicios (exercise_store.py).
+
+Para cada tamanho, com metade dos exercícios já respondidos, mede o tempo das operações de cada requisição
+(próximos k, sorteio de k, busca por id, lista de respondidos), o tamanho serializado com pickle (o que o
+armazenamento de sessões em SQLite grava a cada requisição) e a memória ocupada.
+
+Uso:
+    python benchmarks/bench_exercicios.py --exercicios 1000 5000 20000
+"""
+import argparse
+import os
+import pickle
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from exercise_store import BancoDeExercicios
+
+K = 5
+
+
+def identificados(quantidade):
+    return [{'texto': f"{i + 1}. Calcule o valor de x na equação {i}x + 5 = {i + 15}.", 'numero': str(i + 1),
+             'pagina': i // 10 + 1} for i in range(quantidade)]
+
+
+def formato_antigo(exercicios, respondidos):
+    dados = {'all_exercicios': [{'id': i, 'texto': ex['texto'], 'numero': ex['numero'], 'pagina': ex['pagina'],
+                                 'respondida': False, 'resolucao': None, 'similares': []}
+                                for i, ex in enumerate(exercicios)],
+             'exercicios_respondidos_ids': []}
+    for i in respondidos:
+        dados['all_exercicios'][i]['respondida'] = True
+        dados['exercicios_respondidos_ids'].append(i)
+    return dados
+
+
+def formato_novo(exercicios, respondidos):
+    banco = BancoDeExercicios(exercicios)
+    for i in respondidos:
+        banco.marcar_respondida(i)
+    return {'exercicios': banco}
+
+
+def operacoes_antigas(dados, sorteio):
+    todos, ids = dados['all_exercicios'], dados['exercicios_respondidos_ids']
+    disponiveis = [ex for ex in todos if not ex['respondida']]
+    proximos = [ex for ex in todos if not ex['respondida']][:K]
+    sorteados = random.sample(disponiveis, K)
+    alvo = sorteio.randrange(len(todos))
+    encontrado = next((ex for ex in todos if ex['id'] == alvo), None)
+    respondidos = [ex for ex in todos if ex['id'] in ids]
+    dados['exercicios_respondidos_ids'] = list(set(ids))
+    return proximos, sorteados, encontrado, respondidos
+
+
+def operacoes_novas(dados, sorteio):
+    banco = dados['exercicios']
+    return (banco.proximos(K), banco.sortear(K), banco.get(sorteio.randrange(len(banco))), banco.respondidos())
+
+
+def medir(funcao, dados, repeticoes):
+    sorteio = random.Random(1)
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao(dados, sorteio)
+    return (time.perf_counter() - inicio) / repeticoes
+
+
+def memoria(fabrica, *args):
+    tracemalloc.start()
+    dados = fabrica(*args)
+    tamanho = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return dados, tamanho
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--exercicios', type=int, nargs='+', default=[1000, 5000, 20000])
+    parser.add_argument('--repeticoes', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'exercícios':>10} {'formato':>8} {'ms/requisição':>14} {'pickle KB':>10} {'memória KB':>11}")
+    for quantidade in args.exercicios:
+        exercicios = identificados(quantidade)
+        respondidos = random.Random(0).sample(range(quantidade), quantidade // 2)
+        for nome, fabrica, operacoes in (('antigo', formato_antigo, operacoes_antigas),
+                                         ('novo', formato_novo, operacoes_novas)):
+            dados, ocupado = memoria(fabrica, exercicios, respondidos)
+            duracao = medir(operacoes, dados, args.repeticoes)
+            serializado = len(pickle.dumps(dados, protocol=pickle.HIGHEST_PROTOCOL))
+            print(f"{quantidade:>10} {nome:>8} {duracao * 1000:>14.3f} {serializado / 1024:>10.0f} {ocupado / 1024:>11.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark do tempo de import a frio (cold start) dos módulos da aplicação.
+
+Cada medição roda em um processo Python novo, sem GOOGLE_API_KEY e com o backend real do Gemini
+configurado, para conferir que importar não exige chave nem rede. Mostra a mediana e o mínimo do
+tempo de import e quais módulos pesados (SDK do Gemini, extratores de PDF) foram carregados no import.
+
+Uso:
+    python benchmarks/bench_import.py --repeticoes 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULOS = ['estuda_ai', 'estuda_ai.modelo', 'estuda_ai.prompts', 'estuda_ai.extracao', 'estuda_ai.pipeline',
+           'gemini_client', 'processing', 'batch_processing', 'gemini_ai', 'resolution', 'app']
+MODULOS_PESADOS = ['google.generativeai', 'google.api_core', 'PyPDF2', 'pdfplumber']
+
+MEDIR = """
+import json, sys, time
+sys.path.insert(0, {raiz!r})
+inicio = time.perf_counter()
+import {modulo}
+duracao = time.perf_counter() - inicio
+print(json.dumps({{'duracao': duracao, 'pesados': [m for m in {pesados!r} if m in sys.modules]}}))
+"""
+
+
+def medir(modulo, pasta, ambiente):
+    codigo = MEDIR.format(raiz=RAIZ, modulo=modulo, pesados=MODULOS_PESADOS)
+    saida = subprocess.run([sys.executable, '-c', codigo], cwd=pasta, env=ambiente, capture_output=True, text=True)
+    if saida.returncode != 0:
+        return None, (saida.stderr.strip().splitlines() or [f"saiu com código {saida.returncode}"])[-1]
+    try:
+        return json.loads(saida.stdout.strip().splitlines()[-1]), None
+    except (IndexError, ValueError): # O módulo escreveu algo depois do import (ou chamou exit())
+        return None, "saída inesperada no import"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--modulos', nargs='+', default=MODULOS)
+    args = parser.parse_args()
+
+    ambiente = {nome: valor for nome, valor in os.environ.items() if nome != 'GOOGLE_API_KEY'}
+    ambiente.update({'GEMINI_BACKEND': 'gemini', 'PYTHONDONTWRITEBYTECODE': '1'})
+    print(f"{'módulo':<20}{'mediana ms':>12}{'mínimo ms':>12}  carregados no import")
+    with tempfile.TemporaryDirectory() as pasta: # A aplicação cria o cache e os uploads na pasta atual
+        for modulo in args.modulos:
+            duracoes, pesados, erro = [], [], None
+            for _ in range(args.repeticoes):
+                resultado, erro = medir(modulo, pasta, ambiente)
+                if erro:
+                    break
+                duracoes.append(resultado['duracao'])
+                pesados = resultado['pesados']
+            if erro:
+                print(f"{modulo:<20}{'erro':>12}{'':>12}  {erro}")
+                continue
+            print(f"{modulo:<20}{statistics.median(duracoes) * 1000:>12.1f}{min(duracoes) * 1000:>12.1f}"
+                  f"  {', '.join(pesados) or '-'}")
+
+
+if __name__ == '__main__':
+    main()
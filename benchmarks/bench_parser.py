@@ -0,0 +1,95 @@
+"""
+Micro-benchmark do parser da identificação com respostas sintéticas grandes.
+
+Compara o parser antigo (reproduzido abaixo como referência) com o novo, em texto livre e
+em JSON (inteiro e em pedaços, como chega em streaming), e confere quantos exercícios cada
+um encontra.
+
+Uso:
+    python benchmarks/bench_parser.py --exercicios 100 1000 5000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from exercise_parser import LeitorDeExerciciosJSON, parsear_exercicios, parsear_texto_livre
+
+
+def parser_antigo(texto_gemini):
+    # Versão anterior de `parsear_exercicios_do_gemini`, mantida só para comparação
+    exercicios_parseados = []
+    for linha in texto_gemini.strip().split('\n'):
+        if linha.strip().startswith(tuple(f"{i}." for i in range(1, 100))):
+            partes = linha.split('.', 1)
+            exercicios_parseados.append(partes[1].strip() if len(partes) > 1 else linha.strip())
+        elif exercicios_parseados:
+            exercicios_parseados[-1] += "\n" + linha.strip()
+    return [ex.strip() for ex in exercicios_parseados if ex.strip()]
+
+
+def enunciado(numero):
+    return (f"Calcule o valor de x na equação {numero}x + 5 = {numero * 3}. "
+            "Justifique cada passo e verifique a resposta substituindo x na equação original.")
+
+
+def resposta_texto_livre(quantidade):
+    linhas = ["Aqui estão as questões identificadas:", ""]
+    for numero in range(1, quantidade + 1):
+        linhas.append(f"{numero}. {enunciado(numero)}")
+        linhas.append("   a) Resolva algebricamente.")
+        linhas.append("   b) Confira o resultado.")
+    return "\n".join(linhas)
+
+
+def resposta_json(quantidade):
+    return json.dumps([{'numero': str(numero), 'texto': enunciado(numero), 'pagina': numero // 5 + 1}
+                       for numero in range(1, quantidade + 1)], ensure_ascii=False)
+
+
+def em_pedacos(texto, tamanho):
+    return [texto[i:i + tamanho] for i in range(0, len(texto), tamanho)]
+
+
+def ler_em_streaming(pedacos):
+    leitor = LeitorDeExerciciosJSON()
+    return [exercicio for pedaco in pedacos for exercicio in leitor.alimentar(pedaco)]
+
+
+def medir(funcao, entrada, repeticoes):
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao(entrada)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, len(resultado)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--exercicios', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--repeticoes', type=int, default=5, help="mede várias vezes e fica com o melhor tempo")
+    parser.add_argument('--pedaco', type=int, default=64, help="tamanho dos pedaços no caso em streaming")
+    args = parser.parse_args()
+
+    print(f"{'exercícios':>10}  {'caso':<28}{'KB':>8}{'ms':>10}{'encontrados':>13}")
+    for quantidade in args.exercicios:
+        texto_livre = resposta_texto_livre(quantidade)
+        texto_json = resposta_json(quantidade)
+        casos = [
+            ('texto livre, parser antigo', parser_antigo, texto_livre),
+            ('texto livre, regex', parsear_texto_livre, texto_livre),
+            ('json inteiro', parsear_exercicios, texto_json),
+            (f'json em pedaços de {args.pedaco}', ler_em_streaming, em_pedacos(texto_json, args.pedaco)),
+        ]
+        for nome, funcao, entrada in casos:
+            tamanho = sum(map(len, entrada)) if isinstance(entrada, list) else len(entrada)
+            duracao, encontrados = medir(funcao, entrada, args.repeticoes)
+            print(f"{quantidade:>10}  {nome:<28}{tamanho / 1024:>8.0f}{duracao * 1000:>10.2f}{encontrados:>13}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark do índice de exercícios quase idênticos (near_duplicates.py).
+
+Popula um índice temporário com exercícios sintéticos e mede o tempo de busca (p50/p99) de
+variações de exercícios indexados (espaços, numeração, ruído de OCR) e de exercícios novos,
+além de quantas variações foram encontradas e quantos exercícios novos deram falso positivo.
+
+Uso:
+    python benchmarks/bench_similares.py --exercicios 200000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from near_duplicates import IndiceDeSimilares
+
+PALAVRAS = ("calcule determine encontre valor função derivada integral limite matriz vetor área volume "
+            "probabilidade média triângulo círculo velocidade tempo distância ângulo").split()
+
+
+def exercicio(sorteio, numero):
+    return (f"{numero}. " + " ".join(sorteio.choice(PALAVRAS) for _ in range(14)) +
+            f" considerando os valores {sorteio.randint(1, 999)} e {sorteio.randint(1, 999)}.")
+
+
+def variacao(sorteio, texto):
+    # Outra numeração, espaços duplicados e uma letra trocada, como em um OCR ruidoso
+    texto = texto.split(". ", 1)[1].replace(" ", "  ", 3)
+    posicao = sorteio.choice([i for i, caractere in enumerate(texto) if caractere in "aeiou"])
+    return f"Questão {sorteio.randint(1, 50)}) " + texto[:posicao] + "o" + texto[posicao + 1:]
+
+
+def percentil(valores, fracao):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(fracao * len(valores)))]
+
+
+def medir(indice, textos):
+    duracoes, encontrados = [], 0
+    for texto in textos:
+        inicio = time.perf_counter()
+        encontrados += bool(indice.buscar(texto, 'bench'))
+        duracoes.append(time.perf_counter() - inicio)
+    return duracoes, encontrados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--exercicios', type=int, default=20000, help="exercícios indexados antes das buscas")
+    parser.add_argument('--buscas', type=int, default=1000)
+    parser.add_argument('--limiar', type=float, default=0.9)
+    args = parser.parse_args()
+
+    sorteio = random.Random(0)
+    with tempfile.TemporaryDirectory() as pasta:
+        indice = IndiceDeSimilares(os.path.join(pasta, 'similares.db'), limiar=args.limiar)
+        amostra = []
+        inicio = time.perf_counter()
+        for numero in range(args.exercicios):
+            texto = exercicio(sorteio, numero + 1)
+            indice.adicionar(texto, 'bench', f"resolucao-{numero}")
+            if len(amostra) < args.buscas:
+                amostra.append(texto)
+        duracao_indexacao = time.perf_counter() - inicio
+        tamanho_mb = sum(os.path.getsize(os.path.join(pasta, nome)) for nome in os.listdir(pasta)) / 1024 ** 2
+        print(f"{indice.tamanho()} exercícios indexados em {duracao_indexacao:.1f}s ({tamanho_mb:.0f} MB em disco)")
+
+        casos = [
+            ('variações de indexados', [variacao(sorteio, texto) for texto in amostra]),
+            ('exercícios novos', [exercicio(sorteio, 1) for _ in range(args.buscas)]),
+        ]
+        print(f"{'caso':<26}{'p50 ms':>10}{'p99 ms':>10}{'encontrados':>13}")
+        for nome, textos in casos:
+            duracoes, encontrados = medir(indice, textos)
+            print(f"{nome:<26}{percentil(duracoes, 0.5) * 1000:>10.3f}{percentil(duracoes, 0.99) * 1000:>10.3f}"
+                  f"{encontrados:>8}/{len(textos)}")
+
+
+if __name__ == '__main__':
+    main()
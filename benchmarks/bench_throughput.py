@@ -0,0 +1,166 @@
+"""
+Benchmark de ponta a ponta com o backend simulado do Gemini (sem rede e sem cota).
+
+Vários usuários simulados, cada um com o seu cookie de sessão, fazem em paralelo:
+upload de um PDF (e acompanham o processamento), seleção de questões (com o streaming
+das resoluções, se ativo) e geração de similares. Ao final são mostrados p50/p95/p99
+e requisições por segundo de cada etapa.
+
+Uso:
+    python benchmarks/bench_throughput.py --usuarios 20 --rodadas 3 --latencia 0.5
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pdf_de_exemplo import gerar_pdf_de_exemplo
+
+
+class Medicoes:
+    def __init__(self):
+        self.duracoes = defaultdict(list)
+        self.erros = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def registrar(self, etapa, inicio, ok=True):
+        with self._lock:
+            self.duracoes[etapa].append(time.perf_counter() - inicio)
+            if not ok:
+                self.erros[etapa] += 1
+
+
+def percentil(valores, p):
+    if len(valores) == 1:
+        return valores[0]
+    return statistics.quantiles(valores, n=100, method='inclusive')[p - 1]
+
+
+def simular_usuario(app, pdfs, rodadas, questoes, pausa, medicoes):
+    cliente = app.test_client()
+    for rodada in range(rodadas):
+        caminho_pdf = pdfs[rodada % len(pdfs)]
+
+        inicio = time.perf_counter()
+        with open(caminho_pdf, 'rb') as arquivo:
+            resposta = cliente.post('/upload', headers={'Accept': 'application/json'},
+                                    data={'pdf_type': 'text_only', 'pdf_file': (arquivo, os.path.basename(caminho_pdf))})
+        medicoes.registrar('upload', inicio, resposta.status_code in (202, 302))
+
+        if resposta.status_code == 202:
+            status_url = resposta.get_json()['status_url']
+            while True:
+                estado = cliente.get(status_url).get_json()
+                if estado.get('etapa') in ('ready', 'error') or estado.get('status') != 'success':
+                    break
+                time.sleep(0.05)
+            medicoes.registrar('upload_ate_pronto', inicio, estado.get('etapa') == 'ready')
+            if estado.get('etapa') != 'ready':
+                continue
+        else:
+            medicoes.registrar('upload_ate_pronto', inicio)
+
+        time.sleep(pausa) # O usuário lê a lista antes de escolher
+        inicio = time.perf_counter()
+        resposta = cliente.post('/select_questions', data={'num_questions': str(questoes), 'selection_mode': 'sequential'})
+        medicoes.registrar('select_questions', inicio, resposta.status_code == 200)
+        if b'EventSource' in resposta.data:
+            inicio_stream = time.perf_counter()
+            corpo = cliente.get('/stream_resolutions').get_data(as_text=True)
+            medicoes.registrar('stream_resolutions', inicio_stream, 'event: done' in corpo and 'event: erro' not in corpo)
+        medicoes.registrar('select_ate_resolvido', inicio, resposta.status_code == 200)
+
+        inicio = time.perf_counter()
+        resposta = cliente.post('/generate_similar/1')
+        medicoes.registrar('generate_similar', inicio, resposta.status_code == 200)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--usuarios', type=int, default=10, help="usuários simultâneos")
+    parser.add_argument('--rodadas', type=int, default=2, help="ciclos upload/seleção/similares por usuário")
+    parser.add_argument('--questoes', type=int, default=3, help="questões resolvidas por seleção")
+    parser.add_argument('--paginas', type=int, default=5, help="páginas de cada PDF de exemplo")
+    parser.add_argument('--pdfs-distintos', type=int, default=4, help="quantidade de PDFs diferentes usados")
+    parser.add_argument('--latencia', type=float, default=0.5, help="latência média do modelo simulado (s)")
+    parser.add_argument('--desvio', type=float, default=0.15, help="desvio da latência simulada (s)")
+    parser.add_argument('--distribuicao', default='lognormal', choices=['lognormal', 'normal', 'uniforme', 'fixa'])
+    parser.add_argument('--taxa-erro', type=float, default=0.0, help="fração de chamadas simuladas que falham")
+    parser.add_argument('--pausa', type=float, default=0.0, help="segundos entre o upload pronto e a seleção")
+    parser.add_argument('--pre-resolucao', action='store_true', help="ativa a pré-resolução em segundo plano")
+    parser.add_argument('--sem-streaming', action='store_true', help="resolve as questões dentro do POST de seleção")
+    parser.add_argument('--json', action='store_true', help="imprime o relatório em JSON")
+    args = parser.parse_args()
+
+    # Tudo em um diretório temporário: uploads, caches e sessões começam vazios
+    pasta = tempfile.mkdtemp(prefix='estuda-ai-bench-')
+    os.chdir(pasta)
+    os.environ.update({
+        'GEMINI_BACKEND': 'mock',
+        'MOCK_LATENCIA_MEDIA': str(args.latencia),
+        'MOCK_LATENCIA_DESVIO': str(args.desvio),
+        'MOCK_DISTRIBUICAO': args.distribuicao,
+        'MOCK_TAXA_ERRO': str(args.taxa_erro),
+        'RESOLUCAO_STREAMING': '0' if args.sem_streaming else '1',
+        'PRE_RESOLUCAO': '1' if args.pre_resolucao else '0',
+        'GEMINI_MAX_TENTATIVAS': os.environ.get('GEMINI_MAX_TENTATIVAS', '3'),
+    })
+    pdfs = [gerar_pdf_de_exemplo(os.path.join(pasta, f'lista{i}.pdf'), paginas=args.paginas, variante=i)
+            for i in range(args.pdfs_distintos)]
+
+    import app as estuda_ai
+    medicoes = Medicoes()
+    usuarios = [threading.Thread(target=simular_usuario, args=(estuda_ai.app, pdfs, args.rodadas, args.questoes, args.pausa, medicoes))
+                for _ in range(args.usuarios)]
+    pico_de_threads = [threading.active_count()]
+    terminou = threading.Event()
+
+    def medir_threads():
+        while not terminou.wait(0.05):
+            pico_de_threads[0] = max(pico_de_threads[0], threading.active_count())
+
+    threading.Thread(target=medir_threads, daemon=True).start()
+    inicio = time.perf_counter()
+    for usuario in usuarios:
+        usuario.start()
+    for usuario in usuarios:
+        usuario.join()
+    duracao_total = time.perf_counter() - inicio
+    terminou.set()
+    # Sem as threads dos usuários simulados e a do medidor: só as do servidor
+    threads_do_servidor = pico_de_threads[0] - len(usuarios) - 1
+
+    relatorio = {}
+    for etapa, duracoes in medicoes.duracoes.items():
+        relatorio[etapa] = {
+            'n': len(duracoes),
+            'erros': medicoes.erros[etapa],
+            'p50_ms': round(percentil(duracoes, 50) * 1000, 1),
+            'p95_ms': round(percentil(duracoes, 95) * 1000, 1),
+            'p99_ms': round(percentil(duracoes, 99) * 1000, 1),
+            'req_por_s': round(len(duracoes) / duracao_total, 2),
+        }
+
+    if args.json:
+        print(json.dumps({'duracao_total_s': round(duracao_total, 2), 'pico_threads_servidor': threads_do_servidor,
+                          'etapas': relatorio}, indent=2))
+        return
+    print(f"\n{args.usuarios} usuários x {args.rodadas} rodadas em {duracao_total:.2f}s "
+          f"(latência simulada {args.latencia}s, {args.distribuicao}, erro {args.taxa_erro:.0%}, "
+          f"pico de {threads_do_servidor} threads do servidor)\n")
+    print(f"{'etapa':<22}{'n':>6}{'erros':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}")
+    for etapa, linha in relatorio.items():
+        print(f"{etapa:<22}{linha['n']:>6}{linha['erros']:>7}{linha['p50_ms']:>10}{linha['p95_ms']:>10}{linha['p99_ms']:>10}{linha['req_por_s']:>9}")
+
+
+if __name__ == '__main__':
+    main()
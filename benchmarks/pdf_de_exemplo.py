@@ -0,0 +1,52 @@
+"""Gera PDFs simples de listas de exercícios, sem dependências, para os benchmarks."""
+
+
+def _escapar(texto):
+    return texto.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def gerar_pdf_de_exemplo(caminho, paginas=3, exercicios_por_pagina=5, variante=0):
+    """
+    Escreve em `caminho` um PDF com `paginas` páginas de exercícios numerados,
+    com cabeçalho e rodapé repetidos em todas as páginas.
+    `variante` muda os números dos exercícios, gerando um arquivo com outro conteúdo.
+    """
+    objetos = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None, # Preenchido depois, quando os ids das páginas forem conhecidos
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    ids_paginas = []
+    numero = 1
+    for pagina in range(1, paginas + 1):
+        linhas = ["Lista de Exercicios - Calculo I"]
+        for _ in range(exercicios_por_pagina):
+            a, b = numero + variante, numero * 3 + variante
+            linhas.append(f"{numero}. Calcule o valor de x na equacao {a}x + 5 = {b}.")
+            linhas.append("   Justifique cada passo da resolucao.")
+            numero += 1
+        linhas.append(f"Pagina {pagina}")
+        conteudo = "BT /F1 11 Tf 50 800 Td 16 TL " + " ".join(f"({_escapar(l)}) Tj T*" for l in linhas) + " ET"
+        conteudo = conteudo.encode('latin-1')
+        objetos.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(conteudo), conteudo))
+        id_conteudo = len(objetos)
+        objetos.append(("<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                        f"/Resources << /Font << /F1 3 0 R >> >> /Contents {id_conteudo} 0 R >>").encode('latin-1'))
+        ids_paginas.append(len(objetos))
+    kids = " ".join(f"{i} 0 R" for i in ids_paginas)
+    objetos[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(ids_paginas)} >>".encode('latin-1')
+
+    saida = bytearray(b"%PDF-1.4\n")
+    posicoes = []
+    for indice, objeto in enumerate(objetos, 1):
+        posicoes.append(len(saida))
+        saida += b"%d 0 obj\n%s\nendobj\n" % (indice, objeto)
+    inicio_xref = len(saida)
+    saida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    for posicao in posicoes:
+        saida += b"%010d 00000 n \n" % posicao
+    saida += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, inicio_xref)
+
+    with open(caminho, 'wb') as arquivo:
+        arquivo.write(saida)
+    return caminho
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+
+def normalizar_texto(texto):
+    """Normaliza o texto para gerar chaves estáveis (Unicode NFC e espaços colapsados)."""
+    return " ".join(unicodedata.normalize('NFC', texto or "").split())
+
+
+def gerar_chave(*partes):
+    """Gera uma chave SHA-256 a partir das partes informadas."""
+    return hashlib.sha256("\x1f".join(str(p) for p in partes).encode('utf-8')).hexdigest()
+
+
+class CacheSQLite:
+    """
+    Cache persistente em SQLite com expiração por tempo (TTL) e remoção LRU.
+
+    Pode ser usado ao mesmo tempo por várias threads (uma conexão por thread) e por
+    vários processos (o SQLite em modo WAL cuida do bloqueio do arquivo).
+    Os valores são serializados em JSON.
+    """
+
+    INTERVALO_LIMPEZA = 100 # Escritas entre duas verificações de tamanho máximo
+
+    def __init__(self, caminho, tabela, max_itens=50000, ttl_segundos=30 * 24 * 3600):
+        if not tabela.isidentifier():
+            raise ValueError(f"Nome de tabela inválido: {tabela}")
+        self.caminho = caminho
+        self.tabela = tabela
+        self.max_itens = max_itens
+        self.ttl_segundos = ttl_segundos
+        self.acertos = 0
+        self.falhas = 0
+        self.remocoes = 0
+        self._escritas = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        conexao = self._conexao()
+        conexao.execute(f"""
+            CREATE TABLE IF NOT EXISTS {tabela} (
+                chave TEXT PRIMARY KEY,
+                valor TEXT NOT NULL,
+                criado_em REAL NOT NULL,
+                acessado_em REAL NOT NULL
+            )""")
+        conexao.execute(f"CREATE INDEX IF NOT EXISTS idx_{tabela}_acessado_em ON {tabela} (acessado_em)")
+        conexao.commit()
+
+    def _conexao(self):
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=30)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexao = conexao
+        return conexao
+
+    def _contar(self, campo, quantidade=1):
+        with self._lock:
+            setattr(self, campo, getattr(self, campo) + quantidade)
+
+    def obter(self, chave):
+        """Retorna o valor salvo para a chave, ou None se não existir ou tiver expirado."""
+        conexao = self._conexao()
+        agora = time.time()
+        linha = conexao.execute(f"SELECT valor, criado_em FROM {self.tabela} WHERE chave = ?", (chave,)).fetchone()
+        if linha is None:
+            self._contar('falhas')
+            return None
+
+        valor, criado_em = linha
+        with conexao:
+            if self.ttl_segundos and agora - criado_em > self.ttl_segundos:
+                conexao.execute(f"DELETE FROM {self.tabela} WHERE chave = ?", (chave,))
+                self._contar('falhas')
+                self._contar('remocoes')
+                return None
+            conexao.execute(f"UPDATE {self.tabela} SET acessado_em = ? WHERE chave = ?", (agora, chave))
+        self._contar('acertos')
+        return json.loads(valor)
+
+    def salvar(self, chave, valor):
+        """Salva (ou substitui) o valor da chave."""
+        conexao = self._conexao()
+        agora = time.time()
+        with conexao:
+            conexao.execute(f"INSERT OR REPLACE INTO {self.tabela} (chave, valor, criado_em, acessado_em) VALUES (?, ?, ?, ?)",
+                            (chave, json.dumps(valor, ensure_ascii=False), agora, agora))
+        with self._lock:
+            self._escritas += 1
+            limpar = self._escritas % self.INTERVALO_LIMPEZA == 1
+        if limpar:
+            self.limpar()
+
+    def limpar(self):
+        """Remove itens expirados e os menos usados recentemente acima de `max_itens`."""
+        conexao = self._conexao()
+        removidos = 0
+        with conexao:
+            if self.ttl_segundos:
+                removidos += conexao.execute(f"DELETE FROM {self.tabela} WHERE criado_em < ?",
+                                             (time.time() - self.ttl_segundos,)).rowcount
+            if self.max_itens:
+                total = conexao.execute(f"SELECT COUNT(*) FROM {self.tabela}").fetchone()[0]
+                if total > self.max_itens:
+                    removidos += conexao.execute(f"""
+                        DELETE FROM {self.tabela} WHERE chave IN (
+                            SELECT chave FROM {self.tabela} ORDER BY acessado_em ASC LIMIT ?
+                        )""", (total - self.max_itens,)).rowcount
+        if removidos:
+            self._contar('remocoes', removidos)
+        return removidos
+
+    def tamanho(self):
+        return self._conexao().execute(f"SELECT COUNT(*) FROM {self.tabela}").fetchone()[0]
+
+    def estatisticas(self):
+        """Contadores deste processo e tamanho atual da tabela."""
+        total_consultas = self.acertos + self.falhas
+        return {
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+            'taxa_acerto': self.acertos / total_consultas if total_consultas else 0.0,
+            'remocoes': self.remocoes,
+            'itens': self.tamanho(),
+        }
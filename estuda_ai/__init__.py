@@ -0,0 +1,31 @@
+"""
+Núcleo do Estuda-AI importável sem efeitos colaterais: importar o pacote (ou a aplicação) não lê a chave
+da API, não chama a rede e não importa o SDK do Gemini nem os extratores de PDF; tudo isso acontece no
+primeiro uso. Os submódulos também são carregados sob demanda:
+
+    from estuda_ai import Pipeline, criar_cliente, montar_prompt_resolucao
+"""
+import importlib
+
+_ATRIBUTOS = {
+    'Pipeline': 'estuda_ai.pipeline',
+    'MENSAGEM_FALHA_RESOLUCAO': 'estuda_ai.pipeline',
+    'ler_configuracao': 'estuda_ai.configuracao',
+    'extrair_texto': 'estuda_ai.extracao',
+    'hash_do_arquivo': 'estuda_ai.extracao',
+    'criar_cliente': 'estuda_ai.modelo',
+    'ModeloPreguicoso': 'estuda_ai.modelo',
+    'montar_prompt_identificacao': 'estuda_ai.prompts',
+    'montar_prompt_resolucao': 'estuda_ai.prompts',
+    'montar_prompt_resolucao_em_lote': 'estuda_ai.prompts',
+    'montar_prompt_similares': 'estuda_ai.prompts',
+    'montar_prompt_similares_com_resolucoes': 'estuda_ai.prompts',
+}
+
+__all__ = sorted(_ATRIBUTOS)
+
+
+def __getattr__(nome):
+    if nome not in _ATRIBUTOS:
+        raise AttributeError(f"module 'estuda_ai' has no attribute {nome!r}")
+    return getattr(importlib.import_module(_ATRIBUTOS[nome]), nome)
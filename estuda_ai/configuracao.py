@@ -0,0 +1,40 @@
+import os
+
+
+def ler_configuracao():
+    """
+    Opções do núcleo (caches, identificação, normalização, resolução, similares e cliente do modelo), lidas do
+    ambiente com os padrões da aplicação. A leitura acontece na chamada, e não no import, para que o .env já
+    tenha sido carregado e os processos do lote possam ajustar o ambiente antes.
+    """
+    config = {}
+    config['MAX_RESOLUCOES_SIMULTANEAS'] = int(os.getenv('MAX_RESOLUCOES_SIMULTANEAS', 5)) # Chamadas ao Gemini em paralelo por requisição
+    config['CACHE_DB'] = os.getenv('CACHE_DB', os.path.join('cache', 'estuda_ai.db'))
+    config['CACHE_MAX_ITENS'] = int(os.getenv('CACHE_MAX_ITENS', 50000))
+    config['CACHE_TTL_DIAS'] = float(os.getenv('CACHE_TTL_DIAS', 30))
+    # Reaproveita a resolução de exercícios quase idênticos (espaços, numeração, ruído de OCR) já resolvidos
+    config['SIMILARIDADE_INDICE'] = os.getenv('SIMILARIDADE_INDICE', '1') == '1'
+    config['SIMILARIDADE_LIMIAR'] = float(os.getenv('SIMILARIDADE_LIMIAR', 0.9))
+    # Identificação em janelas de páginas para PDFs grandes (0 em IDENTIFICACAO_LIMIAR_CARACTERES força sempre)
+    config['IDENTIFICACAO_LIMIAR_CARACTERES'] = int(os.getenv('IDENTIFICACAO_LIMIAR_CARACTERES', 40000))
+    config['IDENTIFICACAO_PAGINAS_POR_JANELA'] = int(os.getenv('IDENTIFICACAO_PAGINAS_POR_JANELA', 10))
+    config['IDENTIFICACAO_SOBREPOSICAO'] = int(os.getenv('IDENTIFICACAO_SOBREPOSICAO', 1))
+    config['IDENTIFICACAO_MAX_SIMULTANEAS'] = int(os.getenv('IDENTIFICACAO_MAX_SIMULTANEAS', 4))
+    config['IDENTIFICACAO_JSON'] = os.getenv('IDENTIFICACAO_JSON', '1') == '1' # Resposta estruturada em JSON na identificação
+    # Limpeza do texto extraído antes da identificação (cabeçalhos e rodapés repetidos, hifenização, espaços)
+    config['NORMALIZACAO_TEXTO'] = os.getenv('NORMALIZACAO_TEXTO', '1') == '1'
+    config['NORMALIZACAO_DESCARTAR_PAGINAS'] = os.getenv('NORMALIZACAO_DESCARTAR_PAGINAS', '0') == '1' # Esvazia páginas sem padrões de exercício
+    # Tamanho dos lotes da resolução de vários exercícios por chamada
+    config['LOTE_MAX_CARACTERES'] = int(os.getenv('LOTE_MAX_CARACTERES', 6000))
+    config['LOTE_MAX_EXERCICIOS'] = int(os.getenv('LOTE_MAX_EXERCICIOS', 10))
+    # Exercícios similares: gerados com as resoluções em uma única chamada estruturada (ou resolvidos em paralelo)
+    config['SIMILARES_EM_UMA_CHAMADA'] = os.getenv('SIMILARES_EM_UMA_CHAMADA', '1') == '1'
+    # 'gemini' usa a API real; 'mock' usa um modelo simulado local (veja model_backends.py e benchmarks/)
+    config['GEMINI_BACKEND'] = os.getenv('GEMINI_BACKEND', 'gemini')
+    # Limites do cliente do Gemini (por processo)
+    config['GEMINI_REQUISICOES_POR_MINUTO'] = int(os.getenv('GEMINI_REQUISICOES_POR_MINUTO', 1000))
+    config['GEMINI_TOKENS_POR_MINUTO'] = int(os.getenv('GEMINI_TOKENS_POR_MINUTO', 1000000))
+    config['GEMINI_MAX_EM_VOO'] = int(os.getenv('GEMINI_MAX_EM_VOO', 16))
+    config['GEMINI_MAX_TENTATIVAS'] = int(os.getenv('GEMINI_MAX_TENTATIVAS', 5))
+    config['GEMINI_TIMEOUT_SEGUNDOS'] = float(os.getenv('GEMINI_TIMEOUT_SEGUNDOS', 120))
+    return config
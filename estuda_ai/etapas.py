@@ -0,0 +1,8 @@
+# Etapas do processamento de um upload, na ordem. O pipeline avisa as de extração e identificação;
+# os trabalhos em segundo plano da aplicação (jobs.py) guardam a etapa atual de cada um
+ETAPA_SALVO = 'saved'
+ETAPA_EXTRAIDO = 'extracted'
+ETAPA_IDENTIFICADO = 'identified'
+ETAPA_PRONTO = 'ready'
+ETAPA_ERRO = 'error'
+ETAPAS = (ETAPA_SALVO, ETAPA_EXTRAIDO, ETAPA_IDENTIFICADO, ETAPA_PRONTO)
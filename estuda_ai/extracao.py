@@ -0,0 +1,337 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from cache_store import gerar_chave
+
+try:
+    import pytesseract
+    from pdf2image import convert_from_path
+except ImportError: # OCR opcional: pip install pytesseract pdf2image, mais o Tesseract e o Poppler no sistema
+    pytesseract = None
+
+logger = logging.getLogger(__name__)
+
+SEPARADOR_PAGINA = "\f" # Inserido ao final de cada página no texto completo
+
+EXTRATORES = ('pypdf2', 'pdfplumber')
+
+# Acima deste número de páginas a extração é distribuída entre processos
+LIMIAR_PAGINAS_PARALELO = int(os.getenv('EXTRACAO_LIMIAR_PAGINAS_PARALELO', 50))
+PAGINAS_POR_TAREFA = int(os.getenv('EXTRACAO_PAGINAS_POR_TAREFA', 25))
+PROCESSOS = int(os.getenv('EXTRACAO_PROCESSOS', os.cpu_count() or 1))
+
+# Modo automático: páginas examinadas e limites usados para escolher o extrator
+PAGINAS_AMOSTRA = int(os.getenv('EXTRACAO_PAGINAS_AMOSTRA', 5))
+MIN_CARACTERES_TEXTO = 20 # Abaixo disto, com imagens na página, ela é tratada como escaneada
+MIN_OPERADORES_LAYOUT = 40 # Linhas e retângulos desenhados a partir dos quais a página é tratada como tabela/layout complexo
+
+# OCR: resolução da rasterização e idiomas do Tesseract
+OCR_DPI = int(os.getenv('OCR_DPI', 300))
+OCR_IDIOMA = os.getenv('OCR_IDIOMA', 'por+eng')
+
+_OPERADORES_DE_DESENHO = re.compile(rb'\s(?:re|l)\s')
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# PyPDF2 e pdfplumber só são importados na primeira extração (juntos levam mais de 100 ms), para que
+# importar este módulo, ou a aplicação, seja rápido
+def _pypdf2():
+    import PyPDF2
+    return PyPDF2
+
+
+def _pdfplumber():
+    import pdfplumber
+    return pdfplumber
+
+
+def _obter_pool():
+    # Pool criado sob demanda e reaproveitado. O forkserver evita herdar threads e conexões
+    # abertas do processo do servidor web.
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            metodos = multiprocessing.get_all_start_methods()
+            contexto = multiprocessing.get_context('forkserver' if 'forkserver' in metodos else 'spawn')
+            _pool = ProcessPoolExecutor(max_workers=PROCESSOS, mp_context=contexto)
+        return _pool
+
+
+def hash_do_arquivo(caminho, tamanho_bloco=1024 * 1024):
+    """SHA-256 do conteúdo do arquivo, que identifica o PDF nas chaves do cache."""
+    sha256 = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(tamanho_bloco), b''):
+            sha256.update(bloco)
+    return sha256.hexdigest()
+
+
+def contar_paginas(caminho_pdf):
+    with open(caminho_pdf, 'rb') as arquivo:
+        return len(_pypdf2().PdfReader(arquivo).pages)
+
+
+def _normalizar_intervalo(intervalo, total_paginas):
+    """Converte (inicio, fim), 1-based e inclusivo, em índices [inicio, fim) limitados ao documento."""
+    if intervalo is None:
+        return 0, total_paginas
+    inicio, fim = intervalo
+    inicio = max(1, inicio or 1)
+    fim = min(total_paginas, fim or total_paginas)
+    return inicio - 1, max(inicio - 1, fim)
+
+
+def iterar_paginas(caminho_pdf, extrator='pypdf2', intervalo=None):
+    """
+    Gera (numero_da_pagina, texto) para cada página do PDF, começando em 1.
+
+    `intervalo` é uma tupla (inicio, fim) inclusiva; None em qualquer ponta significa o começo ou o fim.
+    Páginas sem texto extraível geram uma string vazia.
+    """
+    if extrator == 'pypdf2':
+        with open(caminho_pdf, 'rb') as arquivo:
+            leitor_pdf = _pypdf2().PdfReader(arquivo)
+            inicio, fim = _normalizar_intervalo(intervalo, len(leitor_pdf.pages))
+            for indice in range(inicio, fim):
+                yield indice + 1, leitor_pdf.pages[indice].extract_text() or ""
+    elif extrator == 'pdfplumber':
+        with _pdfplumber().open(caminho_pdf) as pdf:
+            inicio, fim = _normalizar_intervalo(intervalo, len(pdf.pages))
+            for indice in range(inicio, fim):
+                pagina = pdf.pages[indice]
+                yield indice + 1, pagina.extract_text(x_tolerance=2, y_tolerance=2) or ""
+                # Libera os objetos de layout da página já processada
+                if hasattr(pagina, 'close'):
+                    pagina.close()
+    else:
+        raise ValueError(f"Extrator desconhecido: {extrator}")
+
+
+def _extrair_intervalo(caminho_pdf, extrator, inicio, fim):
+    return list(iterar_paginas(caminho_pdf, extrator, (inicio, fim)))
+
+
+def extrair_paginas(caminho_pdf, extrator='pypdf2', intervalo=None, processos=None):
+    """
+    Igual a `iterar_paginas`, mas distribui blocos de páginas entre processos quando o
+    intervalo é grande. As páginas continuam sendo geradas em ordem.
+    """
+    processos = PROCESSOS if processos is None else processos
+    total_paginas = contar_paginas(caminho_pdf)
+    inicio, fim = _normalizar_intervalo(intervalo, total_paginas)
+
+    if processos <= 1 or fim - inicio < LIMIAR_PAGINAS_PARALELO:
+        yield from iterar_paginas(caminho_pdf, extrator, (inicio + 1, fim))
+        return
+
+    blocos = [(pagina + 1, min(pagina + PAGINAS_POR_TAREFA, fim)) for pagina in range(inicio, fim, PAGINAS_POR_TAREFA)]
+    pool = _obter_pool()
+    futuros = [pool.submit(_extrair_intervalo, caminho_pdf, extrator, bloco_inicio, bloco_fim)
+               for bloco_inicio, bloco_fim in blocos]
+    try:
+        for futuro in futuros:
+            yield from futuro.result()
+    finally:
+        for futuro in futuros:
+            futuro.cancel()
+
+
+def extrair_texto(caminho_pdf, extrator='pypdf2', intervalo=None, processos=None):
+    """
+    Extrai o texto completo do PDF, com `SEPARADOR_PAGINA` ao fim de cada página.
+    Retorna None se a extração falhar.
+    """
+    try:
+        return "".join(texto + "\n" + SEPARADOR_PAGINA
+                       for _, texto in extrair_paginas(caminho_pdf, extrator, intervalo, processos))
+    except Exception as e:
+        logger.error("Erro ao extrair texto com %s: %s", extrator, e)
+        return None
+
+
+def _contar_imagens(pagina):
+    recursos = pagina.get('/Resources')
+    objetos = recursos.get_object().get('/XObject') if recursos else None
+    if not objetos:
+        return 0
+    return sum(1 for objeto in objetos.get_object().values() if objeto.get_object().get('/Subtype') == '/Image')
+
+
+def analisar_amostra(caminho_pdf, paginas_amostra=PAGINAS_AMOSTRA):
+    """
+    Examina algumas páginas espalhadas pelo documento só com o PyPDF2, que é barato.
+    Retorna uma lista com, para cada página, o número, os caracteres de texto, as imagens e os
+    operadores de desenho (linhas e retângulos, que indicam tabelas e layout complexo).
+    """
+    with open(caminho_pdf, 'rb') as arquivo:
+        leitor_pdf = _pypdf2().PdfReader(arquivo)
+        total_paginas = len(leitor_pdf.pages)
+        quantidade = min(paginas_amostra, total_paginas)
+        indices = sorted({round(i * (total_paginas - 1) / max(1, quantidade - 1)) for i in range(quantidade)})
+        amostra = []
+        for indice in indices:
+            pagina = leitor_pdf.pages[indice]
+            conteudo = pagina.get_contents()
+            dados = conteudo.get_data() if conteudo is not None else b""
+            amostra.append({
+                'pagina': indice + 1,
+                'caracteres': len((pagina.extract_text() or "").strip()),
+                'imagens': _contar_imagens(pagina),
+                'operadores_desenho': len(_OPERADORES_DE_DESENHO.findall(dados)),
+            })
+    return amostra
+
+
+def _classificar_pagina(pagina):
+    if pagina['caracteres'] < MIN_CARACTERES_TEXTO and pagina['imagens']:
+        return 'ocr'
+    if pagina['operadores_desenho'] >= MIN_OPERADORES_LAYOUT:
+        return 'pdfplumber'
+    return 'pypdf2'
+
+
+def escolher_extrator(amostra):
+    """
+    O extrator mais barato que serve para a maioria das páginas da amostra: 'pypdf2', 'pdfplumber' ou 'ocr'.
+    Só vai para o OCR se a maior parte das páginas examinadas for apenas imagem.
+    """
+    if not amostra:
+        return 'pypdf2'
+    classes = [_classificar_pagina(pagina) for pagina in amostra]
+    if classes.count('ocr') * 2 > len(classes):
+        return 'ocr'
+    return 'pdfplumber' if classes.count('pdfplumber') * 2 > len(classes) else 'pypdf2'
+
+
+def _agrupar_em_intervalos(numeros):
+    """[1, 2, 3, 7, 9, 10] -> [(1, 3), (7, 7), (9, 10)]"""
+    intervalos = []
+    for numero in numeros:
+        if intervalos and intervalos[-1][1] == numero - 1:
+            intervalos[-1] = (intervalos[-1][0], numero)
+        else:
+            intervalos.append((numero, numero))
+    return intervalos
+
+
+def extrair_texto_automatico(caminho_pdf, paginas_amostra=PAGINAS_AMOSTRA, hash_do_pdf=None, cache=None):
+    """
+    Escolhe o extrator pela amostra de páginas e extrai o documento com ele; páginas que voltam
+    vazias são extraídas de novo com os demais extratores, em blocos de páginas consecutivas, e por
+    último com o OCR, se ele estiver disponível. `hash_do_pdf` e `cache` são repassados ao OCR.
+
+    Retorna (texto, relatorio), no formato de `extrair_texto` (None se falhar). O relatório traz a
+    estratégia, a amostra, o tempo da amostragem e da extração e as páginas obtidas por extrator.
+    """
+    relatorio = {'estrategia': None, 'amostra': [], 'duracao_amostragem': 0.0, 'duracao_extracao': 0.0,
+                 'paginas_por_extrator': {}}
+    try:
+        inicio = time.perf_counter()
+        relatorio['amostra'] = analisar_amostra(caminho_pdf, paginas_amostra)
+        estrategia = relatorio['estrategia'] = escolher_extrator(relatorio['amostra'])
+        relatorio['duracao_amostragem'] = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        if estrategia == 'ocr':
+            texto = extrair_texto_ocr(caminho_pdf, hash_do_pdf, cache)
+            relatorio['duracao_extracao'] = time.perf_counter() - inicio
+            return texto, relatorio
+
+        paginas = dict(extrair_paginas(caminho_pdf, estrategia))
+        vazias = [numero for numero, texto in paginas.items() if not texto.strip()]
+        por_extrator = {estrategia: len(paginas) - len(vazias)}
+        for extrator in (e for e in EXTRATORES if e != estrategia):
+            if not vazias:
+                break
+            for intervalo in _agrupar_em_intervalos(vazias):
+                for numero, texto in iterar_paginas(caminho_pdf, extrator, intervalo):
+                    if texto.strip():
+                        paginas[numero] = texto
+                        por_extrator[extrator] = por_extrator.get(extrator, 0) + 1
+            vazias = [numero for numero in vazias if not paginas[numero].strip()]
+        if vazias and ocr_disponivel():
+            for numero, texto in iterar_paginas_ocr(caminho_pdf, vazias, hash_do_pdf, cache):
+                if texto.strip():
+                    paginas[numero] = texto
+                    por_extrator['ocr'] = por_extrator.get('ocr', 0) + 1
+            vazias = [numero for numero in vazias if not paginas[numero].strip()]
+        if vazias:
+            por_extrator['sem_texto'] = len(vazias)
+        relatorio['paginas_por_extrator'] = por_extrator
+        relatorio['duracao_extracao'] = time.perf_counter() - inicio
+        return "".join(paginas[numero] + "\n" + SEPARADOR_PAGINA for numero in sorted(paginas)), relatorio
+    except Exception as e:
+        logger.error("Erro ao extrair texto no modo automático: %s", e)
+        return None, relatorio
+
+
+def ocr_disponivel():
+    """O OCR precisa do pytesseract e do pdf2image instalados e dos programas tesseract e pdftoppm no PATH."""
+    return pytesseract is not None and bool(shutil.which('tesseract')) and bool(shutil.which('pdftoppm'))
+
+
+def _ocr_pagina(caminho_pdf, numero, dpi, idioma):
+    # Roda nos processos do pool, uma página por tarefa. Cada processo já ocupa um núcleo,
+    # então o Tesseract não deve abrir threads próprias.
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+    imagens = convert_from_path(caminho_pdf, dpi=dpi, first_page=numero, last_page=numero, grayscale=True)
+    return "\n".join(pytesseract.image_to_string(imagem, lang=idioma) for imagem in imagens)
+
+
+def iterar_paginas_ocr(caminho_pdf, paginas=None, hash_do_pdf=None, cache=None, dpi=OCR_DPI, idioma=OCR_IDIOMA):
+    """
+    Gera (numero_da_pagina, texto) das `paginas` (todas, se None) reconhecidas por OCR, em ordem.
+
+    As páginas são rasterizadas e reconhecidas em paralelo no pool de processos; cada uma é gerada
+    assim que ela e as anteriores terminam. Com `cache` e `hash_do_pdf`, o texto de cada página é
+    guardado por (hash, página, dpi, idioma) e reaproveitado.
+    """
+    if not ocr_disponivel():
+        raise RuntimeError("OCR indisponível: instale pytesseract, pdf2image, o Tesseract e o Poppler.")
+    if paginas is None:
+        paginas = range(1, contar_paginas(caminho_pdf) + 1)
+    usar_cache = cache is not None and hash_do_pdf is not None
+
+    chaves = {}
+    em_cache = {}
+    if usar_cache:
+        for numero in paginas:
+            chaves[numero] = gerar_chave('ocr', hash_do_pdf, numero, dpi, idioma)
+            texto = cache.obter(chaves[numero])
+            if texto is not None:
+                em_cache[numero] = texto
+
+    pool = _obter_pool()
+    futuros = {numero: pool.submit(_ocr_pagina, caminho_pdf, numero, dpi, idioma)
+               for numero in paginas if numero not in em_cache}
+    try:
+        for numero in paginas:
+            if numero in em_cache:
+                yield numero, em_cache[numero]
+                continue
+            texto = futuros[numero].result()
+            if usar_cache:
+                cache.salvar(chaves[numero], texto)
+            yield numero, texto
+    finally:
+        for futuro in futuros.values():
+            futuro.cancel()
+
+
+def extrair_texto_ocr(caminho_pdf, hash_do_pdf=None, cache=None, dpi=OCR_DPI, idioma=OCR_IDIOMA):
+    """Texto completo do PDF por OCR, no formato de `extrair_texto`. Retorna None se o OCR falhar ou não estiver disponível."""
+    try:
+        return "".join(texto + "\n" + SEPARADOR_PAGINA
+                       for _, texto in iterar_paginas_ocr(caminho_pdf, None, hash_do_pdf, cache, dpi, idioma))
+    except Exception as e:
+        logger.error("Erro ao extrair texto com OCR: %s", e)
+        return None
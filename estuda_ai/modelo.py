@@ -0,0 +1,53 @@
+import os
+import threading
+
+from gemini_client import ClienteGemini
+from model_backends import criar_modelo, nome_do_modelo_criado, NOME_MODELO_PADRAO
+
+
+class ModeloPreguicoso:
+    """
+    Adia a criação do modelo (e o import do SDK do Gemini, que leva cerca de um segundo) até a primeira chamada.
+
+    `model_name` é conhecido sem criar o modelo, então as chaves de cache e as respostas que vêm do cache
+    não o criam. A criação é feita uma única vez, mesmo com várias threads chamando ao mesmo tempo.
+    """
+
+    def __init__(self, fabrica, model_name):
+        self.fabrica = fabrica
+        self.model_name = model_name
+        self._modelo = None
+        self._lock = threading.Lock()
+
+    @property
+    def criado(self):
+        return self._modelo is not None
+
+    def obter(self):
+        if self._modelo is None:
+            with self._lock:
+                if self._modelo is None:
+                    self._modelo = self.fabrica()
+        return self._modelo
+
+    def generate_content(self, *args, **kwargs):
+        return self.obter().generate_content(*args, **kwargs)
+
+    def generate_content_async(self, *args, **kwargs):
+        return self.obter().generate_content_async(*args, **kwargs)
+
+    def __getattr__(self, nome):
+        # Demais atributos do modelo real; só chamado para os que não existem nesta classe
+        if nome.startswith('_'):
+            raise AttributeError(nome)
+        return getattr(self.obter(), nome)
+
+
+def criar_cliente(backend=None, nome=NOME_MODELO_PADRAO, **limites):
+    """
+    Cliente do modelo com cota, concorrência e novas tentativas (`ClienteGemini`), sem rede nem chave de API
+    até a primeira chamada. `backend` vem de GEMINI_BACKEND se omitido; `limites` são repassados ao cliente.
+    """
+    backend = backend or os.getenv('GEMINI_BACKEND', 'gemini')
+    modelo = ModeloPreguicoso(lambda: criar_modelo(backend, nome), nome_do_modelo_criado(backend, nome))
+    return ClienteGemini(modelo, **limites)
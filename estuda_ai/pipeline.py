@@ -0,0 +1,616 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from cache_store import CacheSQLite, gerar_chave, normalizar_texto
+from exercise_parser import ESQUEMA_IDENTIFICACAO, ESQUEMA_SIMILARES, LeitorDeExerciciosJSON, parsear_exercicios, validar_similar
+from near_duplicates import IndiceDeSimilares
+from observability import (DURACAO_ETAPA, ESTRATEGIAS_DE_EXTRACAO, PAGINAS_EXTRAIDAS, TAMANHO_PROMPT, TAMANHO_RESPOSTA,
+                           TOKENS_NORMALIZACAO)
+from resolution_engine import executar_em_paralelo, executar_em_paralelo_async
+from text_normalization import normalizar_paginas_em_fluxo, normalizar_texto_extraido
+from windowed_identification import identificar_em_janelas, identificar_paginas_em_fluxo
+from estuda_ai.configuracao import ler_configuracao
+from estuda_ai.etapas import ETAPA_EXTRAIDO, ETAPA_IDENTIFICADO
+from estuda_ai.extracao import extrair_texto, extrair_texto_automatico, extrair_texto_ocr, iterar_paginas_ocr, ocr_disponivel
+from estuda_ai.modelo import criar_cliente
+from estuda_ai.prompts import (VERSAO_PROMPT_IDENTIFICACAO, VERSAO_PROMPT_RESOLUCAO, VERSAO_PROMPT_SIMILARES,
+                               montar_prompt_identificacao, montar_prompt_resolucao, montar_prompt_resolucao_em_lote,
+                               montar_prompt_similares, montar_prompt_similares_com_resolucoes)
+
+logger = logging.getLogger(__name__)
+
+# Incrementar ao alterar a extração ou a normalização, para não reaproveitar resultados antigos do cache
+# (as versões dos prompts ficam em estuda_ai/prompts.py)
+VERSAO_EXTRACAO = 3
+VERSAO_NORMALIZACAO = 1
+
+TIPOS_ESCANEADOS = ('scanned_book', 'scanned_handwritten')
+
+MENSAGEM_FALHA_RESOLUCAO = "Não foi possível gerar a resolução para este exercício."
+
+
+def nome_do_modelo(model_gemini):
+    return getattr(model_gemini, 'model_name', type(model_gemini).__name__)
+
+
+def parsear_exercicios_do_gemini(texto_gemini):
+    with DURACAO_ETAPA.cronometrar(etapa='parsing'):
+        if texto_gemini == "ERRO_NA_IDENTIFICACAO" or "Nenhuma questão encontrada." in texto_gemini:
+            return []
+        return parsear_exercicios(texto_gemini)
+
+
+def agrupar_em_lotes(textos, max_caracteres, max_exercicios):
+    """Agrupa os índices de `textos`, em ordem, em lotes limitados pelo total de caracteres e de exercícios."""
+    lotes, lote_atual, caracteres = [], [], 0
+    for indice, texto in enumerate(textos):
+        if lote_atual and (caracteres + len(texto) > max_caracteres or len(lote_atual) >= max_exercicios):
+            lotes.append(lote_atual)
+            lote_atual, caracteres = [], 0
+        lote_atual.append(indice)
+        caracteres += len(texto)
+    if lote_atual:
+        lotes.append(lote_atual)
+    return lotes
+
+
+def validar_resolucoes_em_lote(texto_json, ids_esperados):
+    """Retorna {id: resolucao} apenas com os itens válidos da resposta e com ids que foram pedidos."""
+    try:
+        itens = json.loads(texto_json)
+    except (TypeError, ValueError):
+        return {}
+    if not isinstance(itens, list):
+        return {}
+    resolucoes = {}
+    for item in itens:
+        if not isinstance(item, dict):
+            continue
+        id_item, resolucao = item.get('id'), item.get('resolucao')
+        if isinstance(id_item, str) and id_item.isdigit():
+            id_item = int(id_item)
+        if id_item in ids_esperados and id_item not in resolucoes and isinstance(resolucao, str) and resolucao.strip():
+            resolucoes[id_item] = resolucao
+    return resolucoes
+
+
+def registrar_normalizacao(relatorio):
+    TOKENS_NORMALIZACAO.inc(relatorio['tokens_antes'], momento='antes')
+    TOKENS_NORMALIZACAO.inc(relatorio['tokens_depois'], momento='depois')
+    logger.info("Normalização do texto: %s -> %s tokens estimados (%s linha(s) repetida(s), %s número(s) de página, "
+                "%s hifenização(ões), %s página(s) descartada(s))", relatorio['tokens_antes'], relatorio['tokens_depois'],
+                relatorio['linhas_repetidas'], relatorio['numeros_de_pagina'], relatorio['hifenizacoes'],
+                relatorio['paginas_descartadas'])
+
+
+def registrar_janelas(relatorio):
+    for janela in relatorio['janelas']:
+        logger.info("Identificação das páginas %s-%s: %s exercício(s) em %.2fs%s", janela['paginas'][0], janela['paginas'][1],
+                    janela['exercicios'], janela['duracao'], f" (falhou: {janela['erro']})" if janela['erro'] else "")
+
+
+class Pipeline:
+    """
+    Extração, identificação, resolução e exercícios similares, usados pela aplicação web, pelo
+    processamento em lote e pelo processing.py.
+
+    Criar o pipeline não cria nada: o cliente do modelo, os caches em disco e o índice de similares são
+    criados no primeiro uso, uma única vez mesmo com várias threads, e o modelo real só na primeira chamada
+    a ele. `config` tem as opções de `ler_configuracao()` (lidas do ambiente se omitido);
+    `ao_salvar_resolucao(resolucao)` é chamado com cada resolução nova salva no cache.
+    """
+
+    def __init__(self, config=None, ao_salvar_resolucao=None):
+        self.config = config if config is not None else ler_configuracao()
+        self.ao_salvar_resolucao = ao_salvar_resolucao
+        self._criados = {}
+        self._lock = threading.RLock() # O índice de similares é criado a partir do cache de respostas
+
+    def _obter(self, nome, fabrica):
+        if nome not in self._criados:
+            with self._lock:
+                if nome not in self._criados:
+                    self._criados[nome] = fabrica()
+        return self._criados[nome]
+
+    def _criar_cache(self, tabela):
+        return CacheSQLite(self.config['CACHE_DB'], tabela, max_itens=self.config['CACHE_MAX_ITENS'],
+                           ttl_segundos=self.config['CACHE_TTL_DIAS'] * 24 * 3600)
+
+    @property
+    def modelo(self):
+        # Todas as chamadas ao Gemini passam pelo mesmo cliente, que controla cota, concorrência e novas tentativas
+        return self._obter('modelo', lambda: criar_cliente(self.config['GEMINI_BACKEND'],
+                                                           requisicoes_por_minuto=self.config['GEMINI_REQUISICOES_POR_MINUTO'],
+                                                           tokens_por_minuto=self.config['GEMINI_TOKENS_POR_MINUTO'],
+                                                           max_em_voo=self.config['GEMINI_MAX_EM_VOO'],
+                                                           max_tentativas=self.config['GEMINI_MAX_TENTATIVAS'],
+                                                           timeout=self.config['GEMINI_TIMEOUT_SEGUNDOS']))
+
+    @property
+    def cache_respostas(self):
+        # Respostas do Gemini, compartilhadas entre sessões, processos e reinícios
+        return self._obter('cache_respostas', lambda: self._criar_cache('respostas_gemini'))
+
+    @property
+    def cache_documentos(self):
+        # Texto extraído e questões identificadas por hash do PDF
+        return self._obter('cache_documentos', lambda: self._criar_cache('documentos'))
+
+    @property
+    def indice_de_similares(self):
+        """
+        Exercícios já resolvidos, para encontrar versões quase idênticas de um exercício novo (com os mesmos
+        limites do cache, e sem os que apontam para resoluções que já saíram dele). None se desligado.
+        """
+        if not self.config['SIMILARIDADE_INDICE']:
+            return None
+        return self._obter('indice_de_similares',
+                           lambda: IndiceDeSimilares(self.config['CACHE_DB'], limiar=self.config['SIMILARIDADE_LIMIAR'],
+                                                     tabela_de_resolucoes=self.cache_respostas.tabela,
+                                                     max_itens=self.config['CACHE_MAX_ITENS'],
+                                                     ttl_segundos=self.config['CACHE_TTL_DIAS'] * 24 * 3600))
+
+    # --- Extração e identificação ---
+    def chave_normalizacao(self):
+        # Parte da chave das questões identificadas: a normalização muda o texto enviado à identificação
+        if not self.config['NORMALIZACAO_TEXTO']:
+            return 'sem_normalizacao'
+        return f"normalizacao-{VERSAO_NORMALIZACAO}-{int(self.config['NORMALIZACAO_DESCARTAR_PAGINAS'])}"
+
+    def chave_cache_exercicios(self, hash_do_pdf, file_type):
+        return gerar_chave('exercicios', hash_do_pdf, file_type, VERSAO_PROMPT_IDENTIFICACAO, nome_do_modelo(self.modelo),
+                           self.chave_normalizacao())
+
+    def extrair_texto_por_tipo(self, caminho_pdf, file_type, hash_do_pdf=None):
+        if file_type == 'text_only':
+            logger.debug("Tentando extrair com PyPDF2 para '%s'", caminho_pdf)
+            with DURACAO_ETAPA.cronometrar(etapa='extracao', detalhe='pypdf2'):
+                return extrair_texto(caminho_pdf, 'pypdf2')
+        elif file_type == 'mixed_content':
+            logger.debug("Tentando extrair com pdfplumber para '%s'", caminho_pdf)
+            with DURACAO_ETAPA.cronometrar(etapa='extracao', detalhe='pdfplumber'):
+                return extrair_texto(caminho_pdf, 'pdfplumber')
+        elif file_type == 'auto':
+            texto, relatorio = extrair_texto_automatico(caminho_pdf, hash_do_pdf=hash_do_pdf, cache=self.cache_documentos)
+            estrategia = relatorio['estrategia'] or 'falha'
+            DURACAO_ETAPA.observar(relatorio['duracao_amostragem'], etapa='amostragem')
+            DURACAO_ETAPA.observar(relatorio['duracao_extracao'], etapa='extracao', detalhe=f"auto:{estrategia}")
+            ESTRATEGIAS_DE_EXTRACAO.inc(estrategia=estrategia)
+            for extrator, paginas in relatorio['paginas_por_extrator'].items():
+                PAGINAS_EXTRAIDAS.inc(paginas, extrator=extrator)
+            logger.info("Extração automática de '%s': %s (amostragem %.2fs, extração %.2fs, páginas por extrator %s)",
+                        caminho_pdf, estrategia, relatorio['duracao_amostragem'], relatorio['duracao_extracao'],
+                        relatorio['paginas_por_extrator'])
+            return texto
+        elif file_type in TIPOS_ESCANEADOS:
+            logger.debug("Tentando extrair com OCR para '%s'", caminho_pdf)
+            with DURACAO_ETAPA.cronometrar(etapa='extracao', detalhe='ocr'):
+                return extrair_texto_ocr(caminho_pdf, hash_do_pdf, self.cache_documentos)
+        return ""
+
+    def gerar_conteudo(self, prompt, etapa, **kwargs):
+        """Chama o modelo registrando a duração da chamada e os tamanhos do prompt e da resposta."""
+        TAMANHO_PROMPT.observar(len(prompt), tipo=etapa)
+        with DURACAO_ETAPA.cronometrar(etapa=etapa):
+            response = self.modelo.generate_content(prompt, **kwargs)
+        TAMANHO_RESPOSTA.observar(len(response.text), tipo=etapa)
+        return response
+
+    def identificar_exercicios_com_gemini(self, texto_completo_do_pdf):
+        prompt_identificacao = montar_prompt_identificacao(texto_completo_do_pdf, em_json=self.config['IDENTIFICACAO_JSON'])
+        opcoes = {}
+        if self.config['IDENTIFICACAO_JSON']:
+            opcoes = {'generation_config': {'response_mime_type': 'application/json', 'response_schema': ESQUEMA_IDENTIFICACAO}}
+        try:
+            response = self.gerar_conteudo(prompt_identificacao, 'identificacao', **opcoes)
+            return response.text
+        except Exception as e:
+            logger.error("Erro ao chamar a API do Gemini para identificar exercícios: %s", e)
+            return "ERRO_NA_IDENTIFICACAO"
+
+    def identificar_janela(self, texto_janela):
+        resposta = self.identificar_exercicios_com_gemini(texto_janela)
+        if resposta == "ERRO_NA_IDENTIFICACAO":
+            raise RuntimeError("Falha ao identificar exercícios nesta janela.")
+        return resposta
+
+    def identificar_exercicios_do_texto(self, texto_do_pdf):
+        """
+        Identifica os exercícios do texto, em uma única chamada ou, para textos grandes,
+        em janelas de páginas processadas em paralelo.
+        Retorna (exercicios, completo); `completo` é False se alguma janela falhou.
+        """
+        if len(texto_do_pdf) <= self.config['IDENTIFICACAO_LIMIAR_CARACTERES']:
+            texto_exercicios_do_gemini = self.identificar_exercicios_com_gemini(texto_do_pdf)
+            return parsear_exercicios_do_gemini(texto_exercicios_do_gemini), texto_exercicios_do_gemini != "ERRO_NA_IDENTIFICACAO"
+
+        exercicios, relatorio = identificar_em_janelas(texto_do_pdf, self.identificar_janela, parsear_exercicios_do_gemini,
+                                                       paginas_por_janela=self.config['IDENTIFICACAO_PAGINAS_POR_JANELA'],
+                                                       sobreposicao=self.config['IDENTIFICACAO_SOBREPOSICAO'],
+                                                       max_simultaneas=self.config['IDENTIFICACAO_MAX_SIMULTANEAS'])
+        registrar_janelas(relatorio)
+        return exercicios, relatorio['falhas'] == 0
+
+    def extrair_e_identificar_com_ocr(self, caminho_pdf, hash_do_pdf, atualizar=lambda etapa: None):
+        """
+        Reconhece as páginas por OCR em paralelo e envia cada janela de páginas à identificação assim
+        que ela fica pronta, sem esperar o restante do documento.
+        Retorna (texto, exercicios, completo); `texto` é None se o OCR não estiver disponível ou falhar.
+        """
+        if not ocr_disponivel():
+            logger.error("OCR indisponível: instale pytesseract, pdf2image, o Tesseract e o Poppler.")
+            return None, [], False
+
+        def paginas():
+            with DURACAO_ETAPA.cronometrar(etapa='extracao', detalhe='ocr'):
+                yield from iterar_paginas_ocr(caminho_pdf, hash_do_pdf=hash_do_pdf, cache=self.cache_documentos)
+            atualizar(ETAPA_EXTRAIDO)
+
+        paginas_para_identificar = paginas()
+        relatorio_normalizacao = {}
+        if self.config['NORMALIZACAO_TEXTO']:
+            paginas_para_identificar = normalizar_paginas_em_fluxo(paginas_para_identificar, relatorio_normalizacao)
+        try:
+            exercicios, relatorio, texto = identificar_paginas_em_fluxo(paginas_para_identificar, self.identificar_janela,
+                                                                        parsear_exercicios_do_gemini,
+                                                                        paginas_por_janela=self.config['IDENTIFICACAO_PAGINAS_POR_JANELA'],
+                                                                        sobreposicao=self.config['IDENTIFICACAO_SOBREPOSICAO'],
+                                                                        max_simultaneas=self.config['IDENTIFICACAO_MAX_SIMULTANEAS'])
+        except Exception as e:
+            logger.error("Erro ao extrair texto com OCR: %s", e)
+            return None, [], False
+        if relatorio_normalizacao:
+            registrar_normalizacao(relatorio_normalizacao)
+        registrar_janelas(relatorio)
+        return texto, exercicios, relatorio['falhas'] == 0
+
+    def normalizar_para_identificacao(self, texto_do_pdf):
+        """Aplica a normalização configurada ao texto extraído, registrando a redução de tokens."""
+        if not self.config['NORMALIZACAO_TEXTO']:
+            return texto_do_pdf
+        with DURACAO_ETAPA.cronometrar(etapa='normalizacao'):
+            texto_normalizado, relatorio = normalizar_texto_extraido(
+                texto_do_pdf, descartar_paginas_sem_exercicios=self.config['NORMALIZACAO_DESCARTAR_PAGINAS'])
+        registrar_normalizacao(relatorio)
+        return texto_normalizado
+
+    def extrair_e_identificar(self, caminho_pdf, hash_do_pdf, file_type, chave_exercicios=None, atualizar=lambda etapa: None):
+        """
+        Extrai o texto (ou o reaproveita do cache) e identifica as questões do PDF, chamando `atualizar(etapa)`
+        ao fim da extração. Retorna (exercicios, mensagem_de_erro); `exercicios` é None se houve erro.
+        """
+        chave_exercicios = chave_exercicios or self.chave_cache_exercicios(hash_do_pdf, file_type)
+        chave_texto = gerar_chave('texto', VERSAO_EXTRACAO, hash_do_pdf, file_type)
+        texto_do_pdf = self.cache_documentos.obter(chave_texto)
+        exercicios_identificados = None
+        if texto_do_pdf is None:
+            if not os.path.exists(caminho_pdf):
+                return None, "O arquivo enviado não está mais disponível. Envie o PDF novamente."
+            if file_type in TIPOS_ESCANEADOS:
+                # O OCR é lento: a identificação começa enquanto as últimas páginas ainda estão sendo reconhecidas
+                texto_do_pdf, exercicios_identificados, identificacao_completa = self.extrair_e_identificar_com_ocr(
+                    caminho_pdf, hash_do_pdf, atualizar)
+            else:
+                texto_do_pdf = self.extrair_texto_por_tipo(caminho_pdf, file_type, hash_do_pdf)
+            logger.debug("Texto do PDF (primeiros 200 chars): %s", texto_do_pdf[:200] if texto_do_pdf else 'Nenhum texto extraído')
+
+            if not texto_do_pdf or not texto_do_pdf.strip():
+                logger.debug("Condição de erro de extração ativada. Caracteres extraídos: %s", len(texto_do_pdf or ""))
+                return None, "Erro ao extrair texto do PDF. Para PDFs escaneados, o OCR precisa estar instalado no servidor."
+            self.cache_documentos.salvar(chave_texto, texto_do_pdf)
+        else:
+            logger.debug("Texto extraído encontrado no cache de documentos.")
+        atualizar(ETAPA_EXTRAIDO)
+
+        if exercicios_identificados is None:
+            texto_para_identificar = self.normalizar_para_identificacao(texto_do_pdf)
+            exercicios_identificados, identificacao_completa = self.identificar_exercicios_do_texto(texto_para_identificar)
+        if not exercicios_identificados:
+            logger.debug("Gemini não identificou questões.")
+            return None, "O Gemini não conseguiu identificar nenhuma questão no PDF."
+        if identificacao_completa:
+            self.cache_documentos.salvar(chave_exercicios, exercicios_identificados)
+        atualizar(ETAPA_IDENTIFICADO)
+        return exercicios_identificados, None
+
+    # --- Resolução ---
+    def chave_cache_resolucao(self, exercicio_texto):
+        return gerar_chave('resolucao', VERSAO_PROMPT_RESOLUCAO, nome_do_modelo(self.modelo), normalizar_texto(exercicio_texto))
+
+    def escopo_das_resolucoes(self):
+        return f"{VERSAO_PROMPT_RESOLUCAO}:{nome_do_modelo(self.modelo)}"
+
+    def obter_resolucao_em_cache(self, exercicio_texto):
+        """
+        Resolução já salva para o exercício: pelo texto exato ou, com o índice de similares ativo, pela de um
+        exercício quase idêntico, que então também é salva sob a chave deste. Retorna None se não houver.
+        """
+        chave_cache = self.chave_cache_resolucao(exercicio_texto)
+        resolucao = self.cache_respostas.obter(chave_cache)
+        indice_de_similares = self.indice_de_similares
+        if resolucao is not None or indice_de_similares is None:
+            return resolucao
+        with DURACAO_ETAPA.cronometrar(etapa='busca_similares'):
+            encontrados = indice_de_similares.buscar(exercicio_texto, self.escopo_das_resolucoes())
+        for chave_similar, similaridade in encontrados:
+            resolucao = self.cache_respostas.obter(chave_similar)
+            if resolucao is not None: # A resolução do similar pode já ter saído do cache
+                logger.debug("Reaproveitando a resolução de um exercício quase idêntico (similaridade %.2f).", similaridade)
+                self.cache_respostas.salvar(chave_cache, resolucao)
+                return resolucao
+        return None
+
+    def salvar_resolucao(self, exercicio_texto, resolucao):
+        chave_cache = self.chave_cache_resolucao(exercicio_texto)
+        self.cache_respostas.salvar(chave_cache, resolucao)
+        if self.ao_salvar_resolucao is not None:
+            self.ao_salvar_resolucao(resolucao)
+        if self.indice_de_similares is not None:
+            self.indice_de_similares.adicionar(exercicio_texto, self.escopo_das_resolucoes(), chave_cache)
+
+    def resolver_exercicio_com_gemini(self, exercicio_texto):
+        resolucao_em_cache = self.obter_resolucao_em_cache(exercicio_texto)
+        if resolucao_em_cache is not None:
+            return resolucao_em_cache
+
+        prompt_resolucao = montar_prompt_resolucao(exercicio_texto)
+        try:
+            response = self.gerar_conteudo(prompt_resolucao, 'resolucao')
+            self.salvar_resolucao(exercicio_texto, response.text)
+            return response.text
+        except Exception as e:
+            logger.error("Erro ao chamar a API do Gemini para este exercício: %s", e)
+            return MENSAGEM_FALHA_RESOLUCAO
+
+    def resolver_exercicio_com_gemini_em_streaming(self, exercicio_texto):
+        """
+        Gera a resolução em pedaços, à medida que o Gemini produz o texto.
+        A resolução completa é salva no cache ao final. Exceções da API são propagadas.
+        """
+        resolucao_em_cache = self.obter_resolucao_em_cache(exercicio_texto)
+        if resolucao_em_cache is not None:
+            yield resolucao_em_cache
+            return
+
+        prompt_resolucao = montar_prompt_resolucao(exercicio_texto)
+        TAMANHO_PROMPT.observar(len(prompt_resolucao), tipo='resolucao_streaming')
+        partes = []
+        with DURACAO_ETAPA.cronometrar(etapa='resolucao_streaming'):
+            for chunk in self.modelo.generate_content(prompt_resolucao, stream=True):
+                if chunk.text:
+                    partes.append(chunk.text)
+                    yield chunk.text
+        resolucao = "".join(partes)
+        TAMANHO_RESPOSTA.observar(len(resolucao), tipo='resolucao_streaming')
+        self.salvar_resolucao(exercicio_texto, resolucao)
+
+    def resolver_exercicios_em_lote(self, textos):
+        """
+        Resolve vários exercícios agrupando-os em poucas chamadas com resposta estruturada em JSON.
+
+        Usa o cache por exercício antes de montar os lotes, e itens ausentes ou inválidos na resposta
+        são resolvidos um a um. Retorna, na ordem de `textos`, o mesmo formato de `executar_em_paralelo`.
+        """
+        inicio = time.perf_counter()
+        resultados = [None] * len(textos)
+        faltando = []
+        for indice, texto in enumerate(textos):
+            em_cache = self.obter_resolucao_em_cache(texto)
+            if em_cache is not None:
+                resultados[indice] = {'resultado': em_cache, 'erro': None, 'duracao': 0.0}
+            else:
+                faltando.append(indice)
+
+        lotes = [[faltando[i] for i in lote] for lote in agrupar_em_lotes([textos[i] for i in faltando],
+                                                                         self.config['LOTE_MAX_CARACTERES'],
+                                                                         self.config['LOTE_MAX_EXERCICIOS'])]
+
+        def resolver_lote(lote):
+            if len(lote) == 1:
+                return {}
+            response = self.gerar_conteudo(montar_prompt_resolucao_em_lote([(i, textos[i]) for i in lote]), 'resolucao_lote',
+                                           generation_config={'response_mime_type': 'application/json'})
+            return validar_resolucoes_em_lote(response.text, set(lote))
+
+        respostas = executar_em_paralelo(resolver_lote, lotes, self.config['MAX_RESOLUCOES_SIMULTANEAS'])
+        repetir = []
+        for lote, resposta in zip(lotes, respostas):
+            resolucoes = resposta['resultado'] or {}
+            if resposta['erro']:
+                logger.error("Erro ao chamar a API do Gemini para um lote de %s exercício(s): %s", len(lote), resposta['erro'])
+            for indice in lote:
+                if indice in resolucoes:
+                    self.salvar_resolucao(textos[indice], resolucoes[indice])
+                    resultados[indice] = {'resultado': resolucoes[indice], 'erro': None, 'duracao': resposta['duracao']}
+                else:
+                    repetir.append(indice)
+
+        if repetir:
+            logger.debug("%s exercício(s) ausente(s) ou inválido(s) nos lotes; resolvendo individualmente.", len(repetir))
+            individuais = executar_em_paralelo(lambda i: self.resolver_exercicio_com_gemini(textos[i]),
+                                               repetir, self.config['MAX_RESOLUCOES_SIMULTANEAS'])
+            for indice, resultado in zip(repetir, individuais):
+                resultados[indice] = resultado
+
+        logger.debug("%s exercício(s) resolvidos com %s lote(s) e %s chamada(s) individuais em %.2fs.",
+                     len(textos), len(lotes), len(repetir), time.perf_counter() - inicio)
+        return resultados
+
+    # --- Exercícios similares ---
+    def chave_cache_similares(self, tipo, exercicio_original, resolucao_original, quantidade):
+        return gerar_chave(tipo, VERSAO_PROMPT_SIMILARES, nome_do_modelo(self.modelo), quantidade,
+                           normalizar_texto(exercicio_original), normalizar_texto(resolucao_original))
+
+    def gerar_exercicios_similares_com_gemini(self, exercicio_original, resolucao_original, quantidade=2):
+        chave_cache = self.chave_cache_similares('similares', exercicio_original, resolucao_original, quantidade)
+        similares_em_cache = self.cache_respostas.obter(chave_cache)
+        if similares_em_cache is not None:
+            return similares_em_cache
+
+        prompt_similares = montar_prompt_similares(exercicio_original, resolucao_original, quantidade)
+        try:
+            response = self.gerar_conteudo(prompt_similares, 'similares')
+            self.cache_respostas.salvar(chave_cache, response.text)
+            return response.text
+        except Exception as e:
+            logger.error("Erro ao chamar a API do Gemini para gerar exercícios similares: %s", e)
+            return "Não foi possível gerar exercícios similares."
+
+    def gerar_similares_com_resolucoes(self, exercicio_original, resolucao_original, quantidade):
+        """
+        Gera os similares já resolvidos em uma única chamada com resposta em JSON.
+        Cada similar ({'texto', 'resolucao'}) é produzido assim que o seu objeto termina de chegar no streaming;
+        a lista é salva no cache quando vier completa. Exceções da API são propagadas.
+        """
+        chave_cache = self.chave_cache_similares('similares_com_resolucoes', exercicio_original, resolucao_original, quantidade)
+        similares_em_cache = self.cache_respostas.obter(chave_cache)
+        if similares_em_cache is not None:
+            yield from similares_em_cache
+            return
+
+        prompt_similares = montar_prompt_similares_com_resolucoes(exercicio_original, resolucao_original, quantidade)
+        configuracao = {'response_mime_type': 'application/json', 'response_schema': ESQUEMA_SIMILARES}
+        leitor = LeitorDeExerciciosJSON(validar=validar_similar)
+        similares = []
+        tamanho_resposta = 0
+        TAMANHO_PROMPT.observar(len(prompt_similares), tipo='similares_com_resolucoes')
+        with DURACAO_ETAPA.cronometrar(etapa='similares_com_resolucoes'):
+            for chunk in self.modelo.generate_content(prompt_similares, stream=True, generation_config=configuracao):
+                tamanho_resposta += len(chunk.text or "")
+                for similar in leitor.alimentar(chunk.text or ""):
+                    if len(similares) < quantidade: # Itens além do pedido são descartados
+                        similares.append(similar)
+                        yield similar
+        TAMANHO_RESPOSTA.observar(tamanho_resposta, tipo='similares_com_resolucoes')
+        if leitor.invalidos:
+            logger.warning("%s exercício(s) similar(es) inválido(s) descartado(s) da resposta.", leitor.invalidos)
+        if len(similares) == quantidade:
+            self.cache_respostas.salvar(chave_cache, similares)
+
+    def resolver_similares_em_paralelo(self, exercicio_original, resolucao_original, quantidade):
+        """
+        Gera os enunciados dos similares e resolve todos ao mesmo tempo, produzindo cada similar
+        ({'texto', 'resolucao'}) assim que a sua resolução termina. Similares cuja resolução falhou são
+        descartados, para que não fiquem salvos na sessão como se estivessem resolvidos.
+        """
+        similares_raw = self.gerar_exercicios_similares_com_gemini(exercicio_original, resolucao_original, quantidade=quantidade)
+        textos = [ex['texto'] for ex in parsear_exercicios_do_gemini(similares_raw)][:quantidade]
+        if not textos:
+            return
+        executor = ThreadPoolExecutor(max_workers=min(len(textos), self.config['MAX_RESOLUCOES_SIMULTANEAS']))
+        try:
+            futuros = {executor.submit(self.resolver_exercicio_com_gemini, texto): texto for texto in textos}
+            for futuro in as_completed(futuros):
+                resolucao = futuro.result()
+                if resolucao == MENSAGEM_FALHA_RESOLUCAO:
+                    logger.warning("Exercício similar descartado: a resolução falhou.")
+                    continue
+                yield {'texto': futuros[futuro], 'resolucao': resolucao}
+        finally:
+            executor.shutdown(wait=False) # As resoluções que ainda rodam terminam e vão para o cache
+
+    def gerar_similares_resolvidos(self, exercicio_original, resolucao_original, quantidade):
+        """
+        Produz até `quantidade` similares resolvidos, à medida que ficam prontos. Com SIMILARES_EM_UMA_CHAMADA,
+        tenta primeiro a chamada única; o que faltar (tudo, se ela falhar) é gerado e resolvido em paralelo.
+        """
+        produzidos = 0
+        if self.config['SIMILARES_EM_UMA_CHAMADA']:
+            try:
+                for similar in self.gerar_similares_com_resolucoes(exercicio_original, resolucao_original, quantidade):
+                    produzidos += 1
+                    yield similar
+            except Exception as e:
+                logger.error("Erro ao gerar os exercícios similares em uma chamada: %s", e)
+        if produzidos < quantidade:
+            yield from self.resolver_similares_em_paralelo(exercicio_original, resolucao_original, quantidade - produzidos)
+
+    # --- Versões assíncronas, para as views async da aplicação ---
+    # As chamadas ao modelo são esperadas no event loop (pelo mesmo cliente, com os mesmos limites); o acesso
+    # ao cache, que é bloqueante, roda no executor padrão.
+
+    async def gerar_conteudo_async(self, prompt, etapa, **kwargs):
+        """Como `gerar_conteudo`, esperando a resposta do modelo sem ocupar uma thread."""
+        TAMANHO_PROMPT.observar(len(prompt), tipo=etapa)
+        with DURACAO_ETAPA.cronometrar(etapa=etapa):
+            response = await self.modelo.generate_content_async(prompt, **kwargs)
+        TAMANHO_RESPOSTA.observar(len(response.text), tipo=etapa)
+        return response
+
+    async def resolver_exercicio_com_gemini_async(self, exercicio_texto):
+        resolucao_em_cache = await asyncio.to_thread(self.obter_resolucao_em_cache, exercicio_texto)
+        if resolucao_em_cache is not None:
+            return resolucao_em_cache
+
+        prompt_resolucao = montar_prompt_resolucao(exercicio_texto)
+        try:
+            response = await self.gerar_conteudo_async(prompt_resolucao, 'resolucao')
+            await asyncio.to_thread(self.salvar_resolucao, exercicio_texto, response.text)
+            return response.text
+        except Exception as e:
+            logger.error("Erro ao chamar a API do Gemini para este exercício: %s", e)
+            return MENSAGEM_FALHA_RESOLUCAO
+
+    async def _similares_com_resolucoes_async(self, exercicio_original, resolucao_original, quantidade):
+        # Como `gerar_similares_com_resolucoes`, sem streaming: a view async responde com a lista completa
+        chave_cache = self.chave_cache_similares('similares_com_resolucoes', exercicio_original, resolucao_original, quantidade)
+        similares_em_cache = await asyncio.to_thread(self.cache_respostas.obter, chave_cache)
+        if similares_em_cache is not None:
+            return similares_em_cache
+
+        prompt_similares = montar_prompt_similares_com_resolucoes(exercicio_original, resolucao_original, quantidade)
+        configuracao = {'response_mime_type': 'application/json', 'response_schema': ESQUEMA_SIMILARES}
+        response = await self.gerar_conteudo_async(prompt_similares, 'similares_com_resolucoes', generation_config=configuracao)
+        leitor = LeitorDeExerciciosJSON(validar=validar_similar)
+        similares = list(leitor.alimentar(response.text))[:quantidade] # Itens além do pedido são descartados
+        if leitor.invalidos:
+            logger.warning("%s exercício(s) similar(es) inválido(s) descartado(s) da resposta.", leitor.invalidos)
+        if len(similares) == quantidade:
+            await asyncio.to_thread(self.cache_respostas.salvar, chave_cache, similares)
+        return similares
+
+    async def _resolver_similares_em_paralelo_async(self, exercicio_original, resolucao_original, quantidade):
+        chave_cache = self.chave_cache_similares('similares', exercicio_original, resolucao_original, quantidade)
+        similares_raw = await asyncio.to_thread(self.cache_respostas.obter, chave_cache)
+        if similares_raw is None:
+            prompt_similares = montar_prompt_similares(exercicio_original, resolucao_original, quantidade)
+            try:
+                response = await self.gerar_conteudo_async(prompt_similares, 'similares')
+            except Exception as e:
+                logger.error("Erro ao chamar a API do Gemini para gerar exercícios similares: %s", e)
+                return []
+            similares_raw = response.text
+            await asyncio.to_thread(self.cache_respostas.salvar, chave_cache, similares_raw)
+
+        textos = [ex['texto'] for ex in parsear_exercicios_do_gemini(similares_raw)][:quantidade]
+        resolucoes = await executar_em_paralelo_async(self.resolver_exercicio_com_gemini_async, textos,
+                                                      self.config['MAX_RESOLUCOES_SIMULTANEAS'])
+        similares = []
+        for texto, resolucao in zip(textos, resolucoes):
+            if resolucao['erro'] or resolucao['resultado'] == MENSAGEM_FALHA_RESOLUCAO:
+                logger.warning("Exercício similar descartado: a resolução falhou.")
+                continue
+            similares.append({'texto': texto, 'resolucao': resolucao['resultado']})
+        return similares
+
+    async def gerar_similares_resolvidos_async(self, exercicio_original, resolucao_original, quantidade):
+        """
+        Como `gerar_similares_resolvidos`, mas retorna a lista completa: primeiro a chamada única (com
+        SIMILARES_EM_UMA_CHAMADA) e, para o que faltar, os enunciados resolvidos em paralelo.
+        """
+        similares = []
+        if self.config['SIMILARES_EM_UMA_CHAMADA']:
+            try:
+                similares = await self._similares_com_resolucoes_async(exercicio_original, resolucao_original, quantidade)
+            except Exception as e:
+                logger.error("Erro ao gerar os exercícios similares em uma chamada: %s", e)
+        if len(similares) < quantidade:
+            similares = similares + await self._resolver_similares_em_paralelo_async(
+                exercicio_original, resolucao_original, quantidade - len(similares))
+        return similares
@@ -0,0 +1,125 @@
+"""
+Prompts enviados ao modelo, compartilhados pela aplicação web e pelos scripts de linha de comando.
+
+O modelo simulado (model_backends.py) reconhece os prompts pelo texto; ao alterá-los, mantenha os
+trechos que ele procura e incremente a versão correspondente abaixo, para não reaproveitar respostas
+antigas do cache.
+"""
+
+VERSAO_PROMPT_IDENTIFICACAO = 2
+VERSAO_PROMPT_RESOLUCAO = 1
+VERSAO_PROMPT_SIMILARES = 2
+
+
+def montar_prompt_identificacao(texto_completo_do_pdf, em_json=True):
+    """Prompt de identificação das questões: resposta em JSON (veja ESQUEMA_IDENTIFICACAO) ou em lista numerada."""
+    if em_json:
+        return f"""
+    Dado o seguinte texto extraído de um documento, identifique e extraia todas as questões ou exercícios.
+    Para cada questão identificada, forneça apenas o texto da questão, sem as soluções ou explicações.
+
+    Responda apenas com um array JSON, com um objeto por questão, na ordem do documento:
+    [{{"numero": "<número ou letra da questão no documento>", "texto": "<texto da questão>", "pagina": <página, se for possível saber>}}]
+    Se não houver questões claras, responda [].
+
+    TEXTO:
+    ---
+    {texto_completo_do_pdf}
+    ---
+    """
+    return f"""
+    Dado o seguinte texto extraído de um documento, identifique e extraia todas as questões ou exercícios.
+    Para cada questão identificada, forneça apenas o texto da questão, sem as soluções ou explicações.
+    Liste as questões em uma lista numerada.
+
+    Formato de saída desejado:
+    1. [Texto da primeira questão]
+    2. [Texto da segunda questão]
+    ...
+
+    Se não houver questões claras, responda 'Nenhuma questão encontrada.'.
+
+    TEXTO:
+    ---
+    {texto_completo_do_pdf}
+    ---
+    """
+
+
+def montar_prompt_resolucao(exercicio_texto):
+    return f"""
+    Resolva o seguinte exercício e explique cada passo detalhadamente, como se estivesse ensinando alguém.
+    Mantenha a resposta clara e focada apenas na resolução e explicação.
+    **Por favor, formate sua resposta usando Markdown**, incluindo cabeçalhos, listas, negrito, itálico e blocos de código para fórmulas ou cálculos, quando apropriado.
+
+    Exercício:
+    ---
+    {exercicio_texto}
+    ---
+
+    Certifique-se de mostrar todos os cálculos e a lógica por trás de cada etapa.
+    """
+
+
+def montar_prompt_resolucao_em_lote(itens):
+    exercicios = "\n".join(f"""
+    Exercício de id {id_item}:
+    ---
+    {texto}
+    ---""" for id_item, texto in itens)
+    return f"""
+    Resolva cada um dos exercícios abaixo e explique cada passo detalhadamente, como se estivesse ensinando alguém.
+    Mantenha cada resposta clara e focada apenas na resolução e explicação.
+    **Formate cada resolução usando Markdown**, incluindo cabeçalhos, listas, negrito, itálico e blocos de código para fórmulas ou cálculos, quando apropriado.
+    Certifique-se de mostrar todos os cálculos e a lógica por trás de cada etapa.
+
+    Responda apenas com um array JSON, com um objeto por exercício, no formato:
+    [{{"id": <id do exercício>, "resolucao": "<resolução em Markdown>"}}]
+    {exercicios}
+    """
+
+
+def montar_prompt_similares(exercicio_original, resolucao_original, quantidade):
+    return f"""
+    Com base no seguinte exercício e sua resolução, crie {quantidade} novos exercícios que abordem o mesmo conceito
+    ou tipo de problema, mas com valores, cenários ou dados diferentes.
+    Não inclua as soluções para os novos exercícios.
+    **Por favor, apresente cada novo exercício como uma lista numerada, formatado em Markdown, com negrito ou itálico para destacar termos importantes.**
+
+    Exercício Original:
+    ---
+    {exercicio_original}
+    ---
+
+    Resolução do Exercício Original (para contexto do conceito):
+    ---
+    {resolucao_original}
+    ---
+
+    Por favor, formate os novos exercícios da seguinte forma em Markdown:
+    1. [Texto do Exercício Similar 1, com Markdown]
+    2. [Texto do Exercício Similar 2, com Markdown]
+    ...
+    """
+
+
+def montar_prompt_similares_com_resolucoes(exercicio_original, resolucao_original, quantidade):
+    return f"""
+    Com base no seguinte exercício e sua resolução, crie {quantidade} novos exercícios que abordem o mesmo conceito
+    ou tipo de problema, mas com valores, cenários ou dados diferentes.
+    Resolva cada novo exercício e explique cada passo detalhadamente, como se estivesse ensinando alguém.
+    **Use Markdown** nos enunciados e nas resoluções, incluindo negrito, listas e blocos de código para fórmulas ou cálculos, quando apropriado.
+
+    Responda apenas com um array JSON, com um objeto por novo exercício:
+    [{{"texto": "<enunciado do novo exercício>", "resolucao": "<resolução passo a passo>"}}]
+
+    Exercício Original:
+    ---
+    {exercicio_original}
+    ---
+
+    Resolução do Exercício Original (para contexto do conceito):
+    ---
+    {resolucao_original}
+    ---
+    """
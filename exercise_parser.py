@@ -0,0 +1,190 @@
+import json
+import re
+
+# Esquema da resposta estruturada pedida na identificação (subconjunto OpenAPI aceito pelo Gemini)
+ESQUEMA_IDENTIFICACAO = {
+    'type': 'array',
+    'items': {
+        'type': 'object',
+        'properties': {
+            'numero': {'type': 'string', 'description': "Número ou letra do exercício no documento, como aparece nele."},
+            'texto': {'type': 'string', 'description': "Enunciado completo do exercício, sem a solução."},
+            'pagina': {'type': 'integer', 'description': "Página em que o exercício aparece, se for possível saber."},
+        },
+        'required': ['texto'],
+    },
+}
+
+# Esquema da geração de exercícios similares já acompanhados das resoluções
+ESQUEMA_SIMILARES = {
+    'type': 'array',
+    'items': {
+        'type': 'object',
+        'properties': {
+            'texto': {'type': 'string', 'description': "Enunciado do novo exercício, em Markdown."},
+            'resolucao': {'type': 'string', 'description': "Resolução passo a passo do novo exercício, em Markdown."},
+        },
+        'required': ['texto', 'resolucao'],
+    },
+}
+
+_ARRAY_VAZIO = re.compile(r'^\s*(?:```(?:json)?\s*)?\[\s*\]\s*(?:```)?\s*$')
+_FORA_DE_STRING = re.compile(r'[{}"]')
+_DENTRO_DE_STRING = re.compile(r'["\\]')
+
+# Início de um item numerado em texto livre: "1.", "12)", "a.", "**3.**", "- 4.", "Questão 5."
+_MARCADOR = re.compile(
+    r'^[ \t]*(?:[-*•][ \t]+)?(?P<negrito>\*\*|__)?(?:(?:quest[aã]o|exerc[ií]cio)[ \t]+)?'
+    r'(?P<numero>\d+|[a-z])[ \t]*[.)](?:\*\*|__)?(?:[ \t]+|$)(?P<texto>.*)$',
+    re.IGNORECASE)
+
+
+def _validar(item):
+    """Normaliza um objeto da resposta JSON; retorna None se ele não tiver um enunciado."""
+    if not isinstance(item, dict):
+        return None
+    texto = item.get('texto')
+    if not isinstance(texto, str) or not texto.strip():
+        return None
+    numero = item.get('numero')
+    numero = str(numero).strip() if isinstance(numero, (str, int)) and str(numero).strip() else None
+    pagina = item.get('pagina')
+    if isinstance(pagina, str) and pagina.strip().isdigit():
+        pagina = int(pagina)
+    pagina = pagina if isinstance(pagina, int) and not isinstance(pagina, bool) and pagina > 0 else None
+    return {'texto': texto.strip(), 'numero': numero, 'pagina': pagina}
+
+
+def validar_similar(item):
+    """Normaliza um exercício similar ({'texto', 'resolucao'}); retorna None se faltar um dos dois."""
+    if not isinstance(item, dict):
+        return None
+    texto, resolucao = item.get('texto'), item.get('resolucao')
+    if not all(isinstance(campo, str) and campo.strip() for campo in (texto, resolucao)):
+        return None
+    return {'texto': texto.strip(), 'resolucao': resolucao.strip()}
+
+
+class LeitorDeExerciciosJSON:
+    """
+    Lê incrementalmente um array JSON de exercícios, pedaço a pedaço, como chega de uma resposta em streaming.
+
+    `alimentar(pedaco)` gera cada exercício assim que o seu objeto é fechado. Cada caractere é
+    examinado uma única vez, então o tempo é linear no tamanho da resposta, mesmo com milhares de itens.
+    Texto fora dos objetos (colchetes, vírgulas, cercas de código) é ignorado. `validar` normaliza
+    cada objeto e descarta os inválidos retornando None.
+    """
+
+    def __init__(self, validar=_validar):
+        self.validar = validar
+        self.objetos = 0
+        self.invalidos = 0
+        self._partes = [] # Trechos do objeto ainda aberto, vindos de pedaços anteriores
+        self._profundidade = 0
+        self._em_string = False
+        self._escapando = False
+
+    def alimentar(self, pedaco):
+        if not pedaco: # Um pedaço vazio não pode consumir o caractere escapado do próximo
+            return
+        posicao = 0
+        inicio = 0
+        if self._escapando:
+            posicao, self._escapando = 1, False
+        while True:
+            if self._em_string:
+                encontrado = _DENTRO_DE_STRING.search(pedaco, posicao)
+                if encontrado is None:
+                    break
+                if encontrado.group() == '\\':
+                    posicao = encontrado.end() + 1
+                    if posicao > len(pedaco):
+                        self._escapando = True
+                        break
+                    continue
+                self._em_string = False
+                posicao = encontrado.end()
+                continue
+
+            encontrado = _FORA_DE_STRING.search(pedaco, posicao)
+            if encontrado is None:
+                break
+            caractere = encontrado.group()
+            posicao = encontrado.end()
+            if caractere == '"':
+                self._em_string = True
+            elif caractere == '{':
+                if self._profundidade == 0:
+                    inicio = encontrado.start()
+                self._profundidade += 1
+            elif self._profundidade > 0:
+                self._profundidade -= 1
+                if self._profundidade == 0:
+                    texto_objeto = "".join(self._partes) + pedaco[inicio:posicao]
+                    self._partes = []
+                    exercicio = self._decodificar(texto_objeto)
+                    if exercicio is not None:
+                        yield exercicio
+        if self._profundidade > 0:
+            self._partes.append(pedaco[inicio:])
+
+    def _decodificar(self, texto_objeto):
+        self.objetos += 1
+        try:
+            exercicio = self.validar(json.loads(texto_objeto))
+        except ValueError:
+            exercicio = None
+        if exercicio is None:
+            self.invalidos += 1
+        return exercicio
+
+
+def parsear_texto_livre(texto):
+    """
+    Extrai os exercícios de uma lista numerada em texto livre, em uma passada pelas linhas.
+
+    O estilo do primeiro marcador (número ou letra) define o que começa um novo exercício;
+    itens no outro estilo, como "a)" dentro de "1.", continuam o exercício atual.
+    """
+    exercicios = []
+    estilo = None
+    for linha in texto.splitlines():
+        marcador = _MARCADOR.match(linha)
+        if marcador:
+            estilo_da_linha = 'numero' if marcador['numero'].isdigit() else 'letra'
+            estilo = estilo or estilo_da_linha
+        if marcador and estilo_da_linha == estilo:
+            texto_item = marcador['texto'].strip()
+            if marcador['negrito'] and texto_item.endswith(marcador['negrito']):
+                texto_item = texto_item[:-len(marcador['negrito'])].rstrip()
+            exercicios.append((marcador['numero'], [texto_item]))
+        elif exercicios:
+            exercicios[-1][1].append(linha.strip())
+
+    resultado = []
+    for numero, linhas in exercicios:
+        texto_item = "\n".join(linhas).strip()
+        if texto_item:
+            resultado.append({'texto': texto_item, 'numero': numero, 'pagina': None})
+    return resultado
+
+
+def _parece_json(texto):
+    return texto.lstrip().startswith(('[', '{', '```'))
+
+
+def parsear_exercicios(texto):
+    """
+    Lista de exercícios ({'texto', 'numero', 'pagina'}) de uma resposta da identificação.
+
+    Respostas em JSON passam pelo `LeitorDeExerciciosJSON`; se a resposta não for JSON, ou não
+    trouxer nenhum objeto, ela é lida como uma lista numerada em texto livre.
+    """
+    if not texto or not texto.strip():
+        return []
+    if _parece_json(texto):
+        leitor = LeitorDeExerciciosJSON()
+        exercicios = list(leitor.alimentar(texto))
+        if leitor.objetos or _ARRAY_VAZIO.match(texto):
+            return exercicios
+    return parsear_texto_livre(texto)
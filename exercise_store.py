@@ -0,0 +1,147 @@
+import random
+from array import array
+
+_NENHUM = -1
+
+
+class Exercicio:
+    """Registro de um exercício da sessão. `id` é a posição no PDF (começa do 0)."""
+
+    __slots__ = ('id', 'texto', 'numero', 'pagina', 'resolucao', 'similares')
+
+    def __init__(self, id, texto, numero=None, pagina=None, resolucao=None, similares=None):
+        self.id = id
+        self.texto = texto
+        self.numero = numero
+        self.pagina = pagina
+        self.resolucao = resolucao
+        self.similares = similares if similares is not None else []
+
+    def __repr__(self):
+        return f"Exercicio(id={self.id}, numero={self.numero!r}, texto={self.texto[:30]!r})"
+
+
+class BancoDeExercicios:
+    """
+    Os exercícios de uma sessão, indexados pelo id, com o controle de quais já foram respondidos.
+
+    Os não respondidos ficam em duas estruturas de inteiros atualizadas em O(1) a cada resposta: uma lista
+    duplamente ligada na ordem do PDF (os próximos k em O(k), sem percorrer os já respondidos) e um vetor
+    denso com a posição de cada id (sorteio de k em O(k)). Na serialização (pickle, usado pelo armazenamento
+    de sessões em SQLite) os registros viram colunas, e os índices são reconstruídos ao carregar.
+    """
+
+    def __init__(self, exercicios=()):
+        self._registros = [Exercicio(i, ex['texto'], ex.get('numero'), ex.get('pagina'))
+                           for i, ex in enumerate(exercicios)]
+        self._reconstruir(bytearray(len(self._registros)))
+
+    def _reconstruir(self, respondidas):
+        total = len(self._registros)
+        self._respondidas = respondidas # 1 byte por exercício
+        self._total_respondidas = sum(respondidas)
+        nao_respondidos = [i for i in range(total) if not respondidas[i]]
+        # Lista ligada dos não respondidos em ordem; a cabeça é o primeiro deles
+        self._proximo = array('i', [_NENHUM]) * total
+        self._anterior = array('i', [_NENHUM]) * total
+        for anterior, atual in zip(nao_respondidos, nao_respondidos[1:]):
+            self._proximo[anterior] = atual
+            self._anterior[atual] = anterior
+        self._primeiro = nao_respondidos[0] if nao_respondidos else _NENHUM
+        # Vetor denso dos não respondidos (ordem qualquer) e a posição de cada id nele
+        self._densos = array('i', nao_respondidos)
+        self._posicao = array('i', [_NENHUM]) * total
+        for posicao, id_exercicio in enumerate(nao_respondidos):
+            self._posicao[id_exercicio] = posicao
+
+    def __len__(self):
+        return len(self._registros)
+
+    def __iter__(self):
+        return iter(self._registros)
+
+    def __bool__(self):
+        return bool(self._registros)
+
+    def get(self, id_exercicio):
+        """O exercício pelo id, ou None se não existir."""
+        if isinstance(id_exercicio, int) and 0 <= id_exercicio < len(self._registros):
+            return self._registros[id_exercicio]
+        return None
+
+    def respondida(self, id_exercicio):
+        return bool(self._respondidas[id_exercicio])
+
+    @property
+    def num_respondidas(self):
+        return self._total_respondidas
+
+    @property
+    def num_disponiveis(self):
+        return len(self._registros) - self._total_respondidas
+
+    def marcar_respondida(self, id_exercicio):
+        """Marca o exercício como respondido; retorna False se ele já estava."""
+        if self._respondidas[id_exercicio]:
+            return False
+        self._respondidas[id_exercicio] = 1
+        self._total_respondidas += 1
+
+        anterior, proximo = self._anterior[id_exercicio], self._proximo[id_exercicio]
+        if anterior == _NENHUM:
+            self._primeiro = proximo
+        else:
+            self._proximo[anterior] = proximo
+        if proximo != _NENHUM:
+            self._anterior[proximo] = anterior
+
+        # Troca com o último do vetor denso e remove o último
+        posicao, ultimo = self._posicao[id_exercicio], self._densos[-1]
+        self._densos[posicao] = ultimo
+        self._posicao[ultimo] = posicao
+        self._densos.pop()
+        self._posicao[id_exercicio] = _NENHUM
+        return True
+
+    def nao_respondidos(self):
+        """Os exercícios ainda não respondidos, na ordem do PDF."""
+        atual = self._primeiro
+        while atual != _NENHUM:
+            yield self._registros[atual]
+            atual = self._proximo[atual]
+
+    def proximos(self, quantidade, ignorar_ids=()):
+        """Os próximos `quantidade` exercícios não respondidos, na ordem do PDF, fora os de `ignorar_ids`."""
+        selecionados = []
+        for exercicio in self.nao_respondidos():
+            if len(selecionados) >= quantidade:
+                break
+            if exercicio.id not in ignorar_ids:
+                selecionados.append(exercicio)
+        return selecionados
+
+    def sortear(self, quantidade):
+        """`quantidade` exercícios não respondidos escolhidos ao acaso."""
+        return [self._registros[i] for i in random.sample(self._densos, quantidade)]
+
+    def respondidos(self):
+        return [exercicio for exercicio in self._registros if self._respondidas[exercicio.id]]
+
+    def __getstate__(self):
+        registros = self._registros
+        return {
+            'textos': [ex.texto for ex in registros],
+            'numeros': [ex.numero for ex in registros],
+            'paginas': [ex.pagina for ex in registros],
+            # Só os que têm resolução ou similares, que costumam ser poucos em um PDF grande
+            'resolucoes': {ex.id: ex.resolucao for ex in registros if ex.resolucao is not None},
+            'similares': {ex.id: ex.similares for ex in registros if ex.similares},
+            'respondidas': bytes(self._respondidas),
+        }
+
+    def __setstate__(self, estado):
+        resolucoes, similares = estado['resolucoes'], estado['similares']
+        self._registros = [Exercicio(i, texto, numero, pagina, resolucoes.get(i), similares.get(i))
+                           for i, (texto, numero, pagina)
+                           in enumerate(zip(estado['textos'], estado['numeros'], estado['paginas']))]
+        self._reconstruir(bytearray(estado['respondidas']))
@@ -1,33 +1,26 @@
-import PyPDF2
 import os # Para manipulação de caminhos de arquivo
+from estuda_ai.extracao import contar_paginas, extrair_texto
 
-def extrair_texto_pdf(caminho_pdf):
+def extrair_texto_pdf(caminho_pdf, intervalo=None):
     """
     Extrai texto de um arquivo PDF.
 
     Args:
         caminho_pdf (str): O caminho para o arquivo PDF.
+        intervalo (tuple, opcional): Páginas (inicio, fim) a extrair, começando em 1.
 
     Returns:
         str: O texto extraído do PDF, ou None se ocorrer um erro.
     """
     try:
-        texto_completo = ""
-        with open(caminho_pdf, 'rb') as arquivo_pdf: # 'rb' = read binary
-            leitor_pdf = PyPDF2.PdfReader(arquivo_pdf)
-            num_paginas = len(leitor_pdf.pages)
-            print(f"O PDF tem {num_paginas} página(s).")
-
-            for pagina_num in range(num_paginas):
-                pagina = leitor_pdf.pages[pagina_num]
-                texto_completo += pagina.extract_text()
-        return texto_completo
+        print(f"O PDF tem {contar_paginas(caminho_pdf)} página(s).")
     except FileNotFoundError:
         print(f"Erro: Arquivo não encontrado em '{caminho_pdf}'")
         return None
     except Exception as e:
         print(f"Ocorreu um erro ao ler o PDF: {e}")
         return None
+    return extrair_texto(caminho_pdf, 'pypdf2', intervalo)
 
 if __name__ == "__main__":
     # Pede ao usuário para fornecer o caminho do PDF
@@ -1,19 +1,19 @@
-import os
-import google.generativeai as genai
-
-# Configura a chave da API a partir da variável de ambiente
-genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
-
-# Escolhe o modelo Gemini (pode ser "gemini-pro" para texto, "gemini-pro-vision" para texto e imagem)
-model = genai.GenerativeModel('gemini-pro')
+from estuda_ai.modelo import criar_cliente
 
 # Texto para enviar ao Gemini
 texto_para_gemini = "O que é inteligência artificial?"
 
-# Envia o prompt ao Gemini
-print(f"Enviando ao Gemini: '{texto_para_gemini}'")
-response = model.generate_content(texto_para_gemini)
+def main():
+    # O modelo só é criado (e a chave GOOGLE_API_KEY lida) na primeira chamada; importar este arquivo não chama a API
+    model = criar_cliente(nome='gemini-pro')
+
+    # Envia o prompt ao Gemini
+    print(f"Enviando ao Gemini: '{texto_para_gemini}'")
+    response = model.generate_content(texto_para_gemini)
+
+    # Imprime a resposta do Gemini
+    print("\nResposta do Gemini:")
+    print(response.text)
 
-# Imprime a resposta do Gemini
-print("\nResposta do Gemini:")
-print(response.text)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
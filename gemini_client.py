@@ -0,0 +1,254 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+
+_erros_repetiveis = None
+
+
+def erros_repetiveis():
+    """
+    Erros temporários que justificam uma nova tentativa. O `google.api_core` só é importado no primeiro
+    erro (Python avalia a expressão do `except` só quando há uma exceção), para não pesar no import.
+    """
+    global _erros_repetiveis
+    if _erros_repetiveis is None:
+        try:
+            from google.api_core import exceptions as google_exceptions
+            _erros_repetiveis = (
+                google_exceptions.ResourceExhausted,  # 429
+                google_exceptions.TooManyRequests,
+                google_exceptions.InternalServerError,  # 500
+                google_exceptions.ServiceUnavailable,  # 503
+                google_exceptions.DeadlineExceeded,  # 504
+                TimeoutError,
+                ConnectionError,
+            )
+        except ImportError:
+            _erros_repetiveis = (TimeoutError, ConnectionError)
+    return _erros_repetiveis
+
+
+logger = logging.getLogger(__name__)
+
+
+def estimar_tokens(texto):
+    """Estimativa barata de tokens (cerca de 4 caracteres por token), usada só para o limite por minuto."""
+    return max(1, len(texto) // 4)
+
+
+class BaldeDeTokens:
+    """Token bucket que reabastece `capacidade_por_minuto` unidades a cada minuto, de forma contínua."""
+
+    def __init__(self, capacidade_por_minuto):
+        self.capacidade = float(capacidade_por_minuto)
+        self.disponivel = self.capacidade
+        self.atualizado_em = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _tentar_consumir(self, quantidade):
+        # Consome e retorna 0 se houver `quantidade` disponível; senão, retorna quanto tempo falta
+        with self._lock:
+            agora = time.monotonic()
+            self.disponivel = min(self.capacidade,
+                                  self.disponivel + (agora - self.atualizado_em) * self.capacidade / 60.0)
+            self.atualizado_em = agora
+            if self.disponivel >= quantidade:
+                self.disponivel -= quantidade
+                return 0.0
+            return (quantidade - self.disponivel) * 60.0 / self.capacidade
+
+    def consumir(self, quantidade=1):
+        """Bloqueia até haver `quantidade` disponível e a consome. Retorna o tempo esperado em segundos."""
+        quantidade = min(float(quantidade), self.capacidade)
+        esperado = 0.0
+        while True:
+            espera = self._tentar_consumir(quantidade)
+            if not espera:
+                return esperado
+            time.sleep(espera)
+            esperado += espera
+
+    async def consumir_async(self, quantidade=1):
+        """Como `consumir`, mas espera com `asyncio.sleep`, sem bloquear o event loop."""
+        quantidade = min(float(quantidade), self.capacidade)
+        esperado = 0.0
+        while True:
+            espera = self._tentar_consumir(quantidade)
+            if not espera:
+                return esperado
+            await asyncio.sleep(espera)
+            esperado += espera
+
+
+class ClienteGemini:
+    """
+    Envolve um `GenerativeModel` e é compartilhado por todas as funções que chamam o Gemini.
+
+    Aplica limite de requisições e de tokens por minuto, um teto de chamadas simultâneas
+    entre todas as threads, timeout por chamada e novas tentativas com backoff exponencial
+    com jitter nos erros temporários (429, 5xx, timeouts). Os limites valem por processo.
+
+    `generate_content_async` faz o mesmo para as views assíncronas, dividindo os limites e o teto de
+    chamadas simultâneas com as chamadas síncronas.
+    """
+
+    def __init__(self, modelo, requisicoes_por_minuto=1000, tokens_por_minuto=1000000, max_em_voo=16,
+                 max_tentativas=5, espera_inicial=1.0, espera_maxima=30.0, timeout=120):
+        self.modelo = modelo
+        self.max_tentativas = max_tentativas
+        self.espera_inicial = espera_inicial
+        self.espera_maxima = espera_maxima
+        self.timeout = timeout
+        self._requisicoes = BaldeDeTokens(requisicoes_por_minuto)
+        self._tokens = BaldeDeTokens(tokens_por_minuto)
+        self._em_voo = threading.BoundedSemaphore(max_em_voo)
+        self._lock = threading.Lock()
+        self._loop = None
+        self.contadores = {
+            'chamadas': 0,
+            'novas_tentativas': 0,
+            'falhas': 0,
+            'limitacoes': 0,
+            'segundos_limitado': 0.0,
+            'em_voo': 0,
+        }
+
+    @property
+    def model_name(self):
+        return getattr(self.modelo, 'model_name', type(self.modelo).__name__)
+
+    def _contar(self, campo, valor=1):
+        with self._lock:
+            self.contadores[campo] += valor
+
+    def _aguardar_cota(self, prompt):
+        esperado = self._requisicoes.consumir(1) + self._tokens.consumir(estimar_tokens(str(prompt)))
+        if esperado:
+            self._contar('limitacoes')
+            self._contar('segundos_limitado', esperado)
+
+    async def _aguardar_cota_async(self, prompt):
+        esperado = await self._requisicoes.consumir_async(1) + await self._tokens.consumir_async(estimar_tokens(str(prompt)))
+        if esperado:
+            self._contar('limitacoes')
+            self._contar('segundos_limitado', esperado)
+
+    async def _ocupar_vaga_async(self):
+        # O semáforo é o mesmo das chamadas síncronas. Sem vaga livre, a espera nele roda no executor padrão,
+        # e não no event loop; se a corrotina for cancelada antes, a vaga obtida depois é devolvida
+        if self._em_voo.acquire(blocking=False):
+            return
+        futuro = asyncio.get_running_loop().run_in_executor(None, self._em_voo.acquire)
+        try:
+            await asyncio.shield(futuro)
+        except asyncio.CancelledError:
+            futuro.add_done_callback(lambda _: self._em_voo.release())
+            raise
+
+    def _loop_do_modelo(self):
+        # O cliente assíncrono do SDK fica preso ao event loop em que foi criado, e cada view async do Flask
+        # roda em um loop novo: as chamadas ao SDK rodam todas em um loop próprio, em uma thread
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name='gemini-async', daemon=True).start()
+            return self._loop
+
+    def _espera_antes_da_tentativa(self, tentativa):
+        # Backoff exponencial com "full jitter", para as threads não tentarem todas ao mesmo tempo
+        return random.uniform(0, min(self.espera_maxima, self.espera_inicial * 2 ** tentativa))
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        """Mesma assinatura de `GenerativeModel.generate_content`."""
+        kwargs.setdefault('request_options', {'timeout': self.timeout})
+        if stream:
+            return self._gerar_em_streaming(prompt, kwargs)
+
+        for tentativa in range(self.max_tentativas):
+            self._aguardar_cota(prompt)
+            with self._em_voo:
+                self._contar('chamadas')
+                self._contar('em_voo')
+                try:
+                    response = self.modelo.generate_content(prompt, **kwargs)
+                    response.text # Força o erro aqui se a resposta veio bloqueada ou vazia
+                    return response
+                except erros_repetiveis() as e:
+                    erro = e
+                except Exception:
+                    self._contar('falhas')
+                    raise
+                finally:
+                    self._contar('em_voo', -1)
+            if tentativa + 1 < self.max_tentativas:
+                self._contar('novas_tentativas')
+                logger.warning("Erro temporário do Gemini (%s); nova tentativa %s/%s.", type(erro).__name__, tentativa + 2, self.max_tentativas)
+                time.sleep(self._espera_antes_da_tentativa(tentativa))
+        self._contar('falhas')
+        raise erro
+
+    def _gerar_em_streaming(self, prompt, kwargs):
+        # A vaga de chamada simultânea fica ocupada até o fim do stream.
+        # Só é possível tentar de novo enquanto nenhum pedaço foi entregue.
+        for tentativa in range(self.max_tentativas):
+            self._aguardar_cota(prompt)
+            entregou = False
+            with self._em_voo:
+                self._contar('chamadas')
+                self._contar('em_voo')
+                try:
+                    for chunk in self.modelo.generate_content(prompt, stream=True, **kwargs):
+                        entregou = True
+                        yield chunk
+                    return
+                except erros_repetiveis() as e:
+                    if entregou:
+                        self._contar('falhas')
+                        raise
+                    erro = e
+                except Exception:
+                    self._contar('falhas')
+                    raise
+                finally:
+                    self._contar('em_voo', -1)
+            if tentativa + 1 < self.max_tentativas:
+                self._contar('novas_tentativas')
+                logger.warning("Erro temporário do Gemini (%s); nova tentativa %s/%s.", type(erro).__name__, tentativa + 2, self.max_tentativas)
+                time.sleep(self._espera_antes_da_tentativa(tentativa))
+        self._contar('falhas')
+        raise erro
+
+    async def generate_content_async(self, prompt, **kwargs):
+        """Mesma assinatura de `GenerativeModel.generate_content_async`, sem streaming."""
+        kwargs.setdefault('request_options', {'timeout': self.timeout})
+        for tentativa in range(self.max_tentativas):
+            await self._aguardar_cota_async(prompt)
+            await self._ocupar_vaga_async()
+            self._contar('chamadas')
+            self._contar('em_voo')
+            try:
+                chamada = asyncio.run_coroutine_threadsafe(self.modelo.generate_content_async(prompt, **kwargs),
+                                                           self._loop_do_modelo())
+                response = await asyncio.wrap_future(chamada)
+                response.text # Força o erro aqui se a resposta veio bloqueada ou vazia
+                return response
+            except erros_repetiveis() as e:
+                erro = e
+            except Exception:
+                self._contar('falhas')
+                raise
+            finally:
+                self._contar('em_voo', -1)
+                self._em_voo.release()
+            if tentativa + 1 < self.max_tentativas:
+                self._contar('novas_tentativas')
+                logger.warning("Erro temporário do Gemini (%s); nova tentativa %s/%s.", type(erro).__name__, tentativa + 2, self.max_tentativas)
+                await asyncio.sleep(self._espera_antes_da_tentativa(tentativa))
+        self._contar('falhas')
+        raise erro
+
+    def estatisticas(self):
+        with self._lock:
+            return dict(self.contadores)
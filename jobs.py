@@ -0,0 +1,90 @@
+import logging
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from estuda_ai.etapas import ETAPA_ERRO, ETAPA_EXTRAIDO, ETAPA_IDENTIFICADO, ETAPA_PRONTO, ETAPA_SALVO, ETAPAS
+
+logger = logging.getLogger(__name__)
+
+
+class TrabalhoCancelado(Exception):
+    """A sessão dona do trabalho foi descartada enquanto ele rodava."""
+
+
+class GerenciadorDeTrabalhos:
+    """
+    Executa o processamento de uploads em um pool local de threads.
+
+    O estado de cada trabalho fica em `armazenamento[session_id]['trabalho']`, junto com os
+    demais dados da sessão, para que qualquer requisição consiga consultá-lo.
+    """
+
+    def __init__(self, armazenamento, max_trabalhadores=4):
+        self.armazenamento = armazenamento
+        self.executor = ThreadPoolExecutor(max_workers=max_trabalhadores, thread_name_prefix='estuda-ai-upload')
+
+    def enfileirar(self, session_id, funcao, *args):
+        """
+        Registra o trabalho na etapa 'saved' e agenda `funcao(trabalho, *args)`.
+        A função recebe o próprio `Trabalho` para informar as etapas seguintes.
+        Retorna o id do trabalho.
+        """
+        trabalho = Trabalho(self.armazenamento, session_id)
+        trabalho.atualizar(ETAPA_SALVO)
+        self.executor.submit(self._executar, trabalho, funcao, args)
+        return trabalho.id
+
+    def _executar(self, trabalho, funcao, args):
+        try:
+            funcao(trabalho, *args)
+        except TrabalhoCancelado:
+            pass
+        except Exception as e:
+            logger.error("Erro no trabalho %s: %s", trabalho.id, e)
+            try:
+                trabalho.falhar("Erro inesperado ao processar o PDF.")
+            except TrabalhoCancelado:
+                pass
+
+    def estado(self, session_id):
+        """Estado do trabalho da sessão com o tempo decorrido, ou None se não houver trabalho."""
+        session_data = self.armazenamento.get(session_id)
+        if not session_data or 'trabalho' not in session_data:
+            return None
+        estado = dict(session_data['trabalho'])
+        fim = estado['concluido_em'] or time.time()
+        estado['tempo_decorrido'] = round(fim - estado['iniciado_em'], 2)
+        return estado
+
+
+class Trabalho:
+    def __init__(self, armazenamento, session_id):
+        self.armazenamento = armazenamento
+        self.session_id = session_id
+        self.id = str(uuid.uuid4())
+        self.iniciado_em = time.time()
+
+    def atualizar(self, etapa, erro=None, **dados):
+        """Avança o trabalho para `etapa`; `dados` são gravados nos dados da sessão."""
+        concluido = etapa in (ETAPA_PRONTO, ETAPA_ERRO)
+
+        def alterar(session_data):
+            session_data.update(dados)
+            session_data['trabalho'] = {
+                'id': self.id,
+                'etapa': etapa,
+                'erro': erro,
+                'iniciado_em': self.iniciado_em,
+                'concluido_em': time.time() if concluido else None,
+            }
+
+        if etapa == ETAPA_SALVO: # O trabalho começa junto com a sessão
+            session_data = self.armazenamento.get(self.session_id, {})
+            alterar(session_data)
+            self.armazenamento[self.session_id] = session_data
+        elif self.armazenamento.atualizar(self.session_id, alterar) is None:
+            raise TrabalhoCancelado()
+
+    def falhar(self, mensagem):
+        self.atualizar(ETAPA_ERRO, erro=mensagem)
@@ -0,0 +1,194 @@
+import html
+import re
+import secrets
+
+try:
+    import bleach
+    import markdown
+except ImportError: # Opcionais: sem eles, o renderizador interno (mais simples) é usado
+    bleach = None
+    markdown = None
+
+MOTOR = 'markdown+bleach' if markdown is not None else 'interno' # Faz parte da chave do cache do HTML
+
+TAGS_PERMITIDAS = {'p', 'br', 'hr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'strong', 'em', 'code', 'pre', 'blockquote',
+                   'ul', 'ol', 'li', 'table', 'thead', 'tbody', 'tr', 'th', 'td', 'a', 'span', 'div', 'sub', 'sup'}
+ATRIBUTOS_PERMITIDOS = {'a': ['href', 'title'], 'code': ['class'], 'span': ['class'], 'div': ['class'],
+                        'th': ['align'], 'td': ['align']}
+PROTOCOLOS_PERMITIDOS = ['http', 'https', 'mailto']
+
+# Fórmulas em LaTeX ficam intactas (escapadas, com os delimitadores) em .math, para o Markdown não mexer
+# nos _ e * delas e para que o navegador possa compô-las com MathJax/KaTeX se quiser
+_MATEMATICA_EM_BLOCO = re.compile(r'\$\$(.+?)\$\$|\\\[(.+?)\\\]', re.DOTALL)
+_MATEMATICA_EM_LINHA = re.compile(r'(?<![\\$])\$(?!\s)([^$\n]+?)(?<!\s)\$(?!\d)|\\\((.+?)\\\)')
+
+_BLOCO_DE_CODIGO = re.compile(r'^```[ \t]*([\w+-]*)[ \t]*\n(.*?)^```[ \t]*$', re.DOTALL | re.MULTILINE)
+_TITULO = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+_LINHA_HORIZONTAL = re.compile(r'^\s*([-*_])(?:\s*\1){2,}\s*$')
+_ITEM_NAO_NUMERADO = re.compile(r'^\s*[-*+]\s+(.*)$')
+_ITEM_NUMERADO = re.compile(r'^\s*(\d{1,9})[.)]\s+(.*)$')
+_CITACAO = re.compile(r'^\s*>\s?(.*)$')
+_LINHA_DE_TABELA = re.compile(r'^\s*\|.*\|\s*$')
+_SEPARADOR_DE_TABELA = re.compile(r'^\s*\|?\s*:?-+:?\s*(?:\|\s*:?-+:?\s*)*\|?\s*$')
+
+_CODIGO_EM_LINHA = re.compile(r'`([^`\n]+)`')
+_LINK = re.compile(r'\[([^\]\n]+)\]\(\s*([^)\s]+)\s*\)')
+_NEGRITO = re.compile(r'\*\*(?=\S)(.+?)(?<=\S)\*\*|__(?=\S)(.+?)(?<=\S)__')
+_ITALICO = re.compile(r'(?<![\w*])\*(?=\S)(.+?)(?<=\S)\*(?!\*)|(?<!\w)_(?=\S)(.+?)(?<=\S)_(?!\w)')
+
+
+class _Marcadores:
+    """
+    Trechos já convertidos em HTML, trocados por marcadores enquanto o resto do texto é processado.
+    Os marcadores levam um código aleatório, para que o texto do modelo não possa imitá-los.
+    """
+
+    def __init__(self):
+        self.trechos = []
+        self.prefixo = f"EstudaAi{secrets.token_hex(4)}M"
+        self.padrao = re.compile(self.prefixo + r'(\d+)Fim')
+
+    def guardar(self, trecho_html):
+        self.trechos.append(trecho_html)
+        return f"{self.prefixo}{len(self.trechos) - 1}Fim"
+
+    def eh_marcador(self, linha):
+        return self.padrao.fullmatch(linha.strip()) is not None
+
+    def restaurar(self, texto):
+        # Um trecho guardado pode conter outros marcadores (uma fórmula dentro de um item de lista, por exemplo)
+        while self.padrao.search(texto):
+            texto = self.padrao.sub(lambda m: self.trechos[int(m.group(1))], texto)
+        return texto
+
+
+def _proteger_codigo(texto, marcadores):
+    def bloco(m):
+        linguagem = f' class="language-{m.group(1)}"' if m.group(1) else ""
+        return "\n\n" + marcadores.guardar(f"<pre><code{linguagem}>{html.escape(m.group(2))}</code></pre>") + "\n\n"
+
+    return _BLOCO_DE_CODIGO.sub(bloco, texto)
+
+
+def _proteger_matematica(texto, marcadores):
+    def em_bloco(m):
+        return "\n\n" + marcadores.guardar(f'<div class="math">{html.escape(m.group(0))}</div>') + "\n\n"
+
+    def em_linha(m):
+        return marcadores.guardar(f'<span class="math">{html.escape(m.group(0))}</span>')
+
+    return _MATEMATICA_EM_LINHA.sub(em_linha, _MATEMATICA_EM_BLOCO.sub(em_bloco, texto))
+
+
+def _link_seguro(url):
+    return url.split(':', 1)[0].lower() in PROTOCOLOS_PERMITIDOS if ':' in url else not url.startswith('//')
+
+
+def _renderizar_em_linha(texto, marcadores):
+    texto = _CODIGO_EM_LINHA.sub(lambda m: marcadores.guardar(f"<code>{html.escape(m.group(1))}</code>"), texto)
+    texto = html.escape(texto, quote=False)
+
+    def link(m):
+        rotulo, url = m.group(1), html.unescape(m.group(2))
+        if not _link_seguro(url):
+            return rotulo
+        return f'<a href="{html.escape(url)}">{rotulo}</a>'
+
+    texto = _LINK.sub(link, texto)
+    texto = _NEGRITO.sub(lambda m: f"<strong>{m.group(1) or m.group(2)}</strong>", texto)
+    return _ITALICO.sub(lambda m: f"<em>{m.group(1) or m.group(2)}</em>", texto)
+
+
+def _celulas(linha):
+    return [celula.strip() for celula in linha.strip().strip('|').split('|')]
+
+
+def _renderizar_blocos(texto, marcadores):
+    """Renderizador interno: títulos, parágrafos, listas, citações, tabelas e linhas horizontais."""
+    linhas = texto.split('\n')
+    blocos = []
+    i = 0
+    while i < len(linhas):
+        linha = linhas[i]
+        if not linha.strip():
+            i += 1
+        elif marcadores.eh_marcador(linha):
+            blocos.append(linha.strip())
+            i += 1
+        elif _TITULO.match(linha):
+            nivel, conteudo = _TITULO.match(linha).groups()
+            blocos.append(f"<h{len(nivel)}>{_renderizar_em_linha(conteudo, marcadores)}</h{len(nivel)}>")
+            i += 1
+        elif _LINHA_HORIZONTAL.match(linha):
+            blocos.append("<hr>")
+            i += 1
+        elif (_LINHA_DE_TABELA.match(linha) and i + 1 < len(linhas) and _SEPARADOR_DE_TABELA.match(linhas[i + 1])
+              and '|' in linhas[i + 1]):
+            cabecalho = "".join(f"<th>{_renderizar_em_linha(celula, marcadores)}</th>" for celula in _celulas(linha))
+            corpo = []
+            i += 2
+            while i < len(linhas) and _LINHA_DE_TABELA.match(linhas[i]):
+                corpo.append("<tr>" + "".join(f"<td>{_renderizar_em_linha(celula, marcadores)}</td>"
+                                              for celula in _celulas(linhas[i])) + "</tr>")
+                i += 1
+            blocos.append(f"<table><thead><tr>{cabecalho}</tr></thead><tbody>{''.join(corpo)}</tbody></table>")
+        elif _CITACAO.match(linha):
+            citadas = []
+            while i < len(linhas) and _CITACAO.match(linhas[i]):
+                citadas.append(_CITACAO.match(linhas[i]).group(1))
+                i += 1
+            blocos.append(f"<blockquote>{_renderizar_blocos(chr(10).join(citadas), marcadores)}</blockquote>")
+        elif _ITEM_NAO_NUMERADO.match(linha) or _ITEM_NUMERADO.match(linha):
+            padrao, tag = (_ITEM_NUMERADO, 'ol') if _ITEM_NUMERADO.match(linha) else (_ITEM_NAO_NUMERADO, 'ul')
+            inicio = ""
+            if tag == 'ol' and padrao.match(linha).group(1) != '1':
+                inicio = f' start="{int(padrao.match(linha).group(1))}"'
+            itens = []
+            while i < len(linhas) and linhas[i].strip():
+                item = padrao.match(linhas[i])
+                if item:
+                    itens.append(item.groups()[-1])
+                elif itens and linhas[i][:1].isspace():
+                    itens[-1] += "\n" + linhas[i].strip() # Continuação do item anterior
+                else:
+                    break
+                i += 1
+            conteudo = "".join(f"<li>{_renderizar_em_linha(item, marcadores)}</li>" for item in itens)
+            blocos.append(f"<{tag}{inicio}>{conteudo}</{tag}>")
+        else:
+            paragrafo = []
+            while i < len(linhas) and linhas[i].strip() and not (
+                    _TITULO.match(linhas[i]) or _LINHA_HORIZONTAL.match(linhas[i]) or _CITACAO.match(linhas[i])
+                    or _ITEM_NAO_NUMERADO.match(linhas[i]) or _ITEM_NUMERADO.match(linhas[i])
+                    or marcadores.eh_marcador(linhas[i])):
+                paragrafo.append(linhas[i].strip())
+                i += 1
+            if not paragrafo: # Linha que só parecia começar outro bloco
+                paragrafo.append(linhas[i].strip())
+                i += 1
+            blocos.append(f"<p>{_renderizar_em_linha(chr(10).join(paragrafo), marcadores)}</p>")
+    return "\n".join(blocos)
+
+
+def renderizar_markdown(texto):
+    """
+    Converte o Markdown das respostas do modelo em HTML seguro para inserir na página.
+
+    Usa os pacotes `markdown` e `bleach` se estiverem instalados (o HTML gerado é filtrado por uma lista de
+    tags e atributos permitidos); sem eles, um renderizador interno que escapa todo o texto e só gera as tags
+    que ele mesmo produz. Blocos de código e fórmulas LaTeX são preservados como estão.
+    """
+    texto = (texto or "").replace('\r\n', '\n').replace('\x00', '')
+    marcadores = _Marcadores()
+    texto = _proteger_codigo(texto, marcadores)
+    texto = _proteger_matematica(texto, marcadores)
+
+    if markdown is not None:
+        html_gerado = markdown.markdown(texto, extensions=['tables', 'sane_lists'])
+        html_gerado = bleach.clean(html_gerado, tags=TAGS_PERMITIDAS, attributes=ATRIBUTOS_PERMITIDOS,
+                                   protocols=PROTOCOLOS_PERMITIDOS, strip=True)
+        # Os marcadores em um parágrafo só (blocos) viram o próprio bloco
+        html_gerado = re.sub(rf'<p>({marcadores.prefixo}\d+Fim)</p>', r'\1', html_gerado)
+    else:
+        html_gerado = _renderizar_blocos(texto, marcadores)
+    return marcadores.restaurar(html_gerado)
@@ -0,0 +1,165 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+
+NOME_MODELO_PADRAO = 'models/gemini-2.0-flash'
+
+
+def _erro_simulado():
+    # O mesmo erro 503 do Gemini, para passar pelas novas tentativas do cliente; importado só quando usado
+    try:
+        from google.api_core.exceptions import ServiceUnavailable
+        return ServiceUnavailable("Erro simulado do backend mock.")
+    except ImportError:
+        return ConnectionError("Erro simulado do backend mock.")
+
+
+def criar_modelo(backend='gemini', nome=NOME_MODELO_PADRAO):
+    """
+    Cria o modelo usado pela aplicação.
+
+    'gemini' usa a API real (precisa de GOOGLE_API_KEY); 'mock' usa o `ModeloSimulado`,
+    configurado pelas variáveis MOCK_*, sem rede nem cota.
+    """
+    if backend == 'gemini':
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        return genai.GenerativeModel(nome)
+    if backend == 'mock':
+        return ModeloSimulado(latencia_media=float(os.getenv('MOCK_LATENCIA_MEDIA', 1.0)),
+                              latencia_desvio=float(os.getenv('MOCK_LATENCIA_DESVIO', 0.3)),
+                              distribuicao=os.getenv('MOCK_DISTRIBUICAO', 'lognormal'),
+                              taxa_de_erro=float(os.getenv('MOCK_TAXA_ERRO', 0.0)),
+                              semente=int(os.getenv('MOCK_SEMENTE', 42)))
+    raise ValueError(f"Backend de modelo desconhecido: {backend}")
+
+
+def nome_do_modelo_criado(backend='gemini', nome=NOME_MODELO_PADRAO):
+    """O `model_name` que `criar_modelo(backend, nome)` terá, sem criar o modelo."""
+    if backend == 'gemini':
+        return nome if '/' in nome else f"models/{nome}"
+    if backend == 'mock':
+        return ModeloSimulado.model_name
+    raise ValueError(f"Backend de modelo desconhecido: {backend}")
+
+
+class RespostaSimulada:
+    def __init__(self, text):
+        self.text = text
+
+
+class ModeloSimulado:
+    """
+    Substituto local e determinístico do `GenerativeModel`, para testes de carga sem rede.
+
+    Reconhece os prompts da aplicação (identificação, resolução, resolução em lote e similares)
+    e responde no mesmo formato que o Gemini, depois de uma latência sorteada.
+    `distribuicao` pode ser 'lognormal', 'normal', 'uniforme' ou 'fixa'; `taxa_de_erro` é a
+    fração de chamadas que falham com um erro temporário (503).
+    `respostas` permite fixar o texto devolvido por tipo de prompt
+    ('identificacao', 'resolucao' ou 'similares').
+    """
+
+    model_name = 'mock/gemini-simulado'
+
+    def __init__(self, latencia_media=1.0, latencia_desvio=0.3, distribuicao='lognormal', taxa_de_erro=0.0,
+                 semente=42, respostas=None, pedacos_streaming=20):
+        self.latencia_media = latencia_media
+        self.latencia_desvio = latencia_desvio
+        self.distribuicao = distribuicao
+        self.taxa_de_erro = taxa_de_erro
+        self.respostas = respostas or {}
+        self.pedacos_streaming = pedacos_streaming
+        self._aleatorio = random.Random(semente)
+        self._lock = threading.Lock()
+        self.chamadas = 0
+
+    def _sortear(self):
+        with self._lock:
+            self.chamadas += 1
+            falhar = self._aleatorio.random() < self.taxa_de_erro
+            media, desvio = self.latencia_media, self.latencia_desvio
+            if self.distribuicao == 'fixa' or media <= 0:
+                latencia = media
+            elif self.distribuicao == 'uniforme':
+                latencia = self._aleatorio.uniform(max(0.0, media - desvio), media + desvio)
+            elif self.distribuicao == 'normal':
+                latencia = self._aleatorio.gauss(media, desvio)
+            else:
+                # Lognormal com a média e o desvio pedidos: cauda longa, como latências reais
+                sigma2 = math.log(1 + (desvio / media) ** 2)
+                latencia = self._aleatorio.lognormvariate(math.log(media) - sigma2 / 2, sigma2 ** 0.5)
+        return max(0.0, latencia), falhar
+
+    def generate_content(self, prompt, stream=False, generation_config=None, request_options=None, **kwargs):
+        latencia, falhar = self._sortear()
+        texto = self._responder(str(prompt), generation_config)
+        if not stream:
+            time.sleep(latencia)
+            if falhar:
+                raise _erro_simulado()
+            return RespostaSimulada(texto)
+        return self._em_streaming(texto, latencia, falhar)
+
+    async def generate_content_async(self, prompt, generation_config=None, request_options=None, **kwargs):
+        latencia, falhar = self._sortear()
+        texto = self._responder(str(prompt), generation_config)
+        await asyncio.sleep(latencia)
+        if falhar:
+            raise _erro_simulado()
+        return RespostaSimulada(texto)
+
+    def _em_streaming(self, texto, latencia, falhar):
+        # Primeiro pedaço após ~20% da latência; o restante é distribuído entre os demais pedaços
+        time.sleep(latencia * 0.2)
+        if falhar:
+            raise _erro_simulado()
+        tamanho = max(1, len(texto) // self.pedacos_streaming)
+        pedacos = [texto[i:i + tamanho] for i in range(0, len(texto), tamanho)]
+        for pedaco in pedacos:
+            yield RespostaSimulada(pedaco)
+            time.sleep(latencia * 0.8 / len(pedacos))
+
+    def _responder(self, prompt, generation_config):
+        if 'identifique e extraia' in prompt:
+            return self.respostas.get('identificacao') or self._identificar(prompt, generation_config)
+        if 'Exercício de id' in prompt and generation_config:
+            ids = re.findall(r'Exercício de id (\d+):', prompt)
+            return json.dumps([{'id': int(i), 'resolucao': self._resolucao(f"lote {i}")} for i in ids], ensure_ascii=False)
+        if 'novos exercícios' in prompt:
+            if self.respostas.get('similares'):
+                return self.respostas['similares']
+            encontrado = re.search(r'crie (\d+) novos', prompt)
+            quantidade = int(encontrado.group(1)) if encontrado else 2
+            if generation_config:
+                return json.dumps([{'texto': f"Exercício similar {i}: calcule *x* em {i + 1}x + {i * 3} = {i * 7}.",
+                                    'resolucao': self._resolucao(f"similar {i}")}
+                                   for i in range(1, quantidade + 1)], ensure_ascii=False)
+            return "\n".join(f"{i}. Exercício similar {i}: calcule *x* em {i + 1}x + {i * 3} = {i * 7}." for i in range(1, quantidade + 1))
+        if 'Resolva' in prompt:
+            return self.respostas.get('resolucao') or self._resolucao(prompt)
+        return "Resposta simulada."
+
+    def _identificar(self, prompt, generation_config):
+        # Devolve as linhas numeradas do texto enviado; sem nenhuma, uma lista fixa
+        texto = prompt.split('TEXTO:', 1)[-1]
+        linhas = [m.group(1).strip() for m in re.finditer(r'^\s*\d+\s*[.)]\s+(.+)$', texto, re.M)]
+        if not linhas:
+            linhas = [f"Resolva a equação {i}x + 2 = {i * 4}." for i in range(1, 6)]
+        if generation_config:
+            return json.dumps([{'numero': str(i), 'texto': linha} for i, linha in enumerate(linhas, 1)], ensure_ascii=False)
+        return "\n".join(f"{i}. {linha}" for i, linha in enumerate(linhas, 1))
+
+    def _resolucao(self, prompt):
+        assinatura = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8]
+        return (f"## Resolução ({assinatura})\n\n"
+                "1. **Isolar a incógnita**: subtraímos o termo independente dos dois lados.\n"
+                "2. **Dividir** pelo coeficiente de *x*.\n\n"
+                "```\n2x + 5 = 15\n2x = 10\nx = 5\n```\n\n"
+                "**Resposta:** x = 5.")
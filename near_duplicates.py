@@ -0,0 +1,225 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+
+TAMANHO_SHINGLE = 5 # Caracteres de cada shingle, sem espaços
+NUM_POSICOES = 64 # Posições da assinatura MinHash (potência de 2)
+NUM_BANDAS = 8 # Bandas do LSH; com 8 posições por banda, pares acima de ~0,8 de similaridade viram candidatos
+MIN_CARACTERES = 40 # Textos mais curtos não são indexados: poucas letras de diferença já mudam o exercício
+MAX_CANDIDATOS = 50 # Limite de exercícios comparados por busca
+
+_NUMERACAO = re.compile(r'^\s*(?:(?:quest[aã]o|exerc[ií]cio)\s*)?(?:\d{1,3}|[a-z])\s*[.)-]\s+', re.IGNORECASE)
+_ESPACOS = re.compile(r'\s+')
+# Números, operadores e letras isoladas (variáveis): precisam ser iguais para o exercício ser o mesmo
+_ELEMENTOS_DA_GUARDA = re.compile(r'\d+(?:[.,]\d+)*|[=+\-*/^<>×÷√%]|(?<![^\W\d_])[^\W\d_](?![^\W\d_])')
+_BITS_DO_VALOR = 24 # Cada posição guarda 24 bits do menor hash e, acima deles, a distância da densificação
+
+
+def _sem_acentos(texto):
+    decomposto = unicodedata.normalize('NFKD', texto)
+    return "".join(caractere for caractere in decomposto if not unicodedata.combining(caractere))
+
+
+def preparar_texto(texto):
+    """
+    Retorna (texto sem espaços, guarda) para comparar exercícios: sem a numeração inicial, em minúsculas,
+    sem acentos e sem espaços. A guarda são os números, operadores e variáveis, na ordem.
+    """
+    texto = _sem_acentos(_NUMERACAO.sub('', texto or "", count=1)).lower()
+    guarda = " ".join(_ELEMENTOS_DA_GUARDA.findall(texto))
+    return _ESPACOS.sub('', texto), guarda
+
+
+def calcular_assinatura(texto_compacto):
+    """
+    Assinatura MinHash dos shingles do texto por one permutation hashing: cada shingle é hasheado uma vez
+    e vai para uma das `NUM_POSICOES` posições, que guarda o menor valor. Posições vazias (textos curtos)
+    são preenchidas pela próxima posição ocupada, com um deslocamento pela distância (densificação por rotação).
+    """
+    minimos = [None] * NUM_POSICOES
+    for inicio in range(max(1, len(texto_compacto) - TAMANHO_SHINGLE + 1)):
+        shingle = texto_compacto[inicio:inicio + TAMANHO_SHINGLE]
+        valor = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'little')
+        posicao, valor = valor & (NUM_POSICOES - 1), valor >> (64 - _BITS_DO_VALOR)
+        if minimos[posicao] is None or valor < minimos[posicao]:
+            minimos[posicao] = valor
+
+    assinatura = array('I', [0] * NUM_POSICOES)
+    for posicao in range(NUM_POSICOES):
+        distancia = 0
+        while minimos[(posicao + distancia) % NUM_POSICOES] is None:
+            distancia += 1
+        assinatura[posicao] = minimos[(posicao + distancia) % NUM_POSICOES] | (distancia << _BITS_DO_VALOR)
+    return assinatura
+
+
+def similaridade_estimada(assinatura_a, assinatura_b):
+    """Estimativa da similaridade de Jaccard entre os conjuntos de shingles."""
+    return sum(a == b for a, b in zip(assinatura_a, assinatura_b)) / NUM_POSICOES
+
+
+def _chaves_das_bandas(assinatura, escopo):
+    linhas = NUM_POSICOES // NUM_BANDAS
+    chaves = []
+    for banda in range(NUM_BANDAS):
+        trecho = assinatura[banda * linhas:(banda + 1) * linhas].tobytes()
+        resumo = hashlib.blake2b(f"{escopo}\x1f{banda}".encode('utf-8') + trecho, digest_size=8).digest()
+        chaves.append(int.from_bytes(resumo, 'little', signed=True))
+    return chaves
+
+
+class IndiceDeSimilares:
+    """
+    Índice persistente (SQLite) de exercícios já resolvidos para encontrar versões quase idênticas do mesmo
+    exercício, com diferenças de espaços, numeração, acentos ou ruído de OCR.
+
+    Cada exercício guarda a assinatura MinHash e a chave da sua resolução no cache de respostas. As bandas
+    do LSH ficam em uma tabela indexada, então uma busca faz poucas consultas por índice, independentemente
+    do número de exercícios guardados. Os candidatos são confirmados pela similaridade estimada (>= `limiar`)
+    e pela guarda: números, operadores e variáveis iguais, para que "2x + 5 = 15" não reaproveite a resolução
+    de "3x + 5 = 15". `escopo` separa resoluções de modelos ou versões de prompt diferentes.
+
+    A cada `INTERVALO_LIMPEZA` exercícios indexados, saem os mais antigos que `ttl_segundos`, os mais antigos
+    acima de `max_itens` e, com `tabela_de_resolucoes` (a tabela do cache de respostas, no mesmo arquivo), os
+    que apontam para uma resolução que já saiu do cache.
+    """
+
+    INTERVALO_LIMPEZA = 100 # Exercícios indexados entre duas limpezas
+
+    def __init__(self, caminho, tabela='similares', limiar=0.9, tabela_de_resolucoes=None, max_itens=50000,
+                 ttl_segundos=30 * 24 * 3600):
+        for nome in (tabela, tabela_de_resolucoes or tabela):
+            if not nome.isidentifier():
+                raise ValueError(f"Nome de tabela inválido: {nome}")
+        self.caminho = caminho
+        self.tabela = tabela
+        self.limiar = limiar
+        self.tabela_de_resolucoes = tabela_de_resolucoes
+        self.max_itens = max_itens
+        self.ttl_segundos = ttl_segundos
+        self.consultas = 0
+        self.acertos = 0
+        self.remocoes = 0
+        self._adicionados = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        conexao = self._conexao()
+        with conexao:
+            conexao.execute(f"""
+                CREATE TABLE IF NOT EXISTS {tabela} (
+                    id INTEGER PRIMARY KEY,
+                    hash_texto TEXT NOT NULL UNIQUE,
+                    guarda TEXT NOT NULL,
+                    assinatura BLOB NOT NULL,
+                    chave_resolucao TEXT NOT NULL,
+                    criado_em REAL NOT NULL
+                )""")
+            conexao.execute(f"CREATE TABLE IF NOT EXISTS {tabela}_bandas (chave INTEGER NOT NULL, id INTEGER NOT NULL)")
+            conexao.execute(f"CREATE INDEX IF NOT EXISTS idx_{tabela}_bandas_chave ON {tabela}_bandas (chave)")
+
+    def _conexao(self):
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=30)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexao = conexao
+        return conexao
+
+    def adicionar(self, texto, escopo, chave_resolucao):
+        """Indexa o exercício `texto`, cuja resolução está no cache sob `chave_resolucao`. Retorna se foi indexado."""
+        compacto, guarda = preparar_texto(texto)
+        if len(compacto) < MIN_CARACTERES:
+            return False
+        assinatura = calcular_assinatura(compacto)
+        hash_texto = hashlib.sha256(f"{escopo}\x1f{compacto}".encode('utf-8')).hexdigest()
+        conexao = self._conexao()
+        with conexao:
+            cursor = conexao.execute(f"""
+                INSERT OR IGNORE INTO {self.tabela} (hash_texto, guarda, assinatura, chave_resolucao, criado_em)
+                VALUES (?, ?, ?, ?, ?)""", (hash_texto, guarda, assinatura.tobytes(), chave_resolucao, time.time()))
+            if not cursor.rowcount:
+                return False
+            conexao.executemany(f"INSERT INTO {self.tabela}_bandas (chave, id) VALUES (?, ?)",
+                                [(chave, cursor.lastrowid) for chave in _chaves_das_bandas(assinatura, escopo)])
+        with self._lock:
+            self._adicionados += 1
+            limpar = self._adicionados % self.INTERVALO_LIMPEZA == 1
+        if limpar:
+            self.limpar()
+        return True
+
+    def limpar(self):
+        """Remove os exercícios expirados, os excedentes e os sem resolução no cache. Retorna quantos saíram."""
+        conexao = self._conexao()
+        removidos = 0
+        with conexao:
+            if self.ttl_segundos:
+                removidos += conexao.execute(f"DELETE FROM {self.tabela} WHERE criado_em < ?",
+                                             (time.time() - self.ttl_segundos,)).rowcount
+            if self.tabela_de_resolucoes and self._tabela_existe(conexao, self.tabela_de_resolucoes):
+                removidos += conexao.execute(f"""
+                    DELETE FROM {self.tabela} WHERE NOT EXISTS (
+                        SELECT 1 FROM {self.tabela_de_resolucoes} WHERE chave = {self.tabela}.chave_resolucao
+                    )""").rowcount
+            if self.max_itens:
+                total = conexao.execute(f"SELECT COUNT(*) FROM {self.tabela}").fetchone()[0]
+                if total > self.max_itens:
+                    removidos += conexao.execute(f"""
+                        DELETE FROM {self.tabela} WHERE id IN (
+                            SELECT id FROM {self.tabela} ORDER BY id ASC LIMIT ?
+                        )""", (total - self.max_itens,)).rowcount
+            if removidos:
+                conexao.execute(f"DELETE FROM {self.tabela}_bandas WHERE id NOT IN (SELECT id FROM {self.tabela})")
+        if removidos:
+            with self._lock:
+                self.remocoes += removidos
+        return removidos
+
+    @staticmethod
+    def _tabela_existe(conexao, tabela):
+        return conexao.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (tabela,)).fetchone() is not None
+
+    def buscar(self, texto, escopo):
+        """Lista de (chave_resolucao, similaridade) dos exercícios quase idênticos a `texto`, do mais parecido ao menos."""
+        with self._lock:
+            self.consultas += 1
+        compacto, guarda = preparar_texto(texto)
+        if len(compacto) < MIN_CARACTERES:
+            return []
+        assinatura = calcular_assinatura(compacto)
+        chaves = _chaves_das_bandas(assinatura, escopo)
+        conexao = self._conexao()
+        linhas = conexao.execute(f"""
+            SELECT guarda, assinatura, chave_resolucao FROM {self.tabela} WHERE id IN (
+                SELECT id FROM {self.tabela}_bandas WHERE chave IN ({','.join('?' * len(chaves))}) LIMIT ?
+            )""", (*chaves, MAX_CANDIDATOS)).fetchall()
+
+        encontrados = []
+        for guarda_candidato, assinatura_candidato, chave_resolucao in linhas:
+            if guarda_candidato != guarda:
+                continue
+            similaridade = similaridade_estimada(assinatura, array('I', assinatura_candidato))
+            if similaridade >= self.limiar:
+                encontrados.append((chave_resolucao, similaridade))
+        encontrados.sort(key=lambda encontrado: encontrado[1], reverse=True)
+        if encontrados:
+            with self._lock:
+                self.acertos += 1
+        return encontrados
+
+    def tamanho(self):
+        return self._conexao().execute(f"SELECT COUNT(*) FROM {self.tabela}").fetchone()[0]
+
+    def estatisticas(self):
+        with self._lock:
+            return {'consultas': self.consultas, 'acertos': self.acertos, 'remocoes': self.remocoes, 'itens': self.tamanho()}
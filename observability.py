@@ -0,0 +1,168 @@
+import bisect
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+BUCKETS_CARACTERES = (100, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000, 500000, 1000000)
+
+
+class FormatadorJSON(logging.Formatter):
+    """Uma linha JSON por registro de log."""
+
+    def format(self, registro):
+        dados = {
+            'ts': round(registro.created, 3),
+            'nivel': registro.levelname,
+            'logger': registro.name,
+            'mensagem': registro.getMessage(),
+        }
+        if registro.exc_info:
+            dados['excecao'] = self.formatException(registro.exc_info)
+        return json.dumps(dados, ensure_ascii=False)
+
+
+def configurar_logging(nivel='INFO', formato='texto'):
+    """Configura o logger raiz. `formato` é 'texto' ou 'json'."""
+    manipulador = logging.StreamHandler()
+    if formato == 'json':
+        manipulador.setFormatter(FormatadorJSON())
+    else:
+        manipulador.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+    raiz = logging.getLogger()
+    raiz.handlers[:] = [manipulador]
+    raiz.setLevel(nivel.upper() if isinstance(nivel, str) else nivel)
+
+
+def _formatar_rotulos(nomes, valores, extras=()):
+    pares = list(zip(nomes, valores)) + list(extras)
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{nome}="{_escapar_rotulo(valor)}"' for nome, valor in pares) + "}"
+
+
+def _escapar_rotulo(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Contador:
+    def __init__(self, nome, descricao, rotulos=()):
+        self.nome, self.descricao, self.rotulos = nome, descricao, tuple(rotulos)
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def inc(self, valor=1, **rotulos):
+        chave = tuple(rotulos.get(r, "") for r in self.rotulos)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def exportar(self):
+        linhas = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} counter"]
+        with self._lock:
+            for chave, valor in sorted(self._valores.items()):
+                linhas.append(f"{self.nome}{_formatar_rotulos(self.rotulos, chave)} {valor}")
+        return linhas
+
+
+class Histograma:
+    def __init__(self, nome, descricao, rotulos=(), buckets=BUCKETS_SEGUNDOS):
+        self.nome, self.descricao, self.rotulos = nome, descricao, tuple(rotulos)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {} # rótulos -> [contagem por bucket..., soma, total]
+        self._lock = threading.Lock()
+
+    def observar(self, valor, **rotulos):
+        chave = tuple(rotulos.get(r, "") for r in self.rotulos)
+        posicao = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = [0] * (len(self.buckets) + 2)
+            if posicao < len(self.buckets):
+                serie[posicao] += 1
+            serie[-2] += valor
+            serie[-1] += 1
+
+    @contextmanager
+    def cronometrar(self, **rotulos):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **rotulos)
+
+    def exportar(self):
+        linhas = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} histogram"]
+        with self._lock:
+            series = {chave: list(serie) for chave, serie in self._series.items()}
+        for chave, serie in sorted(series.items()):
+            acumulado = 0
+            for limite, contagem in zip(self.buckets, serie):
+                acumulado += contagem
+                linhas.append(f"{self.nome}_bucket{_formatar_rotulos(self.rotulos, chave, [('le', limite)])} {acumulado}")
+            linhas.append(f"{self.nome}_bucket{_formatar_rotulos(self.rotulos, chave, [('le', '+Inf')])} {serie[-1]}")
+            linhas.append(f"{self.nome}_sum{_formatar_rotulos(self.rotulos, chave)} {serie[-2]}")
+            linhas.append(f"{self.nome}_count{_formatar_rotulos(self.rotulos, chave)} {serie[-1]}")
+        return linhas
+
+
+class Medidor:
+    """Gauge cujo valor é lido na hora da coleta; `funcao` retorna {(valores dos rótulos): valor}."""
+
+    def __init__(self, nome, descricao, rotulos, funcao):
+        self.nome, self.descricao, self.rotulos, self.funcao = nome, descricao, tuple(rotulos), funcao
+
+    def exportar(self):
+        linhas = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} gauge"]
+        for chave, valor in sorted(self.funcao().items()):
+            linhas.append(f"{self.nome}{_formatar_rotulos(self.rotulos, chave)} {valor}")
+        return linhas
+
+
+class RegistroDeMetricas:
+    def __init__(self):
+        self._metricas = []
+
+    def registrar(self, metrica):
+        self._metricas.append(metrica)
+        return metrica
+
+    def contador(self, nome, descricao, rotulos=()):
+        return self.registrar(Contador(nome, descricao, rotulos))
+
+    def histograma(self, nome, descricao, rotulos=(), buckets=BUCKETS_SEGUNDOS):
+        return self.registrar(Histograma(nome, descricao, rotulos, buckets))
+
+    def medidor(self, nome, descricao, rotulos, funcao):
+        return self.registrar(Medidor(nome, descricao, rotulos, funcao))
+
+    def exportar(self):
+        """Todas as métricas no formato de texto do Prometheus."""
+        linhas = []
+        for metrica in self._metricas:
+            try:
+                linhas.extend(metrica.exportar())
+            except Exception as e:
+                logging.getLogger(__name__).warning("Falha ao coletar a métrica %s: %s", metrica.nome, e)
+        return "\n".join(linhas) + "\n"
+
+
+registro = RegistroDeMetricas()
+
+# Duração das etapas do pipeline. `detalhe` traz o extrator, na extração, ou o template, na renderização.
+DURACAO_ETAPA = registro.histograma('estuda_ai_etapa_duracao_segundos',
+                                    "Duração de cada etapa do processamento.", ('etapa', 'detalhe'))
+TAMANHO_PROMPT = registro.histograma('estuda_ai_prompt_caracteres',
+                                     "Tamanho dos prompts enviados ao modelo, em caracteres.", ('tipo',), BUCKETS_CARACTERES)
+TAMANHO_RESPOSTA = registro.histograma('estuda_ai_resposta_caracteres',
+                                       "Tamanho das respostas do modelo, em caracteres.", ('tipo',), BUCKETS_CARACTERES)
+# Modo de extração automático: estratégia escolhida pela amostra e páginas obtidas por cada extrator
+ESTRATEGIAS_DE_EXTRACAO = registro.contador('estuda_ai_extracao_estrategia_total',
+                                            "Estratégias escolhidas pela extração automática.", ('estrategia',))
+PAGINAS_EXTRAIDAS = registro.contador('estuda_ai_paginas_extraidas_total',
+                                      "Páginas extraídas no modo automático, por extrator.", ('extrator',))
+# Tokens estimados do texto enviado à identificação, antes e depois da normalização
+TOKENS_NORMALIZACAO = registro.contador('estuda_ai_normalizacao_tokens_total',
+                                        "Tokens estimados do texto extraído, antes e depois da normalização.", ('momento',))
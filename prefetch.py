@@ -0,0 +1,117 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class PreResolvedor:
+    """
+    Resolve em segundo plano os próximos exercícios ainda não respondidos de cada sessão, para que a
+    próxima seleção encontre as resoluções prontas no cache.
+
+    `resolver(texto)` faz a resolução e a salva no cache; `ocupado()` indica que há chamadas demais em
+    andamento, e então a pré-resolução espera, cedendo a vez às requisições dos usuários. Cada sessão
+    tem um orçamento de chamadas, e cada exercício é pré-resolvido no máximo uma vez; as tarefas de uma sessão cancelada ou descartada do `armazenamento`
+    são abandonadas antes de chamar o modelo.
+    """
+
+    INTERVALO_ESPERA = 0.25 # Segundos entre duas verificações de `ocupado()`
+    INTERVALO_LIMPEZA = 100 # Agendamentos entre duas limpezas dos orçamentos de sessões descartadas
+
+    def __init__(self, armazenamento, resolver, ocupado=lambda: False, proximas=3, orcamento_por_sessao=20,
+                 max_trabalhadores=2):
+        self.armazenamento = armazenamento
+        self.resolver = resolver
+        self.ocupado = ocupado
+        self.proximas = proximas
+        self.orcamento_por_sessao = orcamento_por_sessao
+        self.executor = ThreadPoolExecutor(max_workers=max_trabalhadores, thread_name_prefix='estuda-ai-prefetch')
+        self.contadores = {'agendadas': 0, 'concluidas': 0, 'canceladas': 0, 'sem_orcamento': 0}
+        self._agendados = {} # session_id -> ids dos exercícios já agendados (o orçamento gasto)
+        self._em_andamento = 0
+        self._canceladas = set()
+        self._agendamentos = 0
+        self._lock = threading.Lock()
+
+    def agendar(self, session_id, session_data, ignorar_ids=()):
+        """
+        Agenda os próximos `proximas` exercícios não respondidos e sem resolução da sessão, em ordem.
+        `ignorar_ids` são exercícios que já estão sendo resolvidos pela própria requisição.
+        """
+        candidatos = []
+        exercicios = session_data.get('exercicios')
+        for exercicio in exercicios.nao_respondidos() if exercicios is not None else ():
+            if len(candidatos) >= self.proximas:
+                break
+            if exercicio.resolucao is None and exercicio.id not in ignorar_ids:
+                candidatos.append(exercicio)
+
+        with self._lock:
+            self._canceladas.discard(session_id)
+            self._agendamentos += 1
+            limpar = self._agendamentos % self.INTERVALO_LIMPEZA == 0
+            agendados = []
+            ja_agendados = self._agendados.setdefault(session_id, set())
+            for exercicio in candidatos:
+                if exercicio.id in ja_agendados:
+                    continue
+                if len(ja_agendados) >= self.orcamento_por_sessao:
+                    self.contadores['sem_orcamento'] += 1
+                    break
+                ja_agendados.add(exercicio.id)
+                self._em_andamento += 1
+                self.contadores['agendadas'] += 1
+                agendados.append(exercicio)
+
+        for exercicio in agendados:
+            self.executor.submit(self._pre_resolver, session_id, exercicio.id, exercicio.texto)
+        if limpar:
+            self._limpar()
+        return len(agendados)
+
+    def cancelar(self, session_id):
+        """Abandona as tarefas da sessão que ainda não chamaram o modelo."""
+        with self._lock:
+            self._canceladas.add(session_id)
+            self._agendados.pop(session_id, None)
+
+    def _cancelada(self, session_id):
+        with self._lock:
+            if session_id in self._canceladas:
+                return True
+        return not self.armazenamento.existe(session_id)
+
+    def _pre_resolver(self, session_id, id_exercicio, texto):
+        try:
+            while not self._cancelada(session_id) and self.ocupado():
+                time.sleep(self.INTERVALO_ESPERA)
+            if self._cancelada(session_id):
+                self._contar('canceladas')
+                return
+            self.resolver(texto)
+            self._contar('concluidas')
+        except Exception as e:
+            logger.warning("Falha ao pré-resolver o exercício %s da sessão %s: %s", id_exercicio, session_id, e)
+        finally:
+            with self._lock:
+                self._em_andamento -= 1
+
+    def _contar(self, campo):
+        with self._lock:
+            self.contadores[campo] += 1
+
+    def _limpar(self):
+        # Orçamentos e cancelamentos de sessões que já saíram do armazenamento
+        with self._lock:
+            sessoes = set(self._agendados) | self._canceladas
+        descartadas = {session_id for session_id in sessoes if not self.armazenamento.existe(session_id)}
+        with self._lock:
+            for session_id in descartadas:
+                self._agendados.pop(session_id, None)
+                self._canceladas.discard(session_id)
+
+    def estatisticas(self):
+        with self._lock:
+            return dict(self.contadores, em_andamento=self._em_andamento)
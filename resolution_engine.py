@@ -0,0 +1,54 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def executar_com_medicao(funcao, item):
+    """Executa `funcao(item)` e retorna {'resultado', 'erro', 'duracao'}, sem deixar a exceção escapar."""
+    inicio = time.perf_counter()
+    try:
+        return {'resultado': funcao(item), 'erro': None, 'duracao': time.perf_counter() - inicio}
+    except Exception as e:
+        return {'resultado': None, 'erro': str(e), 'duracao': time.perf_counter() - inicio}
+
+
+def executar_em_paralelo(funcao, itens, max_simultaneas=5):
+    """
+    Aplica `funcao` a cada item usando um pool de threads limitado.
+
+    Retorna uma lista na mesma ordem de `itens`, com um dicionário por item:
+    {'resultado': ..., 'erro': ... ou None, 'duracao': segundos}.
+    Uma exceção em um item é registrada no seu 'erro' e não interrompe os demais.
+    """
+    itens = list(itens)
+    if not itens:
+        return []
+
+    def _executar(item):
+        return executar_com_medicao(funcao, item)
+
+    max_simultaneas = max(1, min(int(max_simultaneas), len(itens)))
+    if max_simultaneas == 1:
+        return [_executar(item) for item in itens]
+
+    with ThreadPoolExecutor(max_workers=max_simultaneas) as executor:
+        # executor.map preserva a ordem de entrada
+        return list(executor.map(_executar, itens))
+
+
+async def executar_em_paralelo_async(funcao_async, itens, max_simultaneas=5):
+    """
+    Como `executar_em_paralelo`, com corrotinas no event loop atual em vez de um pool de threads:
+    até `max_simultaneas` chamadas de `funcao_async` ficam em andamento ao mesmo tempo.
+    """
+    semaforo = asyncio.Semaphore(max(1, int(max_simultaneas)))
+
+    async def _executar(item):
+        async with semaforo:
+            inicio = time.perf_counter()
+            try:
+                return {'resultado': await funcao_async(item), 'erro': None, 'duracao': time.perf_counter() - inicio}
+            except Exception as e:
+                return {'resultado': None, 'erro': str(e), 'duracao': time.perf_counter() - inicio}
+
+    return list(await asyncio.gather(*(_executar(item) for item in itens)))
@@ -0,0 +1,249 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class ArmazenamentoDeSessoes:
+    """
+    Interface dos armazenamentos de dados de sessão, usada como um dicionário.
+
+    Os dados lidos podem ser cópias. Para alterar uma sessão que já existe, use `atualizar`, que relê
+    os dados e grava a alteração sem que uma requisição concorrente desfaça a outra; gravar de volta
+    uma cópia lida antes (`armazenamento[session_id] = dados`) só serve para criar a sessão.
+    Sessões sem acesso há mais de `ttl_segundos` expiram, e as menos usadas são
+    descartadas quando há mais de `max_sessoes`.
+    """
+
+    def __init__(self, ttl_segundos=2 * 3600, max_sessoes=1000):
+        self.ttl_segundos = ttl_segundos
+        self.max_sessoes = max_sessoes
+        self.remocoes_por_ttl = 0
+        self.remocoes_por_tamanho = 0
+
+    def get(self, session_id, padrao=None):
+        raise NotImplementedError
+
+    def existe(self, session_id):
+        """Como `session_id in armazenamento`, mas sem contar como acesso (não renova o prazo da sessão)."""
+        raise NotImplementedError
+
+    def atualizar(self, session_id, alterar):
+        """
+        Lê os dados atuais da sessão, aplica `alterar(dados)` e os grava, tudo de uma vez: nenhuma outra
+        escrita acontece no meio. `alterar` deve ser rápida (sem chamadas ao modelo). Retorna os dados
+        alterados, ou None (sem chamar `alterar`) se a sessão não existir mais.
+        """
+        raise NotImplementedError
+
+    def __setitem__(self, session_id, dados):
+        raise NotImplementedError
+
+    def __delitem__(self, session_id):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def __getitem__(self, session_id):
+        dados = self.get(session_id)
+        if dados is None:
+            raise KeyError(session_id)
+        return dados
+
+    def __contains__(self, session_id):
+        return self.get(session_id) is not None
+
+    def estatisticas(self):
+        return {
+            'sessoes': len(self),
+            'remocoes_por_ttl': self.remocoes_por_ttl,
+            'remocoes_por_tamanho': self.remocoes_por_tamanho,
+        }
+
+
+class ArmazenamentoEmMemoria(ArmazenamentoDeSessoes):
+    """Sessões em um OrderedDict deste processo, ordenado do acesso mais antigo para o mais recente."""
+
+    def __init__(self, ttl_segundos=2 * 3600, max_sessoes=1000):
+        super().__init__(ttl_segundos, max_sessoes)
+        self._sessoes = OrderedDict() # session_id -> (ultimo_acesso, dados)
+        self._lock = threading.Lock()
+
+    def _remover_expiradas(self, agora):
+        # Como a ordem é a de acesso, as expiradas estão sempre no começo
+        while self._sessoes and self.ttl_segundos:
+            ultimo_acesso, _ = next(iter(self._sessoes.values()))
+            if agora - ultimo_acesso <= self.ttl_segundos:
+                break
+            self._sessoes.popitem(last=False)
+            self.remocoes_por_ttl += 1
+
+    def get(self, session_id, padrao=None):
+        agora = time.time()
+        with self._lock:
+            self._remover_expiradas(agora)
+            if session_id not in self._sessoes:
+                return padrao
+            _, dados = self._sessoes[session_id]
+            self._sessoes[session_id] = (agora, dados)
+            self._sessoes.move_to_end(session_id)
+            return dados
+
+    def existe(self, session_id):
+        with self._lock:
+            self._remover_expiradas(time.time())
+            return session_id in self._sessoes
+
+    def atualizar(self, session_id, alterar):
+        agora = time.time()
+        with self._lock:
+            self._remover_expiradas(agora)
+            if session_id not in self._sessoes:
+                return None
+            _, dados = self._sessoes[session_id]
+            alterar(dados)
+            self._sessoes[session_id] = (agora, dados)
+            self._sessoes.move_to_end(session_id)
+            return dados
+
+    def __setitem__(self, session_id, dados):
+        agora = time.time()
+        with self._lock:
+            self._sessoes[session_id] = (agora, dados)
+            self._sessoes.move_to_end(session_id)
+            self._remover_expiradas(agora)
+            while self.max_sessoes and len(self._sessoes) > self.max_sessoes:
+                self._sessoes.popitem(last=False)
+                self.remocoes_por_tamanho += 1
+
+    def __delitem__(self, session_id):
+        with self._lock:
+            del self._sessoes[session_id]
+
+    def __len__(self):
+        return len(self._sessoes)
+
+
+class ArmazenamentoSQLite(ArmazenamentoDeSessoes):
+    """
+    Sessões em um arquivo SQLite compartilhado por todos os processos do servidor.
+    Os dados são serializados com pickle, então cada leitura devolve uma cópia.
+    """
+
+    INTERVALO_LIMPEZA = 50 # Escritas entre duas limpezas
+
+    def __init__(self, caminho, ttl_segundos=2 * 3600, max_sessoes=1000):
+        super().__init__(ttl_segundos, max_sessoes)
+        self.caminho = caminho
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._escritas = 0
+
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        conexao = self._conexao()
+        conexao.execute("""
+            CREATE TABLE IF NOT EXISTS sessoes (
+                session_id TEXT PRIMARY KEY,
+                dados BLOB NOT NULL,
+                acessado_em REAL NOT NULL
+            )""")
+        conexao.execute("CREATE INDEX IF NOT EXISTS idx_sessoes_acessado_em ON sessoes (acessado_em)")
+        conexao.commit()
+
+    def _conexao(self):
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=30)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexao = conexao
+        return conexao
+
+    def get(self, session_id, padrao=None):
+        conexao = self._conexao()
+        agora = time.time()
+        linha = conexao.execute("SELECT dados, acessado_em FROM sessoes WHERE session_id = ?", (session_id,)).fetchone()
+        if linha is None:
+            return padrao
+        dados, acessado_em = linha
+        with conexao:
+            if self.ttl_segundos and agora - acessado_em > self.ttl_segundos:
+                conexao.execute("DELETE FROM sessoes WHERE session_id = ?", (session_id,))
+                with self._lock:
+                    self.remocoes_por_ttl += 1
+                return padrao
+            conexao.execute("UPDATE sessoes SET acessado_em = ? WHERE session_id = ?", (agora, session_id))
+        return pickle.loads(dados)
+
+    def existe(self, session_id):
+        linha = self._conexao().execute("SELECT acessado_em FROM sessoes WHERE session_id = ?", (session_id,)).fetchone()
+        return linha is not None and not (self.ttl_segundos and time.time() - linha[0] > self.ttl_segundos)
+
+    def atualizar(self, session_id, alterar):
+        conexao = self._conexao()
+        agora = time.time()
+        with conexao:
+            # Reserva a escrita antes de ler: outro processo que queira alterar a sessão espera este terminar
+            conexao.execute("BEGIN IMMEDIATE")
+            linha = conexao.execute("SELECT dados, acessado_em FROM sessoes WHERE session_id = ?", (session_id,)).fetchone()
+            if linha is None or (self.ttl_segundos and agora - linha[1] > self.ttl_segundos):
+                return None
+            dados = pickle.loads(linha[0])
+            alterar(dados)
+            conexao.execute("UPDATE sessoes SET dados = ?, acessado_em = ? WHERE session_id = ?",
+                            (pickle.dumps(dados, protocol=pickle.HIGHEST_PROTOCOL), agora, session_id))
+        return dados
+
+    def __setitem__(self, session_id, dados):
+        conexao = self._conexao()
+        with conexao:
+            conexao.execute("INSERT OR REPLACE INTO sessoes (session_id, dados, acessado_em) VALUES (?, ?, ?)",
+                            (session_id, pickle.dumps(dados, protocol=pickle.HIGHEST_PROTOCOL), time.time()))
+        with self._lock:
+            self._escritas += 1
+            limpar = self._escritas % self.INTERVALO_LIMPEZA == 1
+        if limpar:
+            self.limpar()
+
+    def __delitem__(self, session_id):
+        conexao = self._conexao()
+        with conexao:
+            if not conexao.execute("DELETE FROM sessoes WHERE session_id = ?", (session_id,)).rowcount:
+                raise KeyError(session_id)
+
+    def __len__(self):
+        return self._conexao().execute("SELECT COUNT(*) FROM sessoes").fetchone()[0]
+
+    def limpar(self):
+        """Remove as sessões expiradas e as menos usadas acima de `max_sessoes`."""
+        conexao = self._conexao()
+        with conexao:
+            expiradas = 0
+            if self.ttl_segundos:
+                expiradas = conexao.execute("DELETE FROM sessoes WHERE acessado_em < ?",
+                                            (time.time() - self.ttl_segundos,)).rowcount
+            excedentes = 0
+            if self.max_sessoes:
+                total = conexao.execute("SELECT COUNT(*) FROM sessoes").fetchone()[0]
+                if total > self.max_sessoes:
+                    excedentes = conexao.execute("""
+                        DELETE FROM sessoes WHERE session_id IN (
+                            SELECT session_id FROM sessoes ORDER BY acessado_em ASC LIMIT ?
+                        )""", (total - self.max_sessoes,)).rowcount
+        with self._lock:
+            self.remocoes_por_ttl += expiradas
+            self.remocoes_por_tamanho += excedentes
+
+
+def criar_armazenamento_de_sessoes(tipo='memory', caminho=None, ttl_segundos=2 * 3600, max_sessoes=1000):
+    """Cria o armazenamento configurado: 'memory' (um por processo) ou 'sqlite' (compartilhado)."""
+    if tipo == 'memory':
+        return ArmazenamentoEmMemoria(ttl_segundos, max_sessoes)
+    if tipo == 'sqlite':
+        return ArmazenamentoSQLite(caminho, ttl_segundos, max_sessoes)
+    raise ValueError(f"Tipo de armazenamento de sessões desconhecido: {tipo}")
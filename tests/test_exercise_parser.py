@@ -0,0 +1,19 @@
+from exercise_parser import LeitorDeExerciciosJSON
+
+
+def ler(pedacos):
+    leitor = LeitorDeExerciciosJSON()
+    exercicios = [exercicio for pedaco in pedacos for exercicio in leitor.alimentar(pedaco)]
+    return exercicios, leitor
+
+
+def test_aspas_escapadas_divididas_entre_pedacos():
+    exercicios, leitor = ler(['[{"texto":"q\\', '"x"}]'])
+    assert [exercicio['texto'] for exercicio in exercicios] == ['q"x']
+    assert leitor.invalidos == 0
+
+
+def test_pedaco_vazio_depois_de_barra_invertida():
+    exercicios, leitor = ler(['[{"texto":"q\\', '', '"x"}]'])
+    assert [exercicio['texto'] for exercicio in exercicios] == ['q"x']
+    assert leitor.objetos == 1 and leitor.invalidos == 0
@@ -0,0 +1,82 @@
+import pickle
+import random
+
+from exercise_store import BancoDeExercicios
+
+
+def criar_banco(quantidade):
+    return BancoDeExercicios([{'texto': f'Exercício {i}', 'numero': str(i + 1), 'pagina': i // 3 + 1}
+                              for i in range(quantidade)])
+
+
+def ids(exercicios):
+    return [exercicio.id for exercicio in exercicios]
+
+
+def test_respostas_em_ordem_aleatoria_mantem_consultas_consistentes():
+    gerador = random.Random(7)
+    banco = criar_banco(30)
+    ordem = list(range(30))
+    gerador.shuffle(ordem)
+    respondidos = set()
+    for id_exercicio in ordem:
+        assert banco.marcar_respondida(id_exercicio)
+        assert not banco.marcar_respondida(id_exercicio)
+        respondidos.add(id_exercicio)
+        esperados = [i for i in range(30) if i not in respondidos]
+
+        assert ids(banco.nao_respondidos()) == esperados
+        assert banco.num_respondidas == len(respondidos)
+        assert banco.num_disponiveis == len(esperados)
+        assert ids(banco.proximos(5)) == esperados[:5]
+        ignorar = set(gerador.sample(esperados, min(3, len(esperados))))
+        assert ids(banco.proximos(5, ignorar_ids=ignorar)) == [i for i in esperados if i not in ignorar][:5]
+        sorteados = ids(banco.sortear(min(4, len(esperados))))
+        assert len(set(sorteados)) == len(sorteados) and set(sorteados) <= set(esperados)
+        assert sorted(ids(banco.sortear(len(esperados)))) == esperados
+
+
+def test_pickle_preserva_respostas_resolucoes_e_similares():
+    banco = criar_banco(8)
+    for id_exercicio in (5, 0, 3):
+        banco.marcar_respondida(id_exercicio)
+    banco.get(1).resolucao = 'x = 2'
+    banco.get(1).similares = [{'texto': 'Similar', 'resolucao': 'y = 3'}]
+
+    copia = pickle.loads(pickle.dumps(banco, protocol=pickle.HIGHEST_PROTOCOL))
+
+    assert [(ex.texto, ex.numero, ex.pagina) for ex in copia] == [(ex.texto, ex.numero, ex.pagina) for ex in banco]
+    assert ids(copia.nao_respondidos()) == [1, 2, 4, 6, 7]
+    assert ids(copia.respondidos()) == [0, 3, 5]
+    assert copia.get(1).resolucao == 'x = 2' and copia.get(1).similares == [{'texto': 'Similar', 'resolucao': 'y = 3'}]
+    assert copia.get(2).resolucao is None and copia.get(2).similares == []
+    # Os índices reconstruídos continuam sendo atualizados depois de carregar
+    assert copia.marcar_respondida(2)
+    assert ids(copia.proximos(10)) == [1, 4, 6, 7]
+    assert sorted(ids(copia.sortear(4))) == [1, 4, 6, 7]
+
+
+def test_banco_todo_respondido():
+    banco = criar_banco(4)
+    for id_exercicio in (2, 0, 3, 1):
+        banco.marcar_respondida(id_exercicio)
+
+    assert banco.num_disponiveis == 0 and banco.num_respondidas == 4
+    assert list(banco.nao_respondidos()) == []
+    assert banco.proximos(3) == [] and banco.sortear(0) == []
+    assert ids(banco.respondidos()) == [0, 1, 2, 3]
+    assert not banco.marcar_respondida(1)
+    copia = pickle.loads(pickle.dumps(banco))
+    assert copia.num_disponiveis == 0 and list(copia.nao_respondidos()) == []
+
+
+def test_banco_vazio():
+    banco = BancoDeExercicios([])
+
+    assert not banco and len(banco) == 0
+    assert banco.num_disponiveis == 0 and banco.num_respondidas == 0
+    assert list(banco.nao_respondidos()) == [] and banco.respondidos() == []
+    assert banco.proximos(5) == [] and banco.sortear(0) == []
+    assert banco.get(0) is None
+    copia = pickle.loads(pickle.dumps(banco))
+    assert len(copia) == 0 and copia.proximos(1) == []
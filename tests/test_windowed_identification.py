@@ -0,0 +1,56 @@
+from estuda_ai.extracao import SEPARADOR_PAGINA
+from windowed_identification import _comparavel, _paginas_dos_exercicios, dividir_em_janelas, mesclar_exercicios
+
+LONGO = ("2. Um trem parte da estação A às 8h com velocidade constante de 60 km/h em direção à estação B, "
+         "distante 300 km. Outro trem parte de B às 9h a 90 km/h em direção a A. A que horas eles se encontram?")
+CORTADO = LONGO[:70]
+CURTO = "a) Calcule 2 + 2."
+
+
+def janelas_de(paginas, paginas_por_janela=2, sobreposicao=1):
+    texto = "".join(pagina + "\n" + SEPARADOR_PAGINA for pagina in paginas)
+    return dividir_em_janelas(texto, paginas_por_janela, sobreposicao)
+
+
+def textos(exercicios):
+    return [exercicio['texto'] for exercicio in exercicios]
+
+
+def test_exercicio_cortado_na_pagina_em_comum_e_mesclado():
+    janelas = janelas_de(["1. Quanto é 3 x 4?", LONGO, "3. Quanto é 5 x 6?"])
+    por_janela = [
+        [{'texto': "1. Quanto é 3 x 4?"}, {'texto': CORTADO}],
+        [{'texto': LONGO}, {'texto': "3. Quanto é 5 x 6?"}],
+    ]
+
+    assert textos(mesclar_exercicios(por_janela, janelas)) == ["1. Quanto é 3 x 4?", LONGO, "3. Quanto é 5 x 6?"]
+
+
+def test_itens_curtos_iguais_em_paginas_diferentes_sao_mantidos():
+    paginas = [f"Lista {numero}\n{CURTO}" for numero in (1, 2, 3)]
+    janelas = janelas_de(paginas)
+    assert _paginas_dos_exercicios([_comparavel(CURTO)] * 2, janelas[0]['paginas']) == [1, 2]
+
+    por_janela = [[{'texto': CURTO}, {'texto': CURTO}], [{'texto': CURTO}, {'texto': CURTO}]]
+
+    # O item da página 2 aparece nas duas janelas e fica uma vez; os das páginas 1 e 3 ficam
+    assert textos(mesclar_exercicios(por_janela, janelas)) == [CURTO] * 3
+
+
+def test_itens_repetidos_na_mesma_pagina_sao_mantidos():
+    janelas = janelas_de(["1. Quanto é 3 x 4?", f"Fixação\n{CURTO}\nRevisão\n{CURTO}", "3. Quanto é 5 x 6?"])
+    por_janela = [
+        [{'texto': "1. Quanto é 3 x 4?"}, {'texto': CURTO}, {'texto': CURTO}],
+        [{'texto': CURTO}, {'texto': CURTO}, {'texto': "3. Quanto é 5 x 6?"}],
+    ]
+
+    assert textos(mesclar_exercicios(por_janela, janelas)) == ["1. Quanto é 3 x 4?", CURTO, CURTO, "3. Quanto é 5 x 6?"]
+
+
+def test_sem_sobreposicao_nada_e_descartado():
+    janelas = janelas_de([LONGO, CURTO, LONGO, CURTO], sobreposicao=0)
+    assert [(janela['pagina_inicial'], janela['pagina_final']) for janela in janelas] == [(1, 2), (3, 4)]
+
+    por_janela = [[{'texto': LONGO}, {'texto': CURTO}], [{'texto': CORTADO}, {'texto': CURTO}]]
+
+    assert textos(mesclar_exercicios(por_janela, janelas)) == [LONGO, CURTO, CORTADO, CURTO]
@@ -0,0 +1,149 @@
+import re
+from collections import Counter
+
+from gemini_client import estimar_tokens
+from estuda_ai.extracao import SEPARADOR_PAGINA
+
+LINHAS_DE_BORDA = 3 # Linhas no início e no fim de cada página em que cabeçalhos e rodapés são procurados
+MIN_PAGINAS_REPETIDAS = 3 # Uma linha de borda precisa aparecer em pelo menos tantas páginas...
+FRACAO_PAGINAS_REPETIDAS = 0.5 # ...e em pelo menos esta fração delas para ser tratada como cabeçalho/rodapé
+
+# "7", "- 7 -", "Página 7", "pág. 7 de 120", "7/120"
+_NUMERO_DE_PAGINA = re.compile(r'^[-–—\s]*(?:p[áa]g(?:ina)?\.?\s*)?\d{1,4}(?:\s*(?:/|de|of)\s*\d{1,4})?[-–—\s]*$', re.IGNORECASE)
+# Palavra partida no fim da linha: "exercí-\ncio" -> "exercício" (só quando a linha seguinte continua em minúscula)
+_HIFENIZACAO = re.compile(r'(\w)-[ \t]*\n[ \t]*([a-zà-ÿ])')
+_ESPACOS = re.compile(r'[ \t\u00a0]+')
+_LINHAS_EM_BRANCO = re.compile(r'\n{3,}')
+_DIGITOS = re.compile(r'\d+')
+_MARCADOR_DE_ITEM = re.compile(r'^\s*(?:\d{1,3}|[a-z])\s*[.)]\s', re.IGNORECASE)
+_MATEMATICA = re.compile(r'[=+<>^×÷√∫∑]')
+# Sinais de que a página tem exercícios: itens numerados ou com letra, palavras de enunciado ou perguntas
+_PADRAO_DE_EXERCICIO = re.compile(
+    r'^\s*(?:\d{1,3}|[a-z])\s*[.)]|\b(?:quest[aãõ]o|quest[oõ]es|exerc[ií]cios?|problema|calcule|determine|resolva|'
+    r'demonstre|mostre|encontre|assinale|justifique)\b|\?',
+    re.IGNORECASE | re.MULTILINE)
+
+
+def _texto_da_linha(linha):
+    # Cabeçalhos e rodapés costumam mudar só no número (da página, do capítulo), então os dígitos são
+    # ignorados, exceto em linhas com contas, que poderiam ser enunciados parecidos
+    texto = _ESPACOS.sub(' ', linha).strip().lower()
+    return texto if _MATEMATICA.search(texto) else _DIGITOS.sub('#', texto)
+
+
+def _chaves_de_borda(linhas):
+    """
+    Índice de cada linha candidata a cabeçalho ou rodapé -> chaves (posição, texto), com a posição contada
+    do topo (0, 1, ...) e do fim (-1, -2, ...). Itens numerados e linhas que se repetem dentro da própria
+    página (como "Justifique sua resposta." em cada exercício) não são candidatos.
+    """
+    preenchidas = [indice for indice, linha in enumerate(linhas) if linha.strip()]
+    textos = {indice: _texto_da_linha(linhas[indice]) for indice in preenchidas}
+    repetidos_na_pagina = {texto for texto, quantidade in Counter(textos.values()).items() if quantidade > 1}
+    posicoes = list(enumerate(preenchidas[:LINHAS_DE_BORDA]))
+    posicoes += [(-posicao, indice) for posicao, indice in enumerate(reversed(preenchidas[-LINHAS_DE_BORDA:]), 1)]
+
+    chaves = {}
+    for posicao, indice in posicoes:
+        texto = textos[indice]
+        if texto not in repetidos_na_pagina and not _MARCADOR_DE_ITEM.match(linhas[indice]):
+            chaves.setdefault(indice, set()).add((posicao, texto))
+    return chaves
+
+
+def _todas_as_chaves(linhas):
+    return set().union(*_chaves_de_borda(linhas).values())
+
+
+def _novo_relatorio():
+    return {
+        'tokens_antes': 0,
+        'tokens_depois': 0,
+        'linhas_repetidas': 0,
+        'numeros_de_pagina': 0,
+        'hifenizacoes': 0,
+        'paginas_descartadas': 0,
+    }
+
+
+def _limpar_pagina(texto, repetidas, relatorio):
+    """Remove das bordas da página as linhas repetidas e os números de página; junta hifenizações e espaços."""
+    linhas = texto.split('\n')
+    candidatas = _chaves_de_borda(linhas)
+    mantidas = []
+    for indice, linha in enumerate(linhas):
+        if indice in candidatas:
+            if candidatas[indice] & repetidas:
+                relatorio['linhas_repetidas'] += 1
+                continue
+            if _NUMERO_DE_PAGINA.match(linha):
+                relatorio['numeros_de_pagina'] += 1
+                continue
+        mantidas.append(_ESPACOS.sub(' ', linha).strip())
+    texto, hifenizacoes = _HIFENIZACAO.subn(r'\1\2', "\n".join(mantidas))
+    relatorio['hifenizacoes'] += hifenizacoes
+    return _LINHAS_EM_BRANCO.sub('\n\n', texto).strip()
+
+
+def _paginas_com_exercicios(paginas):
+    """Índices das páginas a manter: as que têm padrões de exercício e a seguinte a cada uma (continuações)."""
+    manter = set()
+    for indice, pagina in enumerate(paginas):
+        if _PADRAO_DE_EXERCICIO.search(pagina):
+            manter.update((indice, indice + 1))
+    return manter
+
+
+def normalizar_texto_extraido(texto, descartar_paginas_sem_exercicios=False):
+    """
+    Reduz o texto extraído antes de enviá-lo à identificação: remove cabeçalhos e rodapés repetidos nas
+    páginas e os números de página, junta palavras hifenizadas na quebra de linha e colapsa espaços.
+    Com `descartar_paginas_sem_exercicios`, esvazia as páginas sem nenhum padrão de exercício.
+
+    As páginas continuam separadas por `SEPARADOR_PAGINA`, inclusive as esvaziadas, para que a numeração
+    das páginas não mude. Retorna (texto, relatorio), com os tokens estimados antes e depois.
+    """
+    relatorio = _novo_relatorio()
+    relatorio['tokens_antes'] = estimar_tokens(texto)
+    paginas = texto.split(SEPARADOR_PAGINA)
+    if paginas and not paginas[-1].strip():
+        paginas.pop()
+
+    linhas_por_pagina = [pagina.split('\n') for pagina in paginas]
+    ocorrencias = Counter(chave for linhas in linhas_por_pagina for chave in _todas_as_chaves(linhas))
+    minimo = max(MIN_PAGINAS_REPETIDAS, FRACAO_PAGINAS_REPETIDAS * len(paginas))
+    repetidas = {chave for chave, quantidade in ocorrencias.items() if quantidade >= minimo}
+
+    paginas = [_limpar_pagina(pagina, repetidas, relatorio) for pagina in paginas]
+    if descartar_paginas_sem_exercicios:
+        manter = _paginas_com_exercicios(paginas)
+        for indice, pagina in enumerate(paginas):
+            if indice not in manter and pagina:
+                paginas[indice] = ""
+                relatorio['paginas_descartadas'] += 1
+
+    texto = "".join(pagina + "\n" + SEPARADOR_PAGINA for pagina in paginas)
+    relatorio['tokens_depois'] = estimar_tokens(texto)
+    return texto, relatorio
+
+
+def normalizar_paginas_em_fluxo(paginas, relatorio=None):
+    """
+    Normaliza páginas que chegam aos poucos, como pares (numero, texto) em ordem, sem esperar o documento inteiro.
+
+    Cabeçalhos e rodapés só são reconhecidos depois de aparecerem em `MIN_PAGINAS_REPETIDAS` páginas anteriores,
+    então os das primeiras páginas ficam no texto. O descarte de páginas sem exercícios não se aplica aqui.
+    `relatorio`, se dado, é preenchido durante a iteração.
+    """
+    relatorio = relatorio if relatorio is not None else {}
+    for campo, valor in _novo_relatorio().items():
+        relatorio.setdefault(campo, valor)
+    ocorrencias = Counter()
+    for numero, texto in paginas:
+        relatorio['tokens_antes'] += estimar_tokens(texto + "\n" + SEPARADOR_PAGINA)
+        chaves = _todas_as_chaves(texto.split('\n'))
+        repetidas = {chave for chave in chaves if ocorrencias[chave] >= MIN_PAGINAS_REPETIDAS}
+        ocorrencias.update(chaves)
+        texto = _limpar_pagina(texto, repetidas, relatorio)
+        relatorio['tokens_depois'] += estimar_tokens(texto + "\n" + SEPARADOR_PAGINA)
+        yield numero, texto
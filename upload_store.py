@@ -0,0 +1,166 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+SUFIXO_PARCIAL = '.parcial'
+
+
+class ArquivoGrandeDemais(Exception):
+    """O arquivo enviado passou do tamanho máximo permitido."""
+
+
+class ArmazenamentoDeUploads:
+    """
+    Guarda os PDFs enviados pelo hash SHA-256 do conteúdo, em `pasta/<2 primeiros caracteres>/<hash>.pdf`.
+
+    O arquivo é gravado em blocos em um arquivo temporário enquanto o hash é calculado e só então
+    movido (de forma atômica) para o destino; se o mesmo conteúdo já existir, o temporário é descartado.
+    A data de modificação marca o último uso, e a coleta remove os arquivos mais antigos que
+    `idade_maxima_segundos` e, acima da `cota_bytes`, os usados há mais tempo. Arquivos em uso por
+    um processamento (`em_uso`) nunca são removidos.
+    """
+
+    INTERVALO_COLETA = 50 # Gravações entre duas coletas, além das disparadas pela cota
+
+    def __init__(self, pasta, max_bytes_arquivo=50 * 1024 * 1024, cota_bytes=2 * 1024 ** 3,
+                 idade_maxima_segundos=7 * 24 * 3600):
+        self.pasta = pasta
+        self.max_bytes_arquivo = max_bytes_arquivo
+        self.cota_bytes = cota_bytes
+        self.idade_maxima_segundos = idade_maxima_segundos
+        self.deduplicados = 0
+        self.removidos = 0
+        self._gravacoes = 0
+        self._em_uso = Counter()
+        self._lock = threading.Lock()
+        os.makedirs(pasta, exist_ok=True)
+        self._bytes = sum(tamanho for _, _, tamanho, _ in self._listar())
+
+    def caminho(self, hash_do_arquivo):
+        return os.path.join(self.pasta, hash_do_arquivo[:2], f"{hash_do_arquivo}.pdf")
+
+    def salvar(self, stream, tamanho_bloco=1024 * 1024):
+        """
+        Grava o conteúdo de `stream` e retorna (hash, caminho).
+        Levanta `ArquivoGrandeDemais` assim que o conteúdo passar de `max_bytes_arquivo`.
+        """
+        sha256 = hashlib.sha256()
+        tamanho = 0
+        descritor, temporario = tempfile.mkstemp(dir=self.pasta, suffix=SUFIXO_PARCIAL)
+        try:
+            with os.fdopen(descritor, 'wb') as arquivo_temporario:
+                while True:
+                    bloco = stream.read(tamanho_bloco)
+                    if not bloco:
+                        break
+                    tamanho += len(bloco)
+                    if tamanho > self.max_bytes_arquivo:
+                        raise ArquivoGrandeDemais(f"O arquivo passa do limite de {self.max_bytes_arquivo // (1024 * 1024)} MB.")
+                    sha256.update(bloco)
+                    arquivo_temporario.write(bloco)
+
+            hash_do_arquivo = sha256.hexdigest()
+            destino = self.caminho(hash_do_arquivo)
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            with self._lock:
+                novo = not os.path.exists(destino)
+                if novo:
+                    os.replace(temporario, destino)
+                    self._bytes += tamanho
+                else:
+                    self.deduplicados += 1
+                self._gravacoes += 1
+                coletar = self._bytes > self.cota_bytes or self._gravacoes % self.INTERVALO_COLETA == 0
+            if not novo:
+                os.remove(temporario)
+                self.tocar(hash_do_arquivo)
+        except BaseException:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+
+        if coletar:
+            self.coletar()
+        return hash_do_arquivo, destino
+
+    def tocar(self, hash_do_arquivo):
+        """Marca o arquivo como usado agora, para a ordem LRU da coleta."""
+        try:
+            os.utime(self.caminho(hash_do_arquivo))
+        except FileNotFoundError:
+            pass
+
+    @contextmanager
+    def em_uso(self, hash_do_arquivo):
+        """Protege o arquivo da coleta enquanto ele é processado; produz o caminho do arquivo."""
+        with self._lock:
+            self._em_uso[hash_do_arquivo] += 1
+        self.tocar(hash_do_arquivo)
+        try:
+            yield self.caminho(hash_do_arquivo)
+        finally:
+            with self._lock:
+                self._em_uso[hash_do_arquivo] -= 1
+                if self._em_uso[hash_do_arquivo] <= 0:
+                    del self._em_uso[hash_do_arquivo]
+
+    def _listar(self):
+        # (hash, caminho, tamanho, último uso) de cada arquivo armazenado
+        for subpasta in os.scandir(self.pasta):
+            if not subpasta.is_dir() or len(subpasta.name) != 2:
+                continue
+            for entrada in os.scandir(subpasta.path):
+                if entrada.name.endswith('.pdf'):
+                    try:
+                        informacoes = entrada.stat()
+                    except FileNotFoundError:
+                        continue
+                    yield entrada.name[:-4], entrada.path, informacoes.st_size, informacoes.st_mtime
+
+    def coletar(self):
+        """Remove arquivos expirados e, se a pasta passar da cota, os usados há mais tempo. Retorna quantos removeu."""
+        agora = time.time()
+        with self._lock:
+            em_uso = set(self._em_uso)
+        arquivos = sorted(self._listar(), key=lambda arquivo: arquivo[3])
+        total = sum(tamanho for _, _, tamanho, _ in arquivos)
+        removidos = 0
+        for hash_do_arquivo, caminho, tamanho, ultimo_uso in arquivos:
+            expirado = agora - ultimo_uso > self.idade_maxima_segundos
+            if not expirado and total <= self.cota_bytes:
+                break
+            if hash_do_arquivo in em_uso:
+                continue
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                continue
+            total -= tamanho
+            removidos += 1
+
+        # Temporários de gravações interrompidas (por exemplo, com o processo encerrado no meio)
+        for entrada in os.scandir(self.pasta):
+            if entrada.name.endswith(SUFIXO_PARCIAL) and agora - entrada.stat().st_mtime > 3600:
+                try:
+                    os.remove(entrada.path)
+                except FileNotFoundError:
+                    pass
+
+        with self._lock:
+            self._bytes = total
+            self.removidos += removidos
+        return removidos
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'bytes': self._bytes,
+                'deduplicados': self.deduplicados,
+                'removidos': self.removidos,
+                'em_uso': len(self._em_uso),
+            }
+
@@ -0,0 +1,191 @@
+import bisect
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from cache_store import normalizar_texto
+from estuda_ai.extracao import SEPARADOR_PAGINA
+from resolution_engine import executar_com_medicao, executar_em_paralelo
+
+
+def dividir_em_janelas(texto, paginas_por_janela=10, sobreposicao=1):
+    """
+    Divide o texto em janelas de páginas inteiras, com `sobreposicao` páginas repetidas
+    entre janelas consecutivas para não cortar exercícios que atravessam a divisa.
+
+    Retorna uma lista de dicionários {'pagina_inicial', 'pagina_final', 'texto', 'paginas'} (páginas a partir
+    de 1; `paginas` são os pares (numero, texto) da janela).
+    """
+    paginas = texto.split(SEPARADOR_PAGINA)
+    if paginas and not paginas[-1].strip():
+        paginas.pop()
+    if not paginas:
+        return []
+
+    paginas_por_janela = max(1, paginas_por_janela)
+    sobreposicao = max(0, min(sobreposicao, paginas_por_janela - 1))
+    passo = paginas_por_janela - sobreposicao
+
+    janelas = []
+    inicio = 0
+    while True:
+        fim = min(inicio + paginas_por_janela, len(paginas))
+        janelas.append({
+            'pagina_inicial': inicio + 1,
+            'pagina_final': fim,
+            'texto': "\n".join(paginas[inicio:fim]),
+            'paginas': [(numero + 1, paginas[numero]) for numero in range(inicio, fim)],
+        })
+        if fim >= len(paginas):
+            break
+        inicio += passo
+    return janelas
+
+
+CARACTERES_DO_INICIO = 40 # Trecho do começo do exercício procurado no texto da janela para achar a página
+MIN_CARACTERES_PREFIXO = 40 # Mais curto que isso, só o texto igual conta como o mesmo exercício cortado
+
+_NUMERACAO = re.compile(r'^(?:quest[aã]o\s*)?(?:\d{1,3}|[a-z])\s*[.)\-:]\s+')
+
+
+def _comparavel(texto):
+    return normalizar_texto(texto).casefold()
+
+
+def _paginas_dos_exercicios(comparaveis, paginas):
+    """
+    Página de cada exercício da janela (ou None), procurando o começo de cada um no texto da janela,
+    em ordem e a partir de onde o anterior foi achado, para que itens iguais caiam cada um na sua página.
+    """
+    textos, finais = [], []
+    tamanho = 0
+    for _, texto in paginas:
+        textos.append(_comparavel(texto))
+        tamanho += len(textos[-1]) + 1
+        finais.append(tamanho)
+    texto_da_janela = " ".join(textos)
+
+    resultado = []
+    cursor = 0
+    for comparavel in comparaveis:
+        # O modelo pode reescrever a numeração, então ela fica de fora do trecho procurado
+        inicio = _NUMERACAO.sub('', comparavel, count=1)[:CARACTERES_DO_INICIO]
+        posicao = texto_da_janela.find(inicio, cursor) if inicio else -1
+        if posicao < 0:
+            resultado.append(None)
+            continue
+        cursor = posicao + len(inicio)
+        resultado.append(paginas[bisect.bisect_right(finais, posicao)][0])
+    return resultado
+
+
+def _mesmo_exercicio(a, b):
+    # Um exercício cortado na borda de uma janela aparece como prefixo do mesmo exercício completo na outra
+    if a == b:
+        return True
+    curto, longo = sorted((a, b), key=len)
+    return len(curto) >= MIN_CARACTERES_PREFIXO and longo.startswith(curto)
+
+
+def mesclar_exercicios(listas_por_janela, janelas):
+    """
+    Junta as listas de exercícios de cada janela na ordem do documento, descartando os que
+    aparecem repetidos entre janelas vizinhas. Fica a versão mais longa.
+
+    Só são comparados os exercícios que começam nas páginas que as duas janelas têm em comum
+    (`janela['paginas']`), e cada exercício da janela anterior descarta no máximo um da seguinte:
+    itens curtos iguais em outras páginas, ou repetidos na mesma página, continuam todos na lista.
+    Cada exercício é um dict com ao menos a chave 'texto'.
+    """
+    exercicios = []
+    anteriores = [] # (posição em `exercicios`, texto comparável, página) da janela anterior
+    paginas_anteriores = set()
+    for lista, janela in zip(listas_por_janela, janelas):
+        comuns = paginas_anteriores & {numero for numero, _ in janela['paginas']}
+        candidatos = [(posicao, texto) for posicao, texto, pagina in anteriores if pagina in comuns]
+        comparaveis = [_comparavel(exercicio['texto']) for exercicio in lista]
+        atuais = []
+        for exercicio, comparavel, pagina in zip(lista, comparaveis, _paginas_dos_exercicios(comparaveis, janela['paginas'])):
+            repetido = None
+            if pagina in comuns:
+                repetido = next((i for i, (_, texto) in enumerate(candidatos) if _mesmo_exercicio(comparavel, texto)), None)
+            if repetido is None:
+                exercicios.append(exercicio)
+                atuais.append((len(exercicios) - 1, comparavel, pagina))
+            else:
+                posicao, _ = candidatos.pop(repetido)
+                if len(exercicio['texto']) > len(exercicios[posicao]['texto']):
+                    exercicios[posicao] = exercicio
+                atuais.append((posicao, comparavel, pagina))
+        anteriores = atuais
+        paginas_anteriores = {numero for numero, _ in janela['paginas']}
+    return exercicios
+
+
+def identificar_em_janelas(texto, identificar, parsear, paginas_por_janela=10, sobreposicao=1, max_simultaneas=4):
+    """
+    Identifica os exercícios de cada janela em paralelo e mescla o resultado.
+
+    `identificar(texto)` faz a chamada ao modelo e `parsear(resposta)` devolve a lista de exercícios.
+    Retorna (exercicios, relatorio); o relatório traz o tempo e a quantidade de exercícios por janela
+    e o número de janelas que falharam.
+    """
+    janelas = dividir_em_janelas(texto, paginas_por_janela, sobreposicao)
+    resultados = executar_em_paralelo(lambda janela: parsear(identificar(janela['texto'])), janelas, max_simultaneas)
+    return _mesclar_resultados(janelas, resultados)
+
+
+def identificar_paginas_em_fluxo(paginas, identificar, parsear, paginas_por_janela=10, sobreposicao=1, max_simultaneas=4):
+    """
+    Como `identificar_em_janelas`, mas recebe as páginas aos poucos, como pares (numero, texto) em ordem,
+    e envia cada janela ao modelo assim que as suas páginas chegam, enquanto as seguintes ainda são extraídas.
+
+    Retorna (exercicios, relatorio, texto), com `texto` no mesmo formato de `extrair_texto`.
+    """
+    paginas_por_janela = max(1, paginas_por_janela)
+    sobreposicao = max(0, min(sobreposicao, paginas_por_janela - 1))
+    janelas, futuros, textos = [], [], []
+    pendentes = [] # (numero, texto) das páginas da janela em formação
+    novas = 0 # Páginas da janela em formação que ainda não foram enviadas em outra janela
+
+    with ThreadPoolExecutor(max_workers=max(1, max_simultaneas)) as executor:
+        def enviar():
+            janela = {
+                'pagina_inicial': pendentes[0][0],
+                'pagina_final': pendentes[-1][0],
+                'texto': "\n".join(texto for _, texto in pendentes),
+                'paginas': list(pendentes),
+            }
+            janelas.append(janela)
+            futuros.append(executor.submit(executar_com_medicao, lambda texto: parsear(identificar(texto)), janela['texto']))
+
+        for numero, texto in paginas:
+            textos.append(texto + "\n" + SEPARADOR_PAGINA)
+            pendentes.append((numero, texto + "\n"))
+            novas += 1
+            if len(pendentes) == paginas_por_janela:
+                enviar()
+                pendentes = pendentes[len(pendentes) - sobreposicao:]
+                novas = 0
+        if novas:
+            enviar()
+        resultados = [futuro.result() for futuro in futuros]
+
+    exercicios, relatorio = _mesclar_resultados(janelas, resultados)
+    return exercicios, relatorio, "".join(textos)
+
+
+def _mesclar_resultados(janelas, resultados):
+    relatorio = {'janelas': [], 'falhas': 0}
+    listas = []
+    for janela, resultado in zip(janelas, resultados):
+        exercicios_da_janela = resultado['resultado'] or []
+        if resultado['erro'] is not None:
+            relatorio['falhas'] += 1
+        listas.append(exercicios_da_janela)
+        relatorio['janelas'].append({
+            'paginas': (janela['pagina_inicial'], janela['pagina_final']),
+            'duracao': resultado['duracao'],
+            'exercicios': len(exercicios_da_janela),
+            'erro': resultado['erro'],
+        })
+    return mesclar_exercicios(listas, janelas), relatorio